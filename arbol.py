@@ -0,0 +1,321 @@
+# arbol.py
+# AST en columnas: cada nodo es un índice y sus campos viven en arreglos paralelos
+# (tipo de nodo, lexema, línea, offsets, primer hijo, siguiente hermano, tipo de
+# dato). NodoColumnar es una vista con __slots__ que ofrece la misma interfaz que
+# ASTNode (kind, lexeme, lineno, children, type, ligadura, add, repr), así que
+# semantica.py y cgen.py la usan sin cambios. Las vistas se crean al vuelo y no
+# guardan nada.
+
+import io
+from array import array
+
+from volcado import imprimir_ast
+
+# Nombres de tipo de nodo y de tipo de dato: se guardan como códigos de un byte
+KINDS = []
+_CODIGO_KIND = {}
+TIPOS_DATO = [None, 'int', 'void']
+_CODIGO_TIPO = {t: i for i, t in enumerate(TIPOS_DATO)}
+
+def codigo_kind(kind):
+    c = _CODIGO_KIND.get(kind)
+    if c is None:
+        c = _CODIGO_KIND[kind] = len(KINDS)
+        KINDS.append(kind)
+    return c
+
+def codigo_tipo(tipo):
+    c = _CODIGO_TIPO.get(tipo)
+    if c is None:
+        c = _CODIGO_TIPO[tipo] = len(TIPOS_DATO)
+        TIPOS_DATO.append(tipo)
+    return c
+
+class Ligadura:
+    """
+    A qué declaración quedó ligado un nombre. La semántica la anota en cada
+    nodo var, assign y call que resuelve (node.ligadura) y cgen la lee en lugar
+    de buscar el nombre. 'clase' es 'global', 'local' o 'param'; 'slot' es el
+    desplazamiento desde $fp (None en los globales); 'param', el número de
+    parámetro (None si no es uno).
+    """
+    __slots__ = ('clase', 'slot', 'es_arreglo', 'param', 'nombre')
+
+    def __init__(self, clase, slot, es_arreglo, param, nombre):
+        self.clase = clase
+        self.slot = slot
+        self.es_arreglo = es_arreglo
+        self.param = param
+        self.nombre = nombre
+
+    def __eq__(self, otra):
+        return isinstance(otra, Ligadura) and self.campos() == otra.campos()
+
+    def __hash__(self):
+        return hash(self.campos())
+
+    def campos(self):
+        return (self.clase, self.slot, self.es_arreglo, self.param, self.nombre)
+
+    def __repr__(self):
+        return f"Ligadura{self.campos()!r}"
+
+
+def traduccion(nombres, codigo):
+    # Tabla de bytes.translate: código de otro proceso -> código de este
+    tabla = bytearray(range(256))
+    for viejo, nombre in enumerate(nombres):
+        tabla[viejo] = codigo(nombre)
+    return bytes(tabla)
+
+
+class ArbolColumnar:
+    """
+    Almacén de nodos. Los hijos de un nodo forman una lista enlazada
+    (primero -> siguiente -> ...); 'ultimo' permite agregar al final en O(1).
+    Los lexemas se internan en 'simbolos'; -1 significa None. Las ligaduras
+    (pocas, y objetos) van en un dict índice -> Ligadura.
+    """
+    def __init__(self):
+        self.kinds     = array('B')
+        self.lexemas   = array('i')
+        self.lineas    = array('i')
+        self.inicios   = array('q')
+        self.fines     = array('q')
+        self.primero   = array('i')
+        self.ultimo    = array('i')
+        self.siguiente = array('i')
+        self.tipos     = array('B')
+        self.ligaduras = {}
+        self.simbolos  = []
+        self._id_simbolo = {}
+        self.raiz = -1
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def crear(self, kind, lexeme=None, lineno=0, inicio=None, fin=None):
+        """Agrega un nodo sin hijos y devuelve su vista (misma firma que ASTNode)."""
+        i = len(self.kinds)
+        c = _CODIGO_KIND.get(kind)
+        self.kinds.append(c if c is not None else codigo_kind(kind))
+        if lexeme is None:
+            self.lexemas.append(-1)
+        else:
+            v = self._id_simbolo.get(lexeme)
+            if v is None:
+                v = self._id_simbolo[lexeme] = len(self.simbolos)
+                self.simbolos.append(lexeme)
+            self.lexemas.append(v)
+        self.lineas.append(lineno)
+        self.inicios.append(-1 if inicio is None else inicio)
+        self.fines.append(-1 if fin is None else fin)
+        self.primero.append(-1)
+        self.ultimo.append(-1)
+        self.siguiente.append(-1)
+        self.tipos.append(0)
+        return NodoColumnar(self, i)
+
+    def anexar(self, otro, kinds=None, tipos=None):
+        """
+        Copia al final los nodos de 'otro' y devuelve el índice que tomó su nodo 0.
+        Si 'otro' se armó en otro proceso, 'kinds' y 'tipos' son sus listas KINDS y
+        TIPOS_DATO (los códigos de un byte dependen del proceso).
+        """
+        base = len(self.kinds)
+        k = otro.kinds.tobytes()
+        self.kinds.frombytes(k if kinds is None else k.translate(traduccion(kinds, codigo_kind)))
+        t = otro.tipos.tobytes()
+        self.tipos.frombytes(t if tipos is None else t.translate(traduccion(tipos, codigo_tipo)))
+        ids = []
+        for lexeme in otro.simbolos:
+            v = self._id_simbolo.get(lexeme)
+            if v is None:
+                v = self._id_simbolo[lexeme] = len(self.simbolos)
+                self.simbolos.append(lexeme)
+            ids.append(v)
+        self.lexemas.extend([ids[v] if v >= 0 else -1 for v in otro.lexemas])
+        self.lineas.extend(otro.lineas)
+        self.inicios.extend(otro.inicios)
+        self.fines.extend(otro.fines)
+        for propio, ajeno in ((self.primero, otro.primero), (self.ultimo, otro.ultimo),
+                              (self.siguiente, otro.siguiente)):
+            propio.extend([v + base if v >= 0 else -1 for v in ajeno])
+        self.ligaduras.update((i + base, l) for i, l in otro.ligaduras.items())
+        return base
+
+    def agregar_hijo(self, padre, hijo):
+        # El hijo pasa a ser el último: si venía de otro padre (el índice de un
+        # 'var' que se vuelve hijo de 'assign') se corta su enlace anterior
+        self.siguiente[hijo] = -1
+        u = self.ultimo[padre]
+        if u < 0:
+            self.primero[padre] = hijo
+        else:
+            self.siguiente[u] = hijo
+        self.ultimo[padre] = hijo
+
+    def hijos(self, i):
+        res = []
+        siguiente = self.siguiente
+        c = self.primero[i]
+        while c >= 0:
+            res.append(c)
+            c = siguiente[c]
+        return res
+
+    def nodo(self, i):
+        return NodoColumnar(self, i)
+
+    # Recorridos directos sobre los arreglos, sin crear vistas
+
+    def preorden(self, i=None):
+        """Índices en preorden desde 'i' (la raíz por omisión), sin recursión."""
+        primero, siguiente = self.primero, self.siguiente
+        pila = [self.raiz if i is None else i]
+        while pila:
+            n = pila.pop()
+            yield n
+            hijos = []
+            c = primero[n]
+            while c >= 0:
+                hijos.append(c)
+                c = siguiente[c]
+            pila.extend(reversed(hijos))
+
+    def indices_de(self, kind):
+        """Todos los nodos de un tipo, recorriendo el arreglo de kinds."""
+        c = _CODIGO_KIND.get(kind)
+        if c is None:
+            return []
+        res = []
+        b = self.kinds.tobytes()
+        i = b.find(c)
+        while i >= 0:
+            res.append(i)
+            i = b.find(c, i + 1)
+        return res
+
+    def contar_kinds(self):
+        """kind -> cantidad de nodos (los nodos sueltos por recuperación de errores también)."""
+        cuenta = [0] * len(KINDS)
+        for c in self.kinds:
+            cuenta[c] += 1
+        return {KINDS[c]: n for c, n in enumerate(cuenta) if n}
+
+    def memoria(self):
+        """Bytes ocupados por los arreglos (sin contar los lexemas internados)."""
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.lexemas, self.lineas,
+                                                 self.inicios, self.fines, self.primero,
+                                                 self.ultimo, self.siguiente, self.tipos))
+
+
+def a_columnar(raiz):
+    """
+    ArbolColumnar con el árbol de 'raiz' (ASTNode o vista), incluidos el .type
+    y la .ligadura que deja la semántica. Si ya es una vista se devuelve su
+    propio almacén.
+    """
+    if isinstance(raiz, NodoColumnar):
+        return raiz.arbol
+    arbol = ArbolColumnar()
+    crear, agregar = arbol.crear, arbol.agregar_hijo
+    tipos = arbol.tipos
+    pila = [(raiz, -1)]
+    while pila:
+        n, padre = pila.pop()
+        i = crear(n.kind, n.lexeme, n.lineno, n.inicio, n.fin).i
+        tipo = getattr(n, 'type', None)
+        if tipo is not None:
+            tipos[i] = codigo_tipo(tipo)
+        ligadura = getattr(n, 'ligadura', None)
+        if ligadura is not None:
+            arbol.ligaduras[i] = ligadura
+        if padre >= 0:
+            agregar(padre, i)
+        pila.extend((c, i) for c in reversed(n.children))
+    arbol.raiz = 0
+    return arbol
+
+
+class NodoColumnar:
+    """Vista de un nodo de ArbolColumnar con la interfaz de ASTNode."""
+    __slots__ = ('arbol', 'i')
+
+    def __init__(self, arbol, i):
+        self.arbol = arbol
+        self.i = i
+
+    @property
+    def kind(self):
+        return KINDS[self.arbol.kinds[self.i]]
+
+    @property
+    def lexeme(self):
+        v = self.arbol.lexemas[self.i]
+        return None if v < 0 else self.arbol.simbolos[v]
+
+    @property
+    def lineno(self):
+        return self.arbol.lineas[self.i]
+
+    @property
+    def inicio(self):
+        v = self.arbol.inicios[self.i]
+        return None if v < 0 else v
+
+    @inicio.setter
+    def inicio(self, v):
+        self.arbol.inicios[self.i] = -1 if v is None else v
+
+    @property
+    def fin(self):
+        v = self.arbol.fines[self.i]
+        return None if v < 0 else v
+
+    @fin.setter
+    def fin(self, v):
+        self.arbol.fines[self.i] = -1 if v is None else v
+
+    @property
+    def type(self):
+        return TIPOS_DATO[self.arbol.tipos[self.i]]
+
+    @type.setter
+    def type(self, t):
+        self.arbol.tipos[self.i] = codigo_tipo(t)
+
+    @property
+    def ligadura(self):
+        return self.arbol.ligaduras.get(self.i)
+
+    @ligadura.setter
+    def ligadura(self, l):
+        if l is None:
+            self.arbol.ligaduras.pop(self.i, None)
+        else:
+            self.arbol.ligaduras[self.i] = l
+
+    @property
+    def children(self):
+        arbol = self.arbol
+        return [NodoColumnar(arbol, c) for c in arbol.hijos(self.i)]
+
+    def add(self, node):
+        if node:
+            if isinstance(node, list):
+                for n in node:
+                    self.arbol.agregar_hijo(self.i, n.i)
+            else:
+                self.arbol.agregar_hijo(self.i, node.i)
+
+    def __eq__(self, otro):
+        return isinstance(otro, NodoColumnar) and otro.i == self.i and otro.arbol is self.arbol
+
+    def __hash__(self):
+        return hash((id(self.arbol), self.i))
+
+    def __repr__(self, lvl=0):
+        s = io.StringIO()
+        imprimir_ast(self, s, lvl)
+        return s.getvalue()
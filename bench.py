@@ -0,0 +1,816 @@
+# bench.py
+# Mediciones de rendimiento del compilador sobre programas C- generados.
+# Uso: python bench.py lexer|tokens|errores|edicion|parser|ast|volcado|cache|incremental|paralelo|semantica|funciones|ambitos|referencias|recorrido|emision|registros|ir|plegado|mirilla [funciones]
+
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import io
+
+import lexer
+import volcado
+from parser import Parser
+from parser_ll1 import ParserLL1
+from globalTypes import *
+
+
+# Programa sintético: muchas funciones con comentarios, arreglos, ciclos y llamadas
+
+def generar_programa(funciones=2000):
+    partes = ["/* Programa generado para mediciones */\n\n", "int global[10];\n\n"]
+    for i in range(funciones):
+        partes.append(
+            f"/* Función número {i}\n"
+            f"   con un comentario de varias líneas\n"
+            f"   para ejercitar el estado INCOMMENT */\n"
+            f"int f{_sufijo(i)}(int arr[], int n) {{\n"
+            f"    int i;\n"
+            f"    int acc;\n"
+            f"    int tmp[4];\n"
+            f"    i = 0;\n"
+            f"    acc = {i % 97};\n"
+            f"    while (i < n) {{\n"
+            f"        if (arr[i] >= acc) {{\n"
+            f"            acc = acc + arr[i] * 2 - (i / 3);\n"
+            f"        }} else {{\n"
+            f"            tmp[i - (i / 4) * 4] = acc;\n"
+            f"        }}\n"
+            f"        i = i + 1;\n"
+            f"    }}\n"
+            f"    return acc;\n"
+            f"}}\n\n"
+        )
+    partes.append(
+        "void main(void) {\n"
+        "    int datos[10];\n"
+        "    int k;\n"
+        "    k = 0;\n"
+        "    while (k < 10) {\n"
+        "        datos[k] = input();\n"
+        "        k = k + 1;\n"
+        "    }\n"
+        f"    output(f{_sufijo(0)}(datos, 10));\n"
+        "}\n"
+    )
+    return "".join(partes)
+
+def _sufijo(i):
+    # Los identificadores de C- sólo llevan letras: codificamos el número en base 26
+    s = ""
+    while True:
+        s = chr(ord('a') + i % 26) + s
+        i //= 26
+        if i == 0:
+            return s
+
+
+def contar_tokens(motor, prog):
+    lx = lexer.Lexer()
+    lx.globales(prog, 0, len(prog))
+    funcion = getattr(lx, motor)
+    n = 0
+    inicio = time.perf_counter()
+    while True:
+        tok, _ = funcion(False)
+        n += 1
+        if tok == TokenType.ENDFILE:
+            break
+    return n, time.perf_counter() - inicio
+
+
+def bench_lexer(funciones=2000):
+    prog = generar_programa(funciones) + '$'
+    print(f"Programa de {len(prog) / 1e6:.2f} MB")
+    resultados = {}
+    for nombre, motor in (("autómata", "getTokenAutomata"), ("regex", "getToken")):
+        n, t = contar_tokens(motor, prog)
+        resultados[nombre] = n / t
+        print(f"  {nombre:10s} {n:9d} tokens  {t:7.3f} s  {n / t:12,.0f} tokens/s")
+    print(f"  aceleración: {resultados['regex'] / resultados['autómata']:.1f}x")
+
+
+def bench_tokens(funciones=2000):
+    # getToken uno por uno contra tokenize() en bloque, y el parser sobre cada uno
+    fuente = generar_programa(funciones)
+    prog = fuente + '$'
+    print(f"Programa de {len(prog) / 1e6:.2f} MB")
+    n, t_uno = contar_tokens("getToken", prog)
+    inicio = time.perf_counter()
+    flujo = lexer.tokenize(fuente)
+    t_bloque = time.perf_counter() - inicio
+    print(f"  getToken   {n:9d} tokens  {t_uno:7.3f} s  {n / t_uno:12,.0f} tokens/s")
+    print(f"  tokenize   {len(flujo):9d} tokens  {t_bloque:7.3f} s  {len(flujo) / t_bloque:12,.0f} tokens/s"
+          f"  (sin comentarios)")
+
+    p = Parser(salida=io.StringIO())
+    p.globales(prog, 0, len(prog))
+    inicio = time.perf_counter()
+    p.parse(False)
+    t_parse_uno = time.perf_counter() - inicio
+    p = Parser(salida=io.StringIO())
+    inicio = time.perf_counter()
+    p.globales_tokens(lexer.tokenize(fuente))
+    p.parse(False)
+    t_parse_bloque = time.perf_counter() - inicio
+    print(f"  parse con getToken        {t_parse_uno:7.3f} s")
+    print(f"  parse con TokenStream     {t_parse_bloque:7.3f} s  (incluye tokenize)")
+
+
+def bench_errores(funciones=2000):
+    # Programa "minificado" en una sola línea con un error de sintaxis por función:
+    # mide el costo de armar miles de diagnósticos (línea, columna, texto)
+    from sesion import CompilerSession
+    limpio = generar_programa(funciones).replace("\n", " ")
+    fuente = generar_programa(funciones).replace("acc = acc + arr[i]", "acc = acc + arr[i] + ;")
+    fuente = fuente.replace("\n", " ")
+    p = Parser(salida=io.StringIO())
+    inicio = time.perf_counter()
+    p.globales_tokens(lexer.tokenize(fuente))
+    p.parse(False)
+    t = time.perf_counter() - inicio
+    texto = p.salida.getvalue()
+    print(f"  {texto.count('Línea ')} diagnósticos  {len(texto) / 1e6:8.2f} MB de texto  {t:7.3f} s")
+    # Front end completo: sin errores contra con errores, con y sin límite
+    casos = (("sin errores", limpio, {}), ("con errores", fuente, {}),
+             ("límite 100", fuente, {'limite': 100}), ("parar en 100", fuente, {'parar_en': 100}))
+    for nombre, prog, opciones in casos:
+        fases = CompilerSession(io.StringIO())
+        for k, v in opciones.items():
+            setattr(fases.parser.diagnosticos, k, v)
+        inicio = time.perf_counter()
+        fases.globales_tokens(prog)
+        fases.semantica.semantica(fases.parser.parse(False), False)
+        t = time.perf_counter() - inicio
+        print(f"  {nombre:14s} {fases.parser.diagnosticos.errores:6d} errores  {t:7.3f} s")
+
+
+def bench_edicion(funciones=2000):
+    # Simula escribir en un editor: cada tecla es una edición de un carácter en
+    # el cursor, y el flujo de tokens se actualiza con TokenStream.editar()
+    fuente = generar_programa(funciones)
+    flujo = lexer.tokenize(fuente)
+    print(f"Programa de {len(fuente) / 1e6:.2f} MB, {len(flujo)} tokens")
+    inicio = time.perf_counter()
+    lexer.tokenize(fuente)
+    t_total = time.perf_counter() - inicio
+
+    # El editor ya tiene su buffer actualizado en cada tecla: lo armamos antes
+    cursor = fuente.index("return acc;", len(fuente) // 2)
+    texto = "acc = acc + 1; /* ajuste */ "
+    teclas, buf = [], fuente
+    for i, c in enumerate(texto):
+        buf = buf[:cursor + i] + c + buf[cursor + i:]
+        teclas.append((cursor + i, 0, c, buf))
+    for i in reversed(range(len(texto))):
+        buf = buf[:cursor + i] + buf[cursor + i + 1:]
+        teclas.append((cursor + i, 1, "", buf))
+
+    inicio = time.perf_counter()
+    for offset, borrados, insertado, buf in teclas:
+        flujo.editar(offset, borrados, insertado, buf)
+    t_tecla = (time.perf_counter() - inicio) / len(teclas)
+    print(f"  tokenize completo   {t_total * 1e3:9.3f} ms")
+    print(f"  editar por tecla    {t_tecla * 1e3:9.3f} ms  ({t_total / t_tecla:,.0f}x)")
+
+
+def bench_parser(funciones=2000):
+    # Descendente recursivo contra LL(1) con pila explícita: programa normal y
+    # expresiones/bloques anidados a una profundidad que agota la pila de Python
+    flujo = lexer.tokenize(generar_programa(funciones))
+    print(f"Programa de {len(flujo)} tokens")
+    for nombre, clase in (("recursivo", Parser), ("LL(1)", ParserLL1)):
+        p = clase(salida=io.StringIO())
+        p.globales_tokens(flujo)
+        inicio = time.perf_counter()
+        p.parse(False)
+        print(f"  {nombre:10s} {time.perf_counter() - inicio:7.3f} s")
+    prof = 10000
+    profundos = {
+        "paréntesis": "void main(void){ int x; x = " + "(" * prof + "1" + ")" * prof + "; }",
+        "bloques": "void main(void){ " + "{" * prof + "}" * prof + " }",
+    }
+    for caso, fuente in profundos.items():
+        for nombre, clase in (("recursivo", Parser), ("LL(1)", ParserLL1)):
+            p = clase(salida=io.StringIO())
+            p.globales_tokens(lexer.tokenize(fuente))
+            try:
+                inicio = time.perf_counter()
+                p.parse(False)
+                print(f"  {caso} x{prof}  {nombre:10s} {time.perf_counter() - inicio:7.3f} s")
+            except RecursionError:
+                print(f"  {caso} x{prof}  {nombre:10s} RecursionError")
+
+
+def bench_ast(funciones=2000):
+    # ASTNode contra ArbolColumnar: memoria retenida por el árbol, tiempo de
+    # construcción (parse completo) y un recorrido preorden de todo el árbol
+    flujo = lexer.tokenize(generar_programa(funciones))
+    print(f"Programa de {len(flujo)} tokens")
+    for nombre, columnar in (("ASTNode", False), ("columnar", True)):
+        p = ParserLL1(salida=io.StringIO(), columnar=columnar)
+        p.globales_tokens(flujo)
+        inicio = time.perf_counter()
+        p.parse(False)
+        t_parse = time.perf_counter() - inicio
+        # Segunda pasada con tracemalloc (lo que queda vivo es el árbol)
+        p.globales_tokens(flujo)
+        gc.collect()
+        tracemalloc.start()
+        raiz = p.parse(False)
+        memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        inicio = time.perf_counter()
+        if columnar:
+            nodos = sum(1 for _ in p.arbol.preorden())
+        else:
+            nodos, pila = 0, [raiz]
+            while pila:
+                n = pila.pop()
+                nodos += 1
+                pila.extend(n.children)
+        t_recorrido = time.perf_counter() - inicio
+        print(f"  {nombre:9s} {nodos} nodos  {memoria / nodos:6.1f} bytes/nodo  "
+              f"parse {t_parse:6.3f} s  recorrido {t_recorrido:6.3f} s")
+        del raiz, p
+
+
+def _repr_concatenado(nodo, lvl=0):
+    # El ASTNode.__repr__ anterior, como referencia: recursivo y con s +=
+    s = '  ' * lvl + nodo.kind
+    if nodo.lexeme is not None:
+        s += f": {nodo.lexeme}"
+    s += "\n"
+    for c in nodo.children:
+        s += _repr_concatenado(c, lvl + 1)
+    return s
+
+
+def bench_volcado(funciones=2000):
+    # Volcado del AST: concatenación recursiva contra imprimir_ast() y json_ast()
+    # escribiendo a un archivo temporal
+    flujo = lexer.tokenize(generar_programa(funciones))
+    p = ParserLL1(salida=io.StringIO())
+    p.globales_tokens(flujo)
+    raiz = p.parse(False)
+    print(f"Programa de {len(flujo)} tokens")
+    with tempfile.TemporaryFile('w') as f:
+        inicio = time.perf_counter()
+        f.write(_repr_concatenado(raiz))
+        print(f"  concatenado   {time.perf_counter() - inicio:7.3f} s")
+        f.seek(0)
+        inicio = time.perf_counter()
+        volcado.imprimir_ast(raiz, f)
+        print(f"  imprimir_ast  {time.perf_counter() - inicio:7.3f} s")
+        f.seek(0)
+        inicio = time.perf_counter()
+        volcado.volcar_json(raiz, f)
+        print(f"  volcar_json   {time.perf_counter() - inicio:7.3f} s")
+    prof = 10000
+    p.globales_tokens(lexer.tokenize("void main(void){ int x; x = " + "1 + " * prof + "1; }"))
+    raiz = p.parse(False)
+    for nombre, volcar in (("concatenado", lambda r, f: f.write(_repr_concatenado(r))),
+                           ("imprimir_ast", volcado.imprimir_ast)):
+        try:
+            inicio = time.perf_counter()
+            volcar(raiz, io.StringIO())
+            print(f"  suma x{prof}  {nombre:12s} {time.perf_counter() - inicio:7.3f} s")
+        except RecursionError:
+            print(f"  suma x{prof}  {nombre:12s} RecursionError")
+
+
+def bench_cache(funciones=2000):
+    # Front-end completo (tokens + parser + semántica) contra cargar el árbol
+    # anotado de la caché en disco
+    from sesion import CompilerSession
+    from cache_ast import CacheAST
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, "prog.c-")
+        with open(ruta, "w") as f:
+            f.write(generar_programa(funciones))
+        cache = CacheAST(os.path.join(d, "cache"))
+        clave = cache.clave(ruta)
+        inicio = time.perf_counter()
+        fases = CompilerSession(io.StringIO())
+        with open(ruta) as f:
+            fases.globales_tokens(f.read())
+        ast = fases.parser.parse(False)
+        fases.semantica.semantica(ast, False)
+        t_fases = time.perf_counter() - inicio
+        cache.guardar(clave, ast, "")
+        inicio = time.perf_counter()
+        cache.cargar(clave)
+        t_carga = time.perf_counter() - inicio
+        tam = os.path.getsize(cache._ruta(clave))
+        print(f"  lexer+parser+semántica {t_fases:7.3f} s")
+        print(f"  carga de la caché      {t_carga:7.3f} s  ({tam / 1e6:.1f} MB, x{t_fases / t_carga:.0f})")
+
+
+def bench_funciones(funciones=2000):
+    # semántica + cgen después de editar una función: sin caché, con la caché
+    # por función vacía y con la caché que dejó la compilación anterior (en
+    # memoria y leída del disco)
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo
+    from cache_funciones import CacheFunciones
+    fuente = generar_programa(funciones)
+    # La edición cambia una constante y agrega una línea: las funciones que
+    # siguen se corren de lugar pero no cambian
+    medio = fuente.index(f"acc = {(funciones // 2) % 97};", fuente.index(f"int f{_sufijo(funciones // 2)}("))
+    editada = fuente[:medio] + "acc = 12345;\n    " + fuente[medio:]
+
+    def compilar(texto, cache):
+        p = ParserLL1(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(texto))
+        arbol = p.parse(False)
+        inicio = time.perf_counter()
+        s = AnalizadorSemantico(p, io.StringIO())
+        s.cache = cache
+        s.semantica(arbol, False)
+        g = GeneradorCodigo()
+        g.cache = cache
+        g.generar(arbol, io.StringIO())
+        return time.perf_counter() - inicio
+
+    print(f"Programa de {fuente.count(chr(10))} líneas, {funciones + 1} funciones")
+    t_sin = compilar(editada, None)
+    print(f"  sin caché              {t_sin:7.3f} s")
+    cache = CacheFunciones()
+    t = compilar(fuente, cache)
+    print(f"  caché vacía            {t:7.3f} s")
+    cache.aciertos = dict.fromkeys(cache.aciertos, 0)
+    cache.fallos = dict.fromkeys(cache.fallos, 0)
+    t = compilar(editada, cache)
+    print(f"  una función editada    {t:7.3f} s  x{t_sin / t:.1f}  "
+          f"aciertos {cache.aciertos}  fallos {cache.fallos}")
+    with tempfile.TemporaryDirectory() as d:
+        cache.archivo = os.path.join(d, "funciones.cache")
+        cache._cambios = True
+        cache.guardar()
+        tam = os.path.getsize(cache.archivo)
+        de_disco = CacheFunciones(cache.archivo)
+        inicio = time.perf_counter()
+        de_disco.leer()
+        t_leer = time.perf_counter() - inicio
+        t = compilar(editada, de_disco)
+    print(f"  leída del disco        {t:7.3f} s  x{t_sin / t:.1f}  (lectura {t_leer:.3f} s, {tam / 1e6:.1f} MB)")
+
+
+def bench_incremental(funciones=2000):
+    # Tecla por tecla dentro de una función: front end completo contra
+    # FrontEndIncremental (editar + diagnosticos) en programas de varios tamaños
+    from sesion import CompilerSession
+    from incremental import FrontEndIncremental
+    for n in (funciones // 10, funciones, funciones * 4):
+        fuente = generar_programa(n)
+        inicio = time.perf_counter()
+        fases = CompilerSession(io.StringIO())
+        fases.globales_tokens(fuente)
+        fases.semantica.semantica(fases.parser.parse(False), False)
+        t_total = time.perf_counter() - inicio
+        fe = FrontEndIncremental(fuente)
+        # El editor ya tiene su buffer actualizado en cada tecla: lo armamos antes
+        cursor = fuente.index("return acc;", len(fuente) // 2)
+        texto = "acc = acc + 1; " * 4
+        teclas, buf = [], fuente
+        for i, c in enumerate(texto):
+            buf = buf[:cursor + i] + c + buf[cursor + i:]
+            teclas.append((cursor + i, c, buf))
+        gc.collect()
+        inicio = time.perf_counter()
+        for offset, c, buf in teclas:
+            fe.editar(offset, 0, c, buf)
+            fe.diagnosticos()
+        t_tecla = (time.perf_counter() - inicio) / len(texto)
+        print(f"  {fuente.count(chr(10)):7d} líneas  completo {t_total * 1e3:8.1f} ms  "
+              f"por tecla {t_tecla * 1e3:6.2f} ms")
+
+
+def bench_paralelo(funciones=2000):
+    # Tokens + parser en serie contra paralelo.parsear_paralelo con distinta
+    # cantidad de procesos (el pool se crea antes de medir)
+    from concurrent.futures import ProcessPoolExecutor
+    from paralelo import parsear_paralelo
+    fuente = generar_programa(funciones * 4)
+    print(f"Programa de {fuente.count(chr(10))} líneas, {os.cpu_count()} CPU")
+    p = ParserLL1(salida=io.StringIO())
+    inicio = time.perf_counter()
+    p.globales_tokens(lexer.tokenize(fuente))
+    p.parse(False)
+    t_serie = time.perf_counter() - inicio
+    print(f"  en serie       {t_serie:7.3f} s")
+    trabajadores = 1
+    while trabajadores <= max(os.cpu_count() or 1, 4):
+        with ProcessPoolExecutor(trabajadores) as pool:
+            pool.submit(int).result()   # arranque de los procesos
+            p = ParserLL1(salida=io.StringIO())
+            inicio = time.perf_counter()
+            parsear_paralelo(p, fuente, trabajadores, False, umbral=0, pool=pool)
+            t = time.perf_counter() - inicio
+        print(f"  {trabajadores:3d} procesos  {t:7.3f} s  x{t_serie / t:.2f}")
+        trabajadores *= 2
+
+
+def bench_semantica(funciones=2000):
+    # semantica() en serie contra el paso 2 repartido entre procesos
+    # (paralelo.chequear_paralelo); aquí el tiempo incluye crear el pool
+    from semantica import AnalizadorSemantico
+    fuente = generar_programa(funciones * 4)
+    print(f"Programa de {fuente.count(chr(10))} líneas, {os.cpu_count()} CPU")
+    p = ParserLL1(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize(fuente))
+    arbol = p.parse(False)
+    t_serie = None
+    trabajadores = 1
+    while trabajadores <= max(os.cpu_count() or 1, 4):
+        s = AnalizadorSemantico(p, io.StringIO())
+        inicio = time.perf_counter()
+        s.semantica(arbol, False, trabajadores)
+        t = time.perf_counter() - inicio
+        t_serie = t_serie or t
+        print(f"  {trabajadores:3d} procesos  {t:7.3f} s  x{t_serie / t:.2f}")
+        trabajadores *= 2
+
+
+def _programa_anidado(prof, usos=20):
+    # main con 'prof' bloques anidados; cada uno declara una variable y usa la
+    # global y la del bloque anterior 'usos' veces
+    partes = ["int g;\nvoid main(void) {\n int v;\n"]
+    for k in range(prof):
+        partes.append(f"{{ int v{_sufijo(k)};\n")
+        ant = f"v{_sufijo(k - 1)}" if k else "v"
+        partes.extend(f"v{_sufijo(k)} = {ant} + g;\n" for _ in range(usos))
+    partes.append("}" * prof + "\n}\n")
+    return "".join(partes)
+
+
+def bench_ambitos(funciones=2000):
+    # Semántica sobre bloques anidados: TablaSimbolos contra recorrer la pila de
+    # ámbitos en cada búsqueda, por uso de variable y a distintas profundidades
+    from semantica import AnalizadorSemantico
+
+    class Recorriendo(AnalizadorSemantico):
+        def lookup_symbol(self, name):
+            for scope in reversed(self.depth):
+                if name in scope:
+                    return scope[name]
+            return None
+
+    for prof in (10, 50, 200):
+        p = Parser(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(_programa_anidado(prof, max(1, funciones // prof))))
+        arbol = p.parse(False)
+        usos = 3 * prof * max(1, funciones // prof)
+        tiempos = []
+        for clase in (AnalizadorSemantico, Recorriendo):
+            s = clase(p, io.StringIO())
+            mejor = float('inf')
+            for _ in range(3):
+                inicio = time.perf_counter()
+                s.semantica(arbol, False)
+                mejor = min(mejor, time.perf_counter() - inicio)
+            tiempos.append(mejor / usos * 1e6)
+        print(f"  profundidad {prof:4d}  tabla {tiempos[0]:6.2f} us/uso  "
+              f"recorriendo {tiempos[1]:6.2f} us/uso")
+
+
+def bench_referencias(funciones=2000):
+    # Índice de referencias (referencias.py) contra una lista de líneas por
+    # símbolo: memoria de los usos y tiempo de las consultas
+    from semantica import AnalizadorSemantico
+
+    p = Parser(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize(generar_programa(funciones)))
+    arbol = p.parse(False)
+    s = AnalizadorSemantico(p, io.StringIO())
+    s.semantica(arbol, False)
+    indice = s.indice
+    simbolos = indice.simbolos
+    print(f"  {len(simbolos)} símbolos, {len(indice)} apariciones")
+
+    # Las mismas apariciones como listas por símbolo (lo que guardaba SymbolInfoExtended.lines)
+    tracemalloc.start()
+    listas = [[indice.linea[i] for i in indice.apariciones(info)] for info in simbolos]
+    mem_listas = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  usos en listas   {mem_listas / 1024:8.1f} KiB")
+    print(f"  usos en índice   {indice.memoria() / 1024:8.1f} KiB")
+
+    ultima = max(indice.linea)
+    rangos = [(a, a + 20) for a in range(1, ultima, max(1, ultima // 200))]
+    for nombre, por_simbolo, por_lineas in (
+            ("listas", lambda: [sorted(set(l)) for l in listas],
+                       lambda: [[(simbolos[k], ln) for k, l in enumerate(listas) for ln in l if a <= ln <= b]
+                                for a, b in rangos]),
+            ("índice", lambda: [list(indice.lineas(info)) for info in simbolos],
+                       lambda: [list(indice.en_lineas(a, b)) for a, b in rangos])):
+        inicio = time.perf_counter()
+        por_simbolo()
+        medio = time.perf_counter()
+        por_lineas()
+        fin = time.perf_counter()
+        print(f"  {nombre:7s}  líneas por símbolo {(medio - inicio) * 1e3:8.1f} ms   "
+              f"{len(rangos)} rangos de líneas {(fin - medio) * 1e3:8.1f} ms")
+
+
+def bench_recorrido(funciones=2000):
+    # Semántica y cgen sobre recorrido.py: tiempo de cada pasada y anidamientos
+    # que con la recursión de antes pasaban el límite de Python
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo
+
+    p = Parser(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize(generar_programa(funciones)))
+    arbol = p.parse(False)
+    for nombre, pasada in (("semantica", lambda: AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)),
+                           ("cgen", lambda: GeneradorCodigo().generar(arbol, io.StringIO()))):
+        mejor = float('inf')
+        for _ in range(5):
+            inicio = time.perf_counter()
+            pasada()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        print(f"  {nombre:10s} {mejor * 1e3:8.1f} ms")
+
+    prof = 4 * sys.getrecursionlimit()
+    for caso, fuente in (("bloques", _programa_anidado(prof, 1)),
+                         ("paréntesis", "int main(void) { int x; x = " + "(" * prof + "1"
+                                        + " + 1)" * prof + "; output(x); }")):
+        p = ParserLL1(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(fuente))
+        arbol = p.parse(False)
+        inicio = time.perf_counter()
+        AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+        GeneradorCodigo().generar(arbol, io.StringIO())
+        print(f"  {prof} niveles de {caso:10s} {(time.perf_counter() - inicio) * 1e3:8.1f} ms")
+
+
+def bench_emision(funciones=2000):
+    # cgen a un archivo en cada nivel de emisión: tiempo, tamaño y líneas de
+    # output.s, y cuántas llamadas a write() hace cada uno
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo, NIVELES
+
+    class Contador(io.StringIO):
+        escrituras = 0
+
+        def write(self, s):
+            self.escrituras += 1
+            return super().write(s)
+
+    p = Parser(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize(generar_programa(funciones)))
+    arbol = p.parse(False)
+    AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, 'output.s')
+        for nombre, nivel in NIVELES.items():
+            gen = GeneradorCodigo()
+            gen.nivel = nivel
+            mejor = float('inf')
+            for _ in range(5):
+                inicio = time.perf_counter()
+                gen.codeGen(arbol, ruta)
+                mejor = min(mejor, time.perf_counter() - inicio)
+            contador = Contador()
+            gen.generar(arbol, contador)
+            texto = contador.getvalue()
+            print(f"  {nombre:8s} {mejor * 1e3:8.1f} ms  {len(texto) / 1024:9.1f} KiB"
+                  f"  {texto.count(chr(10)):8d} líneas  {contador.escrituras:6d} write()")
+
+
+def _programa_presion(prof):
+    # Una expresión con 'prof' operandos vivos a la vez y una llamada en cada
+    # nivel: más valores que registros, y todos cruzan un jal
+    e = "f(x)"
+    for k in range(prof):
+        e = f"(x * {k + 1} - y) + ({e})"
+    return ("int f(int a) { return a + 1; }\n"
+            "void main(void) { int x; int y; x = input(); y = input();\n"
+            f"    output({e});\n}}\n")
+
+
+def bench_registros(funciones=2000):
+    # Asignación de registros de cgen: tiempo y cuántas instrucciones, cargas
+    # y guardados de la pila emite, y cuántas usan un registro derramado
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo, RELEASE
+
+    for nombre, fuente in (("programa", generar_programa(funciones)),
+                           ("presión 60", _programa_presion(60))):
+        p = Parser(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(fuente))
+        arbol = p.parse(False)
+        AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+        gen = GeneradorCodigo()
+        gen.nivel = RELEASE
+        mejor = float('inf')
+        for _ in range(5):
+            salida = io.StringIO()
+            inicio = time.perf_counter()
+            gen.generar(arbol, salida)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        instrucciones = [l for l in salida.getvalue().splitlines()
+                         if l and not l.endswith(':') and not l.startswith('.')]
+        memoria = sum(l.startswith(('lw ', 'sw ')) for l in instrucciones)
+        derrames = sum('$t8' in l or '$t9' in l for l in instrucciones)
+        print(f"  {nombre:10s} {mejor * 1e3:8.1f} ms  {len(instrucciones):8d} instrucciones"
+              f"  {memoria:7d} lw/sw  {derrames:5d} con derrames")
+
+
+
+def bench_ir(funciones=2000):
+    # Bajada al IR de tres direcciones: funciones e instrucciones del IR por
+    # segundo, lo que cuesta volcarlo y la reusada de valores, y la selección
+    # (con la asignación de registros) contra cgen directo
+    import ir
+    import seleccion
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo, CodeEmitter, RELEASE
+
+    p = Parser(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize(generar_programa(funciones)))
+    arbol = p.parse(False)
+    AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+    decls = [d for d in arbol.children if d.kind == 'fun_decl']
+
+    def medir(f):
+        mejor = float('inf')
+        for _ in range(5):
+            inicio = time.perf_counter()
+            r = f()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, r
+
+    t_bajar, bajadas = medir(lambda: [ir.bajar(d) for d in decls])
+    total = sum(f.instrucciones() for f in bajadas)
+    print(f"  bajar    {t_bajar * 1e3:8.1f} ms  {len(decls) / t_bajar:10.0f} funciones/s"
+          f"  {total / t_bajar:10.0f} instr IR/s  ({total} instrucciones,"
+          f" {sum(len(f.bloques) for f in bajadas)} bloques)")
+    t_volcar, _ = medir(lambda: [ir.volcar(f) for f in bajadas])
+    print(f"  volcar   {t_volcar * 1e3:8.1f} ms")
+    inicio = time.perf_counter()
+    quitadas = sum(ir.reusar_valores(f) for f in bajadas)
+    t_reusar = time.perf_counter() - inicio
+    print(f"  reusar   {t_reusar * 1e3:8.1f} ms  {quitadas} instrucciones quitadas")
+
+    for nombre, con_ir in (("cgen", False), ("seleccion", True)):
+        gen = GeneradorCodigo()
+        gen.nivel = RELEASE
+        gen.ir = con_ir
+
+        def traducir():
+            emitter = CodeEmitter(io.StringIO(), RELEASE)
+            if con_ir:
+                for f in bajadas:
+                    seleccion.seleccionar(f, gen, emitter)
+            else:
+                for d in decls:
+                    gen.generate_code(d, emitter)
+            return emitter
+        t, emitter = medir(traducir)
+        emitter.volcar()
+        instrucciones = [l for l in emitter.file.getvalue().splitlines()
+                         if l and not l.endswith(':') and not l.startswith('.')]
+        print(f"  {nombre:9s}{t * 1e3:8.1f} ms  {len(instrucciones):8d} instrucciones")
+
+
+
+def _programa_constantes(funciones):
+    # Funciones con constantes por plegar: literales, identidades y cadenas
+    # con constantes entre los términos
+    partes = []
+    for k in range(funciones):
+        partes.append(
+            f"int c{_sufijo(k)}(int a, int b) {{\n"
+            f"    int i; int s;\n"
+            f"    i = 0; s = 2 * 4 + {k % 7};\n"
+            f"    while (i < 10 * 10) {{\n"
+            f"        s = s + a * 1 + 0 + i - i;\n"
+            f"        s = a + 1 + b + 2 + s * 1;\n"
+            f"        i = i + 1 + 0;\n"
+            f"    }}\n"
+            f"    return s + b * 0 + (3 - 3) * a;\n"
+            f"}}\n")
+    partes.append(f"void main(void) {{ output(c{_sufijo(0)}(input(), input())); }}\n")
+    return "".join(partes)
+
+
+def bench_plegado(funciones=2000):
+    # Plegado de constantes (plegado.py): lo que tarda plegar() y las
+    # instrucciones que emite cgen sin y con el plegado
+    import plegado
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo, RELEASE
+
+    for nombre, fuente in (("programa", generar_programa(funciones)),
+                           ("constantes", _programa_constantes(funciones))):
+        p = Parser(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(fuente))
+        arbol = p.parse(False)
+        AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+        decls = [d for d in arbol.children if d.kind == 'fun_decl']
+        inicio = time.perf_counter()
+        reemplazos = sum(len(plegado.plegar(d)) for d in decls)
+        t_plegar = time.perf_counter() - inicio
+        cuentas = []
+        for plegar in (False, True):
+            gen = GeneradorCodigo()
+            gen.nivel = RELEASE
+            gen.plegar = plegar
+            salida = io.StringIO()
+            gen.generar(arbol, salida)
+            cuentas.append(sum(1 for l in salida.getvalue().splitlines()
+                               if l and not l.endswith(':') and not l.startswith('.')))
+        antes, despues = cuentas
+        print(f"  {nombre:10s} plegar {t_plegar * 1e3:7.1f} ms  {reemplazos:6d} reemplazos"
+              f"  {antes:8d} -> {despues:8d} instrucciones ({(despues - antes) / len(decls):+.1f} por función)")
+
+    # Una cadena con efectos no se simplifica: en a + (a = 1) - a las dos 'a'
+    # valen distinto (con f(7) imprime 7) y x - x no se puede quitar
+    p = Parser(salida=io.StringIO())
+    p.globales_tokens(lexer.tokenize("int f(int a) { output(a + (a = 1) - a); return a; }\n"
+                                     "void main(void) { f(7); }"))
+    arbol = p.parse(False)
+    AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+    reemplazos = plegado.plegar(arbol.children[0])
+    print(f"  efectos    a + (a = 1) - a {'sin cambios' if not reemplazos else 'MAL PLEGADO'}")
+
+
+def bench_mirilla(funciones=2000):
+    # Optimización de mirilla (mirilla.py): lo que tarda cgen sin y con ella,
+    # las instrucciones que quedan y cuántas veces se aplicó cada regla
+    import mirilla
+    from semantica import AnalizadorSemantico
+    from cgen import GeneradorCodigo, RELEASE
+
+    for nombre, fuente in (("programa", generar_programa(funciones)),
+                           ("constantes", _programa_constantes(funciones))):
+        p = Parser(salida=io.StringIO())
+        p.globales_tokens(lexer.tokenize(fuente))
+        arbol = p.parse(False)
+        AnalizadorSemantico(p, io.StringIO()).semantica(arbol, False)
+        tiempos, cuentas = [], []
+        for optimizador in (None, mirilla.Mirilla()):
+            gen = GeneradorCodigo()
+            gen.nivel = RELEASE
+            gen.mirilla = optimizador
+            salida = io.StringIO()
+            inicio = time.perf_counter()
+            gen.generar(arbol, salida)
+            tiempos.append(time.perf_counter() - inicio)
+            cuentas.append(sum(1 for l in salida.getvalue().splitlines()
+                               if l and not l.endswith(':') and not l.startswith('.')))
+        print(f"  {nombre:10s} cgen {tiempos[0]:.3f} s -> {tiempos[1]:.3f} s"
+              f"  {cuentas[0]:8d} -> {cuentas[1]:8d} instrucciones")
+        for linea in optimizador.informe():
+            print(f"    {linea}")
+
+
+if __name__ == "__main__":
+    caso = sys.argv[1] if len(sys.argv) > 1 else "lexer"
+    tam = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    if caso == "lexer":
+        bench_lexer(tam)
+    elif caso == "tokens":
+        bench_tokens(tam)
+    elif caso == "errores":
+        bench_errores(tam)
+    elif caso == "edicion":
+        bench_edicion(tam)
+    elif caso == "parser":
+        bench_parser(tam)
+    elif caso == "ast":
+        bench_ast(tam)
+    elif caso == "volcado":
+        bench_volcado(tam)
+    elif caso == "cache":
+        bench_cache(tam)
+    elif caso == "incremental":
+        bench_incremental(tam)
+    elif caso == "paralelo":
+        bench_paralelo(tam)
+    elif caso == "semantica":
+        bench_semantica(tam)
+    elif caso == "funciones":
+        bench_funciones(tam)
+    elif caso == "ambitos":
+        bench_ambitos(tam)
+    elif caso == "referencias":
+        bench_referencias(tam)
+    elif caso == "recorrido":
+        bench_recorrido(tam)
+    elif caso == "emision":
+        bench_emision(tam)
+    elif caso == "registros":
+        bench_registros(tam)
+    elif caso == "ir":
+        bench_ir(tam)
+    elif caso == "plegado":
+        bench_plegado(tam)
+    elif caso == "mirilla":
+        bench_mirilla(tam)
+    else:
+        print(f"Caso desconocido: {caso}")
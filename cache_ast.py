@@ -0,0 +1,223 @@
+# cache_ast.py
+# Caché en disco del AST ya analizado y anotado por la semántica. La clave es el
+# hash del archivo fuente más la versión del compilador; cada entrada guarda los
+# arreglos de un ArbolColumnar (ver arbol.py) y el texto que imprimieron el parser
+# y la semántica, así que una compilación repetida va directo a cgen con la misma
+# salida. Cuando el directorio pasa del límite se borran las entradas usadas hace
+# más tiempo (la fecha de modificación del archivo marca el último uso).
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import arbol
+from arbol import ArbolColumnar, Ligadura, NodoColumnar, a_columnar
+
+DIRECTORIO_CACHE = '.cache_ast'
+LIMITE_CACHE = 64 * 1024 * 1024   # bytes
+
+# Formato de una entrada: MAGIA, cabecera y luego las secciones en este orden.
+# Los arreglos se guardan en el orden de bytes de la máquina (va en la cabecera).
+MAGIA = b'CAST'
+FORMATO = 2
+_CABECERA = struct.Struct('<4sHBxqq')   # magia, formato, little-endian?, nodos, raíz
+_LARGO = struct.Struct('<Q')
+
+# Archivos cuyo cambio invalida la caché: todo lo que decide el árbol, sus tipos
+# o el texto de los mensajes
+_FUENTES_COMPILADOR = ('globalTypes.py', 'lexer.py', 'sourcemap.py', 'parser.py',
+                       'parser_ll1.py', 'arbol.py', 'volcado.py', 'semantica.py',
+                       'diagnosticos.py', 'referencias.py', 'recorrido.py', 'cache_ast.py')
+
+
+def _version_compilador():
+    h = hashlib.sha256(b'%d' % FORMATO)
+    base = os.path.dirname(os.path.abspath(__file__))
+    for nombre in _FUENTES_COMPILADOR:
+        with open(os.path.join(base, nombre), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+VERSION_COMPILADOR = _version_compilador()
+
+
+def _columnas(a):
+    return (a.kinds, a.lexemas, a.lineas, a.inicios, a.fines,
+            a.primero, a.ultimo, a.siguiente, a.tipos)
+
+
+# Ligaduras: una fila de 5 enteros por nodo ligado (nodo, clase, slot, ¿arreglo?,
+# parámetro o -1); el nombre es el lexema del nodo
+_CLASES = ('global', 'local', 'param')
+_COLUMNAS_LIGADURA = 5
+
+
+def _filas_ligaduras(a):
+    filas = array('i')
+    for i, l in sorted(a.ligaduras.items()):
+        filas.extend((i, _CLASES.index(l.clase), l.slot or 0, l.es_arreglo,
+                      -1 if l.param is None else l.param))
+    return filas
+
+
+def _leer_ligaduras(a, filas):
+    if len(filas) % _COLUMNAS_LIGADURA:
+        raise ValueError("entrada de caché truncada")
+    # Una sola Ligadura por declaración, como las que arma la semántica
+    vistas = {}
+    for k in range(0, len(filas), _COLUMNAS_LIGADURA):
+        i, clase, slot, es_arreglo, param = filas[k:k + _COLUMNAS_LIGADURA]
+        clase = _CLASES[clase]
+        campos = (clase, None if clase == 'global' else slot, bool(es_arreglo),
+                  None if param < 0 else param, a.simbolos[a.lexemas[i]])
+        l = vistas.get(campos)
+        if l is None:
+            l = vistas[campos] = Ligadura(*campos)
+        a.ligaduras[i] = l
+
+
+def _escribir_bloque(f, datos):
+    f.write(_LARGO.pack(len(datos)))
+    f.write(datos)
+
+
+def _leer_bloque(datos, pos):
+    (n,) = _LARGO.unpack_from(datos, pos)
+    pos += _LARGO.size
+    if pos + n > len(datos):
+        raise ValueError("entrada de caché truncada")
+    return datos[pos:pos + n], pos + n
+
+
+def serializar(raiz, texto, f):
+    """Escribe en 'f' (binario) el árbol de 'raiz' y el texto de las fases."""
+    a = a_columnar(raiz)
+    raiz_i = raiz.i if isinstance(raiz, NodoColumnar) else a.raiz
+    f.write(_CABECERA.pack(MAGIA, FORMATO, sys.byteorder == 'little', len(a), raiz_i))
+    # Los códigos de kind y de tipo dependen del proceso: se guardan los nombres
+    _escribir_bloque(f, '\n'.join(arbol.KINDS).encode())
+    _escribir_bloque(f, '\n'.join(arbol.TIPOS_DATO[1:]).encode())
+    simbolos = [s.encode('utf-8', 'surrogatepass') for s in a.simbolos]
+    _escribir_bloque(f, array('I', map(len, simbolos)).tobytes())
+    _escribir_bloque(f, b''.join(simbolos))
+    _escribir_bloque(f, texto.encode('utf-8', 'surrogatepass'))
+    for col in _columnas(a):
+        _escribir_bloque(f, col.tobytes())
+    _escribir_bloque(f, _filas_ligaduras(a).tobytes())
+
+
+def deserializar(datos):
+    """(raíz, texto) a partir de los bytes de serializar(); ValueError si no son válidos."""
+    datos = memoryview(datos)
+    try:
+        return _deserializar(datos)
+    except struct.error:
+        raise ValueError("entrada de caché truncada")
+
+
+def _deserializar(datos):
+    magia, formato, little, n, raiz_i = _CABECERA.unpack_from(datos, 0)
+    if magia != MAGIA or formato != FORMATO or little != (sys.byteorder == 'little'):
+        raise ValueError("entrada de caché con otro formato")
+    pos = _CABECERA.size
+    kinds, pos = _leer_bloque(datos, pos)
+    tipos, pos = _leer_bloque(datos, pos)
+    largos, pos = _leer_bloque(datos, pos)
+    blob, pos = _leer_bloque(datos, pos)
+    texto, pos = _leer_bloque(datos, pos)
+    a = ArbolColumnar()
+    for col in _columnas(a):
+        bloque, pos = _leer_bloque(datos, pos)
+        col.frombytes(bloque)
+        if len(col) != n:
+            raise ValueError("entrada de caché truncada")
+    ligaduras, pos = _leer_bloque(datos, pos)
+    a.kinds = array('B', a.kinds.tobytes().translate(
+        arbol.traduccion(bytes(kinds).decode().split('\n'), arbol.codigo_kind)))
+    nombres_tipo = [None] + bytes(tipos).decode().split('\n')
+    a.tipos = array('B', a.tipos.tobytes().translate(
+        arbol.traduccion(nombres_tipo, arbol.codigo_tipo)))
+    blob = bytes(blob).decode('utf-8', 'surrogatepass')
+    pos = 0
+    for largo in array('I', bytes(largos)):
+        a.simbolos.append(blob[pos:pos + largo])
+        pos += largo
+    a._id_simbolo = {s: i for i, s in enumerate(a.simbolos)}
+    filas = array('i')
+    filas.frombytes(ligaduras)
+    _leer_ligaduras(a, filas)
+    a.raiz = raiz_i
+    return NodoColumnar(a, raiz_i), bytes(texto).decode('utf-8', 'surrogatepass')
+
+
+class CacheAST:
+    def __init__(self, directorio=DIRECTORIO_CACHE, limite=LIMITE_CACHE):
+        self.directorio = directorio
+        self.limite = limite
+        self.aciertos = 0
+        self.fallos = 0
+
+    def clave(self, ruta, *extra):
+        """Hash del contenido de 'ruta', la versión del compilador y 'extra' (opciones)."""
+        with open(ruta, 'rb') as f:
+            h = hashlib.file_digest(f, 'sha256')
+        h.update(VERSION_COMPILADOR.encode())
+        for e in extra:
+            h.update(b'\0' + repr(e).encode())
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + '.ast')
+
+    def cargar(self, clave):
+        """(raíz, texto) guardados con 'clave', o None."""
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            entrada = deserializar(datos)
+        except (OSError, ValueError):
+            self.fallos += 1
+            return None
+        try:
+            os.utime(ruta)   # último uso, para el desalojo
+        except OSError:
+            pass
+        self.aciertos += 1
+        return entrada
+
+    def guardar(self, clave, raiz, texto):
+        os.makedirs(self.directorio, exist_ok=True)
+        # Se escribe aparte y se renombra: un lector nunca ve una entrada a medias
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                serializar(raiz, texto, f)
+            os.replace(temporal, self._ruta(clave))
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self.desalojar()
+
+    def desalojar(self):
+        """Borra las entradas menos usadas hasta quedar dentro del límite."""
+        entradas = []
+        total = 0
+        with os.scandir(self.directorio) as it:
+            for e in it:
+                if e.name.endswith('.ast'):
+                    st = e.stat()
+                    entradas.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+        entradas.sort()
+        for _, tam, ruta in entradas:
+            if total <= self.limite:
+                break
+            try:
+                os.unlink(ruta)
+            except OSError:
+                continue
+            total -= tam
@@ -0,0 +1,380 @@
+# cache_funciones.py
+# Caché por función de la semántica y de la generación de código. Después de
+# editar una función sólo se vuelve a chequear y a traducir esa: las demás toman
+# de aquí sus diagnósticos, los tipos y las ligaduras anotados, su parte del
+# índice de referencias y su texto MIPS.
+#
+# - Semántica: la clave es una huella del subárbol de la fun_decl (kinds,
+#   lexemas, forma y posiciones relativas a la declaración, así que una función
+#   que sólo se movió de lugar sigue acertando). La entrada guarda además la
+#   firma de cada global que la función nombra; si alguna cambió, es un fallo.
+#   Líneas y offsets se guardan relativos y se corren al aplicar la entrada.
+#   Si el parser no tuvo errores, el subárbol depende sólo del texto de la
+#   función, así que la huella es la de ese texto: sale de un hash sobre el
+#   trozo de la fuente, sin recorrer el árbol.
+# - Código: la clave es la huella sin posiciones (cgen no las mira salvo para
+#   las marcas de línea del nivel ANOTADA), o la del texto que calculó la
+#   semántica para esa misma fun_decl, más el nivel de emisión. El texto
+#   se guarda con las etiquetas como marcas (EmisorPlantilla), que
+#   CodeEmitter.emit_bloque vuelve a numerar con new_label. Los registros los
+#   asigna cgen función por función (registros.py), así que el texto no
+#   depende de lo que se generó antes.
+#
+# Las entradas viven en un LRU en memoria y, si se da un archivo, se guardan en
+# disco con guardar() y se leen en la primera búsqueda. Una misma caché se
+# puede usar desde varios hilos (CompilerSession.compile): el LRU, la lectura
+# del archivo y los contadores van con un lock.
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+import arbol
+from cache_ast import DIRECTORIO_CACHE, VERSION_COMPILADOR
+from cgen import ANOTADA, EmisorPlantilla
+from recorrido import preorden
+from referencias import IndiceReferencias
+from semantica import SymbolInfoExtended
+
+ARCHIVO_CACHE = os.path.join(DIRECTORIO_CACHE, 'funciones.cache')
+CAPACIDAD = 16384   # entradas en memoria, de las dos fases juntas
+
+MAGIA = b'CFUN'
+
+# Kinds cuyo lexema busca la semántica en la tabla de símbolos
+_NOMBRAN = frozenset(('var', 'assign', 'call'))
+
+
+def _version():
+    # La del AST (cache_ast.py) más lo que decide el código y este formato
+    h = hashlib.sha256(VERSION_COMPILADOR.encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for nombre in ('cgen.py', 'plegado.py', 'registros.py', 'mirilla.py', 'ir.py',
+                   'seleccion.py', 'cache_funciones.py'):
+        with open(os.path.join(base, nombre), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+VERSION = _version()
+
+
+def _firma(info):
+    # Lo que la semántica de una función lee de un global (None: no existe)
+    if info is None:
+        return None
+    return (info.kind, info.type, info.array_size, tuple(info.params))
+
+
+def _digerir(partes):
+    return hashlib.blake2b('\x1f'.join(partes).encode('utf-8', 'surrogatepass'),
+                           digest_size=16).digest()
+
+
+def huella_codigo(decl, lineas=False):
+    """
+    Huella de lo que cgen lee de la función: kinds, lexemas y forma del árbol
+    (y las líneas, si 'lineas': las marca el nivel cgen.ANOTADA).
+    """
+    if lineas:
+        return _digerir([f"{n.kind}\x1e{n.lexeme}\x1e{len(n.children)}\x1e{n.lineno}"
+                         for n in preorden(decl)])
+    return _digerir([f"{n.kind}\x1e{n.lexeme}\x1e{len(n.children)}" for n in preorden(decl)])
+
+
+def huella_fuente(decl, texto):
+    """Huella del trozo de 'texto' (str, bytes o mmap) que ocupa 'decl'."""
+    trozo = texto[decl.inicio:decl.fin]
+    # Los offsets son de caracteres en un str y de bytes en los otros: no se mezclan
+    trozo = b's' + trozo.encode('utf-8', 'surrogatepass') if isinstance(trozo, str) else b'b' + trozo
+    return hashlib.blake2b(trozo, digest_size=16).digest()
+
+
+def _nombres(nodos):
+    return {n.lexeme for n in nodos if n.kind in _NOMBRAN}
+
+
+def huella_semantica(decl):
+    """
+    (huella, nombres, nodos): la huella de la función con las posiciones de sus
+    nodos relativas a las de 'decl', los nombres que la semántica va a buscar y
+    los nodos en preorden.
+    """
+    l0, i0 = decl.lineno, decl.inicio or 0
+    partes = []
+    nodos = preorden(decl)
+    for n in nodos:
+        inicio, fin = n.inicio, n.fin
+        partes.append(f"{n.kind}\x1e{n.lexeme}\x1e{len(n.children)}\x1e{n.lineno - l0}\x1e"
+                      f"{None if inicio is None else inicio - i0}\x1e"
+                      f"{None if fin is None else fin - i0}")
+    return _digerir(partes), _nombres(nodos), nodos
+
+
+class _Semantica:
+    """Entrada de la semántica de una función (posiciones relativas a la fun_decl)."""
+    __slots__ = ('dependencias', 'diags', 'con_tipo', 'tipos', 'nombres_tipo', 'ligaduras',
+                 'globales',
+                 'cadenas', 'simbolo', 'linea', 'offset', 'siguiente', 'ambitos',
+                 'de_ambito', 'locales')
+
+
+class CacheFunciones:
+    def __init__(self, archivo=None, capacidad=CAPACIDAD):
+        self.archivo = archivo          # None: sólo en memoria
+        self.capacidad = capacidad
+        self._entradas = OrderedDict()  # clave -> pickle de la entrada; la última, la más usada
+        self._leida = archivo is None
+        self._cambios = False
+        self._candado = threading.Lock()   # _entradas, _leida, _cambios y contadores
+        self.aciertos = {'semantica': 0, 'codigo': 0}
+        self.fallos = {'semantica': 0, 'codigo': 0}
+        # fun_decl -> clave de su código, de la huella del texto que calculó chequear()
+        self._claves_codigo = {}
+
+    def __len__(self):
+        return len(self._entradas)
+
+    # Almacenamiento
+
+    def _buscar(self, clave):
+        with self._candado:
+            if not self._leida:
+                self._leer()
+            # Buscar y pasar al final juntos: otro hilo puede sacarla en _poner
+            datos = self._entradas.get(clave)
+            if datos is None:
+                return None
+            self._entradas.move_to_end(clave)
+        # Cada acierto desarma su propia copia: quien la usa puede modificarla
+        return pickle.loads(datos)
+
+    def _poner(self, clave, entrada):
+        datos = pickle.dumps(entrada, pickle.HIGHEST_PROTOCOL)
+        with self._candado:
+            self._entradas[clave] = datos
+            self._entradas.move_to_end(clave)
+            self._cambios = True
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def _contar(self, tabla, tipo):
+        # Un acierto o un fallo de 'tipo' ('semantica' o 'codigo')
+        with self._candado:
+            tabla[tipo] += 1
+
+    def leer(self):
+        """Agrega las entradas del archivo (si existe y es de esta versión)."""
+        with self._candado:
+            self._leer()
+
+    def _leer(self):
+        # leer() con el lock ya tomado
+        self._leida = True
+        try:
+            with open(self.archivo, 'rb') as f:
+                magia, version, entradas = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return
+        if magia != MAGIA or version != VERSION:
+            return
+        # Las del archivo quedan como las menos usadas
+        for clave, datos in reversed(entradas):
+            if clave not in self._entradas:
+                self._entradas[clave] = datos
+                self._entradas.move_to_end(clave, last=False)
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+
+    def guardar(self):
+        """Escribe las entradas en el archivo, si hay archivo y algo cambió."""
+        with self._candado:
+            self._guardar()
+
+    def _guardar(self):
+        # guardar() con el lock ya tomado
+        if self.archivo is None or not self._cambios:
+            return
+        if not self._leida:
+            self._leer()
+        os.makedirs(os.path.dirname(self.archivo) or '.', exist_ok=True)
+        # Como en CacheAST.guardar: se escribe aparte y se renombra
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(self.archivo) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((MAGIA, VERSION, list(self._entradas.items())), f,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, self.archivo)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self._cambios = False
+
+    # Semántica
+
+    def chequear(self, sem, decl, imprime=False):
+        """sem.chequear_funcion(decl, imprime), o su resultado guardado."""
+        ix = sem.indice
+        if imprime and ix is None:
+            # Las tablas salen del índice: sin él no hay cómo imprimirlas
+            sem.chequear_funcion(decl, imprime)
+            return
+        texto = sem.parser.mapa.texto
+        if not getattr(sem.parser, '_error', True) and texto and decl.inicio is not None \
+                and decl.fin is not None:
+            huella = huella_fuente(decl, texto)
+            clave = b'T' + huella
+            self._claves_codigo[decl] = b'D' + huella
+            nombres = nodos = None
+        else:
+            huella, nombres, nodos = huella_semantica(decl)
+            clave = b'S' + huella
+        clave += b'-' if ix is None else b'i'
+        globales = sem.depth[0]
+        e = self._buscar(clave)
+        if e is not None and all(_firma(globales.get(n)) == f for n, f in e.dependencias):
+            self._contar(self.aciertos, 'semantica')
+            _aplicar_semantica(sem, decl, nodos or preorden(decl), e, imprime)
+            return
+        self._contar(self.fallos, 'semantica')
+
+        diagnosticos = sem.diagnosticos
+        n_registros, n_errores = len(diagnosticos.registros), diagnosticos.errores
+        if ix is not None:
+            filas, simbolos, ambitos = len(ix), len(ix.simbolos), len(ix.ambitos)
+        sem.chequear_funcion(decl, imprime)
+        if diagnosticos.errores - n_errores != len(diagnosticos.registros) - n_registros:
+            # Hubo errores que no se guardaron (límite): no se podrían repetir
+            return
+
+        if nodos is None:
+            nodos = preorden(decl)
+            nombres = _nombres(nodos)
+        l0, i0 = decl.lineno, decl.inicio or 0
+        e = _Semantica()
+        e.dependencias = tuple(sorted((n, _firma(globales.get(n))) for n in nombres))
+        e.diags = [d.desplazado(-i0, -l0) for d in diagnosticos.registros[n_registros:]]
+        # Tipos: posición en el preorden y código de los nodos que tienen
+        codigo = arbol.codigo_tipo
+        con_tipo = [(k, t) for k, t in enumerate(getattr(n, 'type', None) for n in nodos)
+                    if t is not None]
+        e.con_tipo = array('i', [k for k, _ in con_tipo])
+        e.tipos = bytes([codigo(t) for _, t in con_tipo])
+        e.nombres_tipo = list(arbol.TIPOS_DATO)
+        # Ligaduras: (posición en el preorden, arbol.Ligadura)
+        e.ligaduras = [(k, l) for k, l in enumerate(getattr(n, 'ligadura', None) for n in nodos)
+                       if l is not None]
+        if ix is not None:
+            _guardar_indice(e, ix, filas, simbolos, ambitos, l0, i0)
+        else:
+            e.locales = None
+        self._poner(clave, e)
+
+    # Código
+
+    def generar(self, gen, decl, emitter):
+        """gen.generate_code(decl, emitter), o el texto guardado con etiquetas nuevas."""
+        # El texto depende del nivel de emisión y, con las marcas de línea, de
+        # dónde está la función
+        anotada = emitter.nivel == ANOTADA
+        clave = self._claves_codigo.pop(decl, None) or b'C' + huella_codigo(decl, anotada)
+        clave += b'%d' % emitter.nivel
+        if gen.ir:
+            clave += b'i'
+        if not gen.plegar:
+            clave += b's'
+        if gen.mirilla is None:
+            clave += b'm'
+        if anotada:
+            clave += b':%d' % decl.lineno
+        e = self._buscar(clave)
+        if e is None:
+            self._contar(self.fallos, 'codigo')
+            plantilla = EmisorPlantilla(emitter.nivel)
+            try:
+                gen.generate_code(decl, plantilla)
+            except BaseException:
+                # Lo emitido hasta el error sale igual que sin caché
+                emitter.emit_bloque(plantilla.plantilla(), plantilla.prefijos)
+                raise
+            texto = plantilla.plantilla()
+            emitter.emit_bloque(texto, plantilla.prefijos)
+            self._poner(clave, (texto, plantilla.prefijos))
+        else:
+            self._contar(self.aciertos, 'codigo')
+            texto, prefijos = e
+            emitter.emit_bloque(texto, prefijos)
+
+
+def _guardar_indice(e, ix, filas, simbolos, ambitos, l0, i0):
+    # La parte del índice que anotó la función: filas[filas:], símbolos locales
+    # [simbolos:] y ámbitos [ambitos:], con la numeración que espera
+    # IndiceReferencias.anexar: los globales por su orden en e.globales (por
+    # nombre) y los locales a continuación
+    simbolo = ix.simbolo[filas:]
+    usados = sorted({v for v in simbolo if v < simbolos})
+    numero = {g: k for k, g in enumerate(usados)}
+    base = len(usados) - simbolos
+    e.globales = [ix.simbolos[g].name for g in usados]
+    e.simbolo = array('i', [numero[v] if v < simbolos else v + base for v in simbolo])
+    e.linea = array('i', [v - l0 for v in ix.linea[filas:]])
+    e.offset = array('q', [v - i0 if v >= 0 else -1 for v in ix.offset[filas:]])
+    e.siguiente = array('i', [v - filas if v >= 0 else -1 for v in ix.siguiente[filas:]])
+    # Primera y última fila de cada global usado, para empalmar sus cadenas
+    primera, ultima = {}, {}
+    for i, v in enumerate(e.simbolo):
+        if v < len(usados):
+            primera.setdefault(v, i)
+            ultima[v] = i
+    e.cadenas = [(k, primera[k], ultima[k]) for k in range(len(usados))]
+    # Ámbitos: el de la función es el 1 de la entrada; el 0, el global
+    e.ambitos = [(nivel, padre - ambitos + 1 if padre >= ambitos else padre)
+                 for nivel, padre in ix.ambitos[ambitos:]]
+    e.de_ambito = [array('i', [v + base for v in ids]) for ids in ix._de_ambito[ambitos:]]
+    e.locales = [(s.name, s.kind, s.type, s.array_size, s.params, s.declared_at - l0,
+                  s.ambito - ambitos + 1, s.primer_uso - filas, s.ultimo_uso - filas,
+                  s.ligadura)
+                 for s in ix.simbolos[simbolos:]]
+
+
+def _aplicar_semantica(sem, decl, nodos, e, imprime):
+    l0, i0 = decl.lineno, decl.inicio or 0
+    if e.diags:
+        sem.tipoError_ocurrido = True
+    for d in e.diags:
+        sem.diagnosticos.anotar(d.desplazado(i0, l0))
+
+    nombres = e.nombres_tipo
+    for k, c in zip(e.con_tipo, e.tipos):
+        nodos[k].type = nombres[c]
+    for k, l in e.ligaduras:
+        nodos[k].ligadura = l
+
+    ix = sem.indice
+    if ix is None:
+        return
+    globales = sem.depth[0]
+    otro = IndiceReferencias()
+    otro.simbolo, otro.linea, otro.offset, otro.siguiente = e.simbolo, e.linea, e.offset, e.siguiente
+    otro.ambitos.extend(e.ambitos)
+    otro._de_ambito.extend(e.de_ambito)
+    k = len(e.globales)
+    for j, (nombre, kind, tipo, tam, params, linea, ambito, primer, ultimo,
+            ligadura) in enumerate(e.locales):
+        info = SymbolInfoExtended(nombre, kind, tipo, tam, params, linea + l0)
+        info.id = k + j
+        info.ambito, info.primer_uso, info.ultimo_uso = ambito, primer, ultimo
+        info.ligadura = ligadura
+        otro.simbolos.append(info)
+    numeros = [globales[n].id for n in e.globales]
+    ambito_funcion = len(ix.ambitos)
+    ix.anexar(otro, k, [(numeros[g], a, b) for g, a, b in e.cadenas], numeros, l0, i0)
+
+    if imprime:
+        abiertos = [globales, {info.name: info for info in ix.simbolos_de(ambito_funcion)}]
+        bloques = [(ix.ambitos[a][0], {info.name: info for info in ix.simbolos_de(a)})
+                   for a in ix.ambitos_dentro(ambito_funcion)[1:]]
+        sem.imprimir_funcion(decl, bloques, abiertos)
@@ -1,290 +1,557 @@
 # cgen.py
 
+import io
+import re
+
 from globalTypes import *  # Para tipos y enums definidos previamente
+from recorrido import ejecutar
+import ir
+import mirilla
+import plegado
+import registros
+import seleccion
+
+
+def _offset(node):
+    # Offset desde $fp de la declaración que la semántica ligó a 'node' (ver
+    # arbol.Ligadura); None si no se resolvió o es global (sin lugar en la pila)
+    lig = getattr(node, 'ligadura', None)
+    return None if lig is None else lig.slot
+
+
+# Niveles de emisión: RELEASE sin comentarios, ANOTADA sólo con un '# línea N'
+# al cambiar de línea de la fuente, DEBUG con todos los comentarios de cgen
+RELEASE, ANOTADA, DEBUG = 0, 1, 2
+NIVELES = {'release': RELEASE, 'anotada': ANOTADA, 'debug': DEBUG}
+
+# Comentarios: líneas que empiezan con '#' (se van enteras, con el '\n' de la
+# anterior) y el '  # ...' que sigue a una instrucción. Cada patrón empieza con
+# un literal, así que re lo busca sin probar en cada posición. Las marcas de
+# ANOTADA no se tocan, salvo las que quedan sin código debajo.
+_LINEA_COMENTARIO = re.compile(r'\n#[^\n]*')
+_LINEA_NO_MARCA = re.compile(r'\n#(?! línea )[^\n]*')
+_COMENTARIO_FINAL = re.compile(r'  #[^\n]*')
+_MARCA_VACIA = re.compile(r'\n# línea \d+(?=\n# línea |\n\n|\n?\Z)')
+
+# Salto de un if o while cuando su relop da falso: la comparación contraria
+_SALTO_SI_FALSO = {'<': 'bge', '>': 'ble', '<=': 'bgt', '>=': 'blt', '==': 'bne', '!=': 'beq'}
+
 
 class CodeEmitter:
-    def __init__(self, file):
+    """
+    Junta las líneas en memoria y las escribe en 'file' de una vez con
+    volcar(), que cgen llama al terminar cada función (y al final). Fuera de
+    DEBUG los comentarios se quitan ahí, sobre todo el texto junto, y no
+    línea por línea.
+    """
+    def __init__(self, file, nivel=DEBUG):
         self.file = file
         self.label_count = 0
-
-    def emit(self, code):
-        self.file.write(code + '\n')
+        self.nivel = nivel
+        self.linea = None      # en ANOTADA, última línea marcada
+        self._trozos = []      # líneas, sin el '\n'
+        # emit() es agregar al buffer: lo más barato posible
+        self.emit = self._trozos.append
 
     def emit_comment(self, comment):
-        self.emit(f"# {comment}")
+        if self.nivel == DEBUG:
+            self._trozos.append(f"# {comment}")
+
+    def marcar_linea(self, lineno):
+        """En ANOTADA, '# línea N' si 'lineno' no es la última marcada."""
+        if self.nivel == ANOTADA and lineno != self.linea and lineno is not None:
+            self.linea = lineno
+            self._trozos.append(f"# línea {lineno}")
+
+    def volcar(self):
+        """Escribe lo emitido desde el último volcar() en una sola llamada."""
+        if not self._trozos:
+            return
+        if self.nivel == DEBUG:
+            texto = '\n'.join(self._trozos) + '\n'
+        else:
+            # Con un '\n' delante, la primera línea es como las demás
+            texto = _COMENTARIO_FINAL.sub('', '\n' + '\n'.join(self._trozos))
+            if self.nivel == RELEASE:
+                texto = _LINEA_COMENTARIO.sub('', texto)
+            else:
+                # Sin las marcas de sentencias que no dejaron código
+                texto = _MARCA_VACIA.sub('', _LINEA_NO_MARCA.sub('', texto))
+            texto = texto[1:] + '\n'
+        self._trozos.clear()
+        self.file.write(texto)
 
     def new_label(self, prefix="L"):
         label = f"{prefix}{self.label_count}"
         self.label_count += 1
         return label
 
-#variables globales
-symbol_table={}
-offset_counter=0
-register_counter = 0
-current_function_name = ""  
+    def posicion(self):
+        """Marca para tomar() lo emitido desde aquí (antes del próximo volcar())."""
+        return len(self._trozos)
 
+    def tomar(self, posicion):
+        """Saca y devuelve las líneas emitidas desde 'posicion'."""
+        lineas = self._trozos[posicion:]
+        del self._trozos[posicion:]
+        return lineas
 
-def codeGen(tree, filename):
-    with open(filename, 'w') as f:
-        emitter = CodeEmitter(f)
+    def emit_bloque(self, plantilla, prefijos):
+        """
+        Emite el texto de un EmisorPlantilla con etiquetas nuevas de
+        new_label: la k-ésima que creó el bloque, con el prefijo prefijos[k].
+        """
+        etiquetas = [self.new_label(p) for p in prefijos]
+        partes = plantilla.split('\0')
+        partes[1::2] = [etiquetas[int(k)] for k in partes[1::2]]
+        if plantilla:
+            # El texto termina en '\n', que pone volcar()
+            self._trozos.append(''.join(partes)[:-1])
+
+
+class EmisorPlantilla(CodeEmitter):
+    """
+    Emite a un buffer, con las etiquetas como '\\0k\\0' (k: orden de creación)
+    en lugar de su nombre, para copiar el texto después con emit_bloque()
+    (lo usa cache_funciones.py).
+    """
+    def __init__(self, nivel=DEBUG):
+        super().__init__(io.StringIO(), nivel)
+        self.prefijos = []
+
+    def new_label(self, prefix="L"):
+        self.prefijos.append(prefix)
+        return f"\0{len(self.prefijos) - 1}\0"
+
+    def plantilla(self):
+        self.volcar()
+        return self.file.getvalue()
+
+# Estado del generador: contador de offsets, contador de registros virtuales,
+# nombre de la función (para el epílogo) y nivel de emisión (RELEASE, ANOTADA o
+# DEBUG, el de siempre). Los nombres no se resuelven aquí: cada var, assign y
+# call trae en node.ligadura la declaración que ligó la semántica, con su lugar
+# en el marco, así que un nombre tapado en un bloque anidado tiene su propio
+# espacio.
+# Cada GeneradorCodigo tiene el suyo, así que puede haber varios trabajando a la vez.
+#
+# Cada kind se traduce con el handler de las tablas SENTENCIAS y EXPRESIONES del
+# final de la clase, sin recursión: los gen_* que tienen que traducir hijos son
+# generadores que hacen 'reg = yield self._expresion(hijo, emitter)' (o
+# _sentencia) y recorrido.ejecutar() corre ese paso y les devuelve el registro.
+# Desde fuera se usan generate_code() y gen_expression(), que corren el motor.
+#
+# Registros: cada valor va a un registro virtual nuevo (de _registro()) y
+# gen_function reparte los de la función entre los físicos con
+# registros.asignar() antes de emitir su prólogo. Además, dentro de un bloque
+# básico una variable que ya está en un registro no se vuelve a cargar
+# (_valores, que se vacía en cada etiqueta) y los dos operandos de una
+# operación se traducen en el orden de Sethi-Ullman (_primero_derecha).
+
+class GeneradorCodigo:
+    def __init__(self):
+        self.offset_counter = 0
+        self.register_counter = 0
+        self.current_function_name = ""
+        self._valores = {}      # offset de una variable -> virtual con su valor
+        self._necesidad = {}    # Sethi-Ullman: nodo -> (registros, ¿sin efectos?)
+        self.cache = None  # cache_funciones.CacheFunciones, o None
+        self.nivel = DEBUG
+        self.ir = False          # traducir por la representación intermedia
+        self.volcado_ir = None   # con ir: stream donde se escribe ir.volcar() de cada función
+        self.plegar = True       # plegado de constantes (plegado.py)
+        self._plegados = {}      # de la función actual: nodo -> expresión simplificada
+        self.informe_plegado = None  # stream para las instrucciones que ahorra el plegado
+        self.mirilla = mirilla.Mirilla()  # optimización de mirilla (mirilla.py), o None
 
+    def codeGen(self, tree, filename):
+        with open(filename, 'w') as f:
+            self.generar(tree, f)
+
+    def generar(self, tree, f):
+        """Escribe el programa MIPS de 'tree' en el archivo (o stream) ya abierto 'f'."""
+        emitter = CodeEmitter(f, self.nivel)
+        try:
+            self._generar(tree, emitter)
+        finally:
+            # Lo emitido hasta un error sale igual
+            emitter.volcar()
+
+    def _generar(self, tree, emitter):
         emitter.emit(".data")
         emitter.emit("newline: .asciiz \"\\n\"")
         emitter.emit("")
         emitter.emit(".text")
-        
+
         # Declara las funciones globales
         for child in tree.children:
             if child.kind == 'fun_decl':
                 func_name = child.children[1].lexeme
                 emitter.emit(f".globl {func_name}")
-        
+
         emitter.emit("")
-        
+
         # Genera primero la función main y luego las demás
         main_func = None
         other_funcs = []
-        
+
         for child in tree.children:
             if child.kind == 'fun_decl':
                 if child.children[1].lexeme == 'main':
                     main_func = child
                 else:
                     other_funcs.append(child)
-        
+
         # genera la función main primero
         if main_func:
-            generate_code(main_func, emitter)
-        
+            self.gen_funcion(main_func, emitter)
+
         # genera las demás funciones
         for func in other_funcs:
-            generate_code(func, emitter)
+            self.gen_funcion(func, emitter)
 
-def generate_code(node, emitter):
-    if node is None:
-            return
+    def gen_funcion(self, decl, emitter):
+        """Código de la fun_decl 'decl'; con self.cache, copiado de la caché si ya se generó."""
+        # Cada función marca sus líneas desde cero (así su texto no depende de
+        # la anterior y se puede copiar de la caché)
+        emitter.linea = None
+        if self.cache is None or self.volcado_ir is not None:
+            self.generate_code(decl, emitter)
+        else:
+            self.cache.generar(self, decl, emitter)
+        emitter.volcar()
+        if self.informe_plegado is not None:
+            self._informar_plegado(decl)
 
-    if node.kind == 'program':
-        for child in node.children:
-            generate_code(child, emitter)
+    def _informar_plegado(self, decl):
+        # Instrucciones de la función sin y con el plegado: se traduce dos veces
+        # más, aparte, en RELEASE y sin la mirilla
+        plegar, mirilla = self.plegar, self.mirilla
+        self.mirilla = None
+        cuentas = []
+        for con in (False, True):
+            self.plegar = con
+            aparte = CodeEmitter(io.StringIO(), RELEASE)
+            self.generate_code(decl, aparte)
+            aparte.volcar()
+            cuentas.append(sum(1 for l in aparte.file.getvalue().splitlines()
+                               if l and not l.endswith(':')))
+        self.plegar, self.mirilla = plegar, mirilla
+        antes, despues = cuentas
+        self.informe_plegado.write(f"{decl.children[1].lexeme}: {antes} -> {despues}"
+                                   f" instrucciones ({despues - antes:+d})\n")
 
-    elif node.kind == 'fun_decl':
-        gen_function(node, emitter)
-    
-    elif node.kind == 'compound_stmt':
-        gen_compound_stmt(node, emitter)
-    
-    elif node.kind == 'var_decl':
-        gen_var_decl(node, emitter)
+    def generate_code(self, node, emitter):
+        """Genera el código de la sentencia (o declaración, o programa) 'node'."""
+        ejecutar(self._sentencia(node, emitter))
 
-    elif node.kind == 'expression_stmt':
-        gen_expression_stmt(node, emitter)
-    
-    elif node.kind == 'selection_stmt':
-        gen_selection_stmt(node, emitter)
-    
-    elif node.kind == 'iteration_stmt':
-        gen_iteration_stmt(node, emitter)
-    
-    elif node.kind == 'return_stmt':
-        gen_return_stmt(node, emitter)
-    
-    elif node.kind == 'local_declarations':
-        # Procesar cada declaración local
-        for child in node.children:
-            generate_code(child, emitter)
-    
-    elif node.kind == 'statement_list':
-        # Procesar cada statement
+    def gen_expression(self, node, emitter):
+        """Genera el código de la expresión 'node'; devuelve el registro con su valor."""
+        return ejecutar(self._expresion(node, emitter))
+
+    # Devuelven el paso (registro o generador) del handler del kind de 'node';
+    # la entrada None de cada tabla es la de los kinds no previstos
+
+    def _sentencia(self, node, emitter):
+        if node is None:
+            return None
+        emitter.marcar_linea(node.lineno)
+        tabla = self.SENTENCIAS
+        return tabla.get(node.kind, tabla[None])(self, node, emitter)
+
+    def _expresion(self, node, emitter):
+        emitter.emit_comment("Inicio de expression")
+        node = self._plegados.get(node, node)
+        tabla = self.EXPRESIONES
+        return tabla.get(node.kind, tabla[None])(self, node, emitter)
+
+    def _gen_hijos(self, node, emitter):
+        # program, local_declarations y statement_list: cada hijo en orden
         for child in node.children:
-            generate_code(child, emitter)
-    
-    # no processamos directamente los nodos de tipo 'ID', 'NUM', etc.
-    elif node.kind in ['type_specifier', 'ID', 'params', 'VOID', 'param_list', 'param', 'args', 'arg_list']:
-        pass
-    
-    # expresiones y operaciones
-    elif node.kind in ['assign', 'addop', 'mulop', 'relop', 'var', 'NUM', 'call']:
-        gen_expression(node, emitter)
-    
-    else:
+            yield self._sentencia(child, emitter)
+
+    def _sin_codigo(self, node, emitter):
+        # no processamos directamente los nodos de tipo 'ID', 'NUM', etc.
+        return None
+
+    def _sentencia_desconocida(self, node, emitter):
         emitter.emit_comment(f"[Warning] Tipo de nodo no manejado en generate_code: {node.kind}")
 
 
 
 
-#Un stack personal por función
+    #Un stack personal por función
 
-def gen_function(node, emitter):
-    global symbol_table, offset_counter, current_function_name
-    symbol_table = {}
-    offset_counter = 0
-    
-    name = node.children[1].lexeme
-    current_function_name = name  # nombre de la función actual
-    
-    emitter.emit(f"{name}:")
-    emitter.emit_comment("Prolog")
+    def gen_function(self, node, emitter):
+        self._plegados = plegado.plegar(node) if self.plegar else {}
+        if self.ir:
+            # Por la representación intermedia (ir.py y seleccion.py)
+            funcion = ir.bajar(node, self._plegados)
+            ir.reusar_valores(funcion)
+            if self.volcado_ir is not None:
+                self.volcado_ir.write(ir.volcar(funcion))
+            seleccion.seleccionar(funcion, self, emitter)
+            return
+
+        self.offset_counter = 0
+        self.register_counter = 0
+        self._valores = {}
+        self._necesidad = {}
+    
+        name = node.children[1].lexeme
+        self.current_function_name = name  # nombre de la función actual
+        inicio = self.gen_prologo(name, emitter)
+    
+        # Procesar parámetros
+        params_node = node.children[2]
+        if params_node.children and params_node.children[0].kind != 'VOID':
+            param_offset = 8  #parametros empiezan en 8($fp) para main, 12($fp) para otras funciones
+            if params_node.children[0].kind == 'param_list':
+                # Multiples parametros
+                for param in params_node.children[0].children:
+                    param_name = param.children[1].lexeme
+                    emitter.emit_comment(f"Parámetro {param_name} en offset {param_offset}")
+                    param_offset += 4
+            else:
+                # Solo un parámetro
+                param_name = params_node.children[0].children[1].lexeme
+                emitter.emit_comment(f"Parámetro {param_name} en offset {param_offset}")
     
+        # Genera código para declaraciones locales
+        for child in node.children:
+            if child.kind == 'compound_stmt':
+                yield self._sentencia(child, emitter)
+
+        self.gen_epilogo(name, -self.offset_counter, inicio, emitter)
+
+    def gen_prologo(self, name, emitter):
+        """Prólogo de la función 'name'; devuelve dónde empieza su cuerpo (para gen_epilogo)."""
+        emitter.emit(f"{name}:")
+        emitter.emit_comment("Prolog")
     
-    if name == "main":
-        emitter.emit("addi $sp, $sp, -8")      # Reserve space for $ra and $fp
-        emitter.emit("sw $ra, 4($sp)")         # Save return address
-        emitter.emit("sw $fp, 0($sp)")         # Save old frame pointer
-        emitter.emit("move $fp, $sp")          # Set new frame pointer
-    else:
-        emitter.emit("addi $sp, $sp, -8")      # Make space first
-        emitter.emit("sw $ra, 4($sp)")         # Save return address
-        emitter.emit("sw $fp, 0($sp)")         # Save frame pointer
-        emitter.emit("move $fp, $sp")          # Set new frame pointer
     
-    # Procesar parámetros
-    params_node = node.children[2]
-    if params_node.children and params_node.children[0].kind != 'VOID':
-        param_offset = 8  #parametros empiezan en 8($fp) para main, 12($fp) para otras funciones
-        if params_node.children[0].kind == 'param_list':
-            # Multiples parametros
-            for param in params_node.children[0].children:
-                param_name = param.children[1].lexeme
-                symbol_table[param_name] = param_offset
-                param_offset += 4
-                emitter.emit_comment(f"Parámetro {param_name} en offset {symbol_table[param_name]}")
+        if name == "main":
+            emitter.emit("addi $sp, $sp, -8")      # Reserve space for $ra and $fp
+            emitter.emit("sw $ra, 4($sp)")         # Save return address
+            emitter.emit("sw $fp, 0($sp)")         # Save old frame pointer
+            emitter.emit("move $fp, $sp")          # Set new frame pointer
         else:
-            # Solo un parámetro
-            param_name = params_node.children[0].children[1].lexeme
-            symbol_table[param_name] = param_offset
-            emitter.emit_comment(f"Parámetro {param_name} en offset {symbol_table[param_name]}")
-    
-    # Genera código para declaraciones locales
-    for child in node.children:
-        if child.kind == 'compound_stmt':
-            generate_code(child, emitter)
-    
-    # unicamente un epílogo
-    emitter.emit(f"{name}_epilogue:")
-    emitter.emit_comment("Epilog")
-    
-    if name == "main":
-        # restore stack and exit
-        emitter.emit("move $sp, $fp")          # Restore stack pointer
-        emitter.emit("lw $fp, 0($sp)")         # Restore frame pointer
-        emitter.emit("lw $ra, 4($sp)")         # Restore return address
-        emitter.emit("addi $sp, $sp, 8")       # Clean up stack
-        emitter.emit("li $v0, 10")             # Exit syscall
-        emitter.emit("syscall")
-    else:
-        # restore everything and return
-        emitter.emit("move $sp, $fp")          # Restore stack pointer
-        emitter.emit("lw $fp, 0($sp)")         # Restore frame pointer
-        emitter.emit("lw $ra, 4($sp)")         # Restore return address
-        emitter.emit("addi $sp, $sp, 8")       # Clean up stack
-        emitter.emit("jr $ra")                 # Return
-    
-    emitter.emit("")  # para visualización, dejar una línea en blanco
-
-
-#Analiza los compound statements "{ }". MArca su inicio y su fin y se supone que llama a todo lo que esta dentro de forma recursiva.
-def gen_compound_stmt(node, emitter):
-    emitter.emit_comment("Inicio de compound_stmt")
-    local_decls = node.children[0]
-    stmt_list = node.children[1]
-
-    # Procesar declaraciones locales
-    for decl in local_decls.children:
-        generate_code(decl, emitter)
-
-    # Procesar lista de sentencias
-    for stmt in stmt_list.children:
-        generate_code(stmt, emitter)
-
-    emitter.emit_comment("Fin de compound_stmt")
-
-def gen_var_decl(node, emitter):
-    global offset_counter
-    name = node.children[1].lexeme
-
-    # Ver si es un arreglo
-    size = 1
-    if len(node.children) == 3 and node.children[2].kind == 'NUM':
-        size = int(node.children[2].lexeme)
-
-    emitter.emit_comment(f"Declaración de variable: {name} (size = {size})")
-    total_size = size * 4
-    offset_counter -= total_size
-    symbol_table[name] = offset_counter
-    emitter.emit(f"addi $sp, $sp, -{total_size}  # Reservar espacio para {name}")
-
-#Vale la pena revisar.
-def gen_expression_stmt(node, emitter):
-    emitter.emit_comment("Inicio de expression_stmt")
-    if node.children:
-        gen_expression(node.children[0], emitter)
-    emitter.emit_comment("Fin de expression_stmt")
-
-def gen_expression(node, emitter):
-    global register_counter
-    emitter.emit_comment("Inicio de expression")
-    if node.kind == 'NUM':
-        reg = f"$t{register_counter % 10}"
-        register_counter += 1
+            emitter.emit("addi $sp, $sp, -8")      # Make space first
+            emitter.emit("sw $ra, 4($sp)")         # Save return address
+            emitter.emit("sw $fp, 0($sp)")         # Save frame pointer
+            emitter.emit("move $fp, $sp")          # Set new frame pointer
+        return emitter.posicion()
+
+    def gen_epilogo(self, name, locales, inicio, emitter):
+        """
+        Asigna los registros del cuerpo (lo emitido desde 'inicio'), reserva el
+        marco ('locales' bytes más los que pide registros.asignar) y emite el
+        epílogo de la función 'name'.
+        """
+        # Con el cuerpo traducido se conocen los registros: el marco (locales,
+        # guardados y derrames) se reserva de una vez y los $s que usa la función
+        # se guardan aquí (main no vuelve, así que no los guarda)
+        asignacion = registros.asignar(emitter.tomar(inicio), locales)
+        marco = locales + asignacion.marco
+        if marco:
+            emitter.emit(f"addi $sp, $sp, -{marco}  # Locales y registros")
+        guardados = asignacion.guardados if name != "main" else []
+        for reg, lugar in guardados:
+            emitter.emit(f"sw {reg}, {lugar}($fp)")
+        # unicamente un epílogo; su etiqueta va con el cuerpo para la mirilla
+        lineas = asignacion.texto.split('\n') if asignacion.texto else []
+        lineas.append(f"{name}_epilogue:")
+        if self.mirilla is not None:
+            lineas = self.mirilla.optimizar(lineas)
+        emitter.emit('\n'.join(lineas))
+        emitter.emit_comment("Epilog")
+        for reg, lugar in guardados:
+            emitter.emit(f"lw {reg}, {lugar}($fp)")
+    
+        if name == "main":
+            # restore stack and exit
+            emitter.emit("move $sp, $fp")          # Restore stack pointer
+            emitter.emit("lw $fp, 0($sp)")         # Restore frame pointer
+            emitter.emit("lw $ra, 4($sp)")         # Restore return address
+            emitter.emit("addi $sp, $sp, 8")       # Clean up stack
+            emitter.emit("li $v0, 10")             # Exit syscall
+            emitter.emit("syscall")
+        else:
+            # restore everything and return
+            emitter.emit("move $sp, $fp")          # Restore stack pointer
+            emitter.emit("lw $fp, 0($sp)")         # Restore frame pointer
+            emitter.emit("lw $ra, 4($sp)")         # Restore return address
+            emitter.emit("addi $sp, $sp, 8")       # Clean up stack
+            emitter.emit("jr $ra")                 # Return
+    
+        emitter.emit("")  # para visualización, dejar una línea en blanco
+
+
+    #Analiza los compound statements "{ }". MArca su inicio y su fin y se supone que llama a todo lo que esta dentro de forma recursiva.
+    def gen_compound_stmt(self, node, emitter):
+        emitter.emit_comment("Inicio de compound_stmt")
+        local_decls = node.children[0]
+        stmt_list = node.children[1]
+
+        # Procesar declaraciones locales
+        for decl in local_decls.children:
+            yield self._sentencia(decl, emitter)
+
+        # Procesar lista de sentencias
+        for stmt in stmt_list.children:
+            yield self._sentencia(stmt, emitter)
+
+        emitter.emit_comment("Fin de compound_stmt")
+
+    def gen_var_decl(self, node, emitter):
+        name = node.children[1].lexeme
+
+        # Ver si es un arreglo
+        size = 1
+        if len(node.children) == 3 and node.children[2].kind == 'NUM':
+            size = int(node.children[2].lexeme)
+
+        emitter.emit_comment(f"Declaración de variable: {name} (size = {size})")
+        # El espacio se reserva con el marco de la función (ver gen_function)
+        self.offset_counter -= size * 4
+
+    #Vale la pena revisar.
+    def gen_expression_stmt(self, node, emitter):
+        emitter.emit_comment("Inicio de expression_stmt")
+        if node.children:
+            yield self._expresion(node.children[0], emitter)
+        emitter.emit_comment("Fin de expression_stmt")
+
+    # Registros virtuales, etiquetas y orden de evaluación
+
+    def _registro(self):
+        """Un registro virtual nuevo de la función actual (ver registros.py)."""
+        reg = f"\1{self.register_counter}\1"
+        self.register_counter += 1
+        return reg
+
+    def _etiqueta(self, label, emitter):
+        # Se puede llegar a la etiqueta desde otro lado: lo cargado antes no sirve
+        emitter.emit(f"{label}:")
+        self._valores.clear()
+
+    def _etiquetar(self, raiz):
+        """
+        Llena self._necesidad para el subárbol de 'raiz': cuántos registros
+        necesita cada expresión (Sethi-Ullman) y si no tiene efectos (sin
+        llamadas ni asignaciones), sin recursión.
+        """
+        necesidad = self._necesidad
+        plegados = self._plegados
+        pila = [(raiz, False)]
+        while pila:
+            n, listo = pila.pop()
+            if n in necesidad:
+                continue
+            hijos = [plegados.get(h, h) for h in n.children] if plegados else n.children
+            if not listo and hijos:
+                pila.append((n, True))
+                pila.extend((h, False) for h in hijos)
+                continue
+            de_hijos = [necesidad[h] for h in hijos]
+            puro = n.kind not in ('call', 'assign') and all(p for _, p in de_hijos)
+            if n.kind in ('addop', 'mulop', 'relop'):
+                a, b = de_hijos[0][0], de_hijos[1][0]
+                r = a + 1 if a == b else max(a, b)
+            elif n.kind == 'var' and hijos:
+                r = max(de_hijos[0][0], 2)     # índice y dirección
+            else:
+                r = max([1] + [r for r, _ in de_hijos])
+            necesidad[n] = (r, puro)
+
+    def _primero_derecha(self, node):
+        """¿Conviene traducir primero el operando derecho de 'node'?"""
+        izq, der = (self._plegados.get(h, h) for h in node.children)
+        if not der.children:
+            return False        # una hoja necesita un solo registro
+        if node not in self._necesidad:
+            self._etiquetar(node)
+        (ni, pi), (nd, pd) = self._necesidad[izq], self._necesidad[der]
+        # Sólo si ninguno tiene efectos: el orden no se nota
+        return pi and pd and nd > ni
+
+    def _operandos(self, node, emitter):
+        izq, der = node.children
+        if self._primero_derecha(node):
+            right = yield self._expresion(der, emitter)
+            left = yield self._expresion(izq, emitter)
+        else:
+            left = yield self._expresion(izq, emitter)
+            right = yield self._expresion(der, emitter)
+        return left, right
+
+    # Handlers de EXPRESIONES: cada uno devuelve el registro con el valor
+
+    def _expr_num(self, node, emitter):
+        reg = self._registro()
         emitter.emit(f"li {reg}, {node.lexeme}")
         return reg
 
-    elif node.kind == 'var':
+    def _expr_var(self, node, emitter):
         name = node.lexeme
-        offset = symbol_table.get(name)
-        reg = f"$t{register_counter % 10}"
-        register_counter += 1
+        offset = _offset(node)
+        reg = self._registro()
         
         if len(node.children) > 0:  # Array access
-            index_reg = gen_expression(node.children[0], emitter)
-            
-            if offset is not None:
-                if offset > 0:  
-                    addr_reg = f"$t{register_counter % 10}"
-                    register_counter += 1
-                    offset_reg = f"$t{register_counter % 10}"
-                    register_counter += 1
-                    
-                    emitter.emit_comment(f"DEBUG: Accessing parameter array {name} at offset {offset}")
-                    emitter.emit(f"lw {addr_reg}, {offset}($fp)  # Load array base address")
-                    emitter.emit(f"sll {offset_reg}, {index_reg}, 2")
-                    emitter.emit(f"# DEBUG: About to access array at calculated address")
-                    emitter.emit(f"add {addr_reg}, {addr_reg}, {offset_reg}")
-                    emitter.emit(f"lw {reg}, 0({addr_reg})")
-                else:  # Local array - use frame pointer directly
-                    offset_reg = f"$t{register_counter % 10}"
-                    register_counter += 1
-                    
-                    emitter.emit_comment(f"DEBUG: Accessing local array {name} at offset {offset}")
-                    emitter.emit(f"sll {offset_reg}, {index_reg}, 2")
-                    emitter.emit(f"addi {offset_reg}, {offset_reg}, {offset}")
-                    emitter.emit(f"add {offset_reg}, {offset_reg}, $fp")
-                    emitter.emit(f"lw {reg}, 0({offset_reg})")
-            else:
-                emitter.emit_comment(f"[Error] Array no encontrado: {name}")
+            return self._expr_elemento(node, emitter, name, offset, reg)
         else:  # Simple variable
             if offset is not None:
+                if offset in self._valores:
+                    return self._valores[offset]
                 emitter.emit(f"lw {reg}, {offset}($fp)")
+                if not node.ligadura.es_arreglo:
+                    # (los elementos de un arreglo cambian sin pasar por aquí)
+                    self._valores[offset] = reg
             else:
                 emitter.emit_comment(f"[Error] Variable no encontrada: {name}")
         return reg
 
-    elif node.kind == 'addop':
-        left = gen_expression(node.children[0], emitter)
-        right = gen_expression(node.children[1], emitter)
-        reg = f"$t{register_counter % 10}"
-        register_counter += 1
+    def _expr_elemento(self, node, emitter, name, offset, reg):
+        # Acceso a arreglo de _expr_var: el índice se traduce antes de cargar
+        index_reg = yield self._expresion(node.children[0], emitter)
+        
+        if offset is not None:
+            if node.ligadura.clase == 'param':  # el parámetro trae la dirección
+                addr_reg = self._registro()
+                offset_reg = self._registro()
+                
+                emitter.emit_comment(f"DEBUG: Accessing parameter array {name} at offset {offset}")
+                base_reg = self._valores.get(offset)
+                if base_reg is None:
+                    base_reg = self._registro()
+                    emitter.emit(f"lw {base_reg}, {offset}($fp)  # Load array base address")
+                    self._valores[offset] = base_reg
+                emitter.emit(f"sll {offset_reg}, {index_reg}, 2")
+                emitter.emit(f"# DEBUG: About to access array at calculated address")
+                emitter.emit(f"add {addr_reg}, {base_reg}, {offset_reg}")
+                emitter.emit(f"lw {reg}, 0({addr_reg})")
+            else:  # Local array - use frame pointer directly
+                offset_reg = self._registro()
+                
+                emitter.emit_comment(f"DEBUG: Accessing local array {name} at offset {offset}")
+                emitter.emit(f"sll {offset_reg}, {index_reg}, 2")
+                emitter.emit(f"addi {offset_reg}, {offset_reg}, {offset}")
+                emitter.emit(f"add {offset_reg}, {offset_reg}, $fp")
+                emitter.emit(f"lw {reg}, 0({offset_reg})")
+        else:
+            emitter.emit_comment(f"[Error] Array no encontrado: {name}")
+        return reg
+
+    def _expr_addop(self, node, emitter):
+        left, right = yield self._operandos(node, emitter)
+        reg = self._registro()
         op = 'add' if node.lexeme == '+' else 'sub'
         emitter.emit(f"{op} {reg}, {left}, {right}")
         return reg
 
-    elif node.kind == 'mulop':
-        left = gen_expression(node.children[0], emitter)
-        right = gen_expression(node.children[1], emitter)
-        reg = f"$t{register_counter % 10}"
-        register_counter += 1
+    def _expr_mulop(self, node, emitter):
+        left, right = yield self._operandos(node, emitter)
+        reg = self._registro()
         if node.lexeme == '*':
             emitter.emit(f"mul {reg}, {left}, {right}")
         else:  # division
@@ -292,23 +559,18 @@ def gen_expression(node, emitter):
             emitter.emit(f"mflo {reg}")
         return reg
 
-    elif node.kind == 'relop':
-        return gen_relop(node, emitter)
-
-    elif node.kind == 'assign':
+    def _expr_assign(self, node, emitter):
         name = node.lexeme
-        offset = symbol_table.get(name)
+        offset = _offset(node)
         
        
         if len(node.children) > 1:  
-            value_reg = gen_expression(node.children[0], emitter)  
-            index_reg = gen_expression(node.children[1], emitter)  
+            value_reg = yield self._expresion(node.children[0], emitter)  
+            index_reg = yield self._expresion(node.children[1], emitter)  
             
             if offset is not None:
-                offset_reg = f"$t{register_counter % 10}"
-                register_counter += 1
-                addr_reg = f"$t{register_counter % 10}"
-                register_counter += 1
+                offset_reg = self._registro()
+                addr_reg = self._registro()
                 
                 emitter.emit(f"sll {offset_reg}, {index_reg}, 2")
                 emitter.emit(f"addi {addr_reg}, $fp, {offset}")
@@ -318,19 +580,20 @@ def gen_expression(node, emitter):
                 emitter.emit_comment(f"[Error] Array no encontrado: {name}")
             return value_reg
         else:  # Simple variable 
-            result = gen_expression(node.children[0], emitter)
+            result = yield self._expresion(node.children[0], emitter)
             if offset is not None:
                 emitter.emit(f"sw {result}, {offset}($fp)")
+                self._valores[offset] = result
             else:
                 emitter.emit_comment(f"[Error] Variable no encontrada para asignación: {name}")
             return result
     
-    elif node.kind == 'call':
+    def _expr_call(self, node, emitter):
         func_name = node.lexeme
         # Handle built-in functions
         if func_name == "output":
             if node.children and node.children[0].children:
-                arg_reg = gen_expression(node.children[0].children[0].children[0], emitter)
+                arg_reg = yield self._expresion(node.children[0].children[0].children[0], emitter)
                 emitter.emit(f"move $a0, {arg_reg}")
                 emitter.emit("li $v0, 1")
                 emitter.emit("syscall")
@@ -347,7 +610,7 @@ def gen_expression(node, emitter):
                 if len(args_list) > 1:
                     second_arg = args_list[1]
                     emitter.emit_comment(f"DEBUG: Pushing second arg (size) first")
-                    arg_reg = gen_expression(second_arg, emitter)
+                    arg_reg = yield self._expresion(second_arg, emitter)
                     emitter.emit("addi $sp, $sp, -4")
                     emitter.emit(f"sw {arg_reg}, 0($sp)")
                 
@@ -358,11 +621,10 @@ def gen_expression(node, emitter):
                     if first_arg.kind == 'var' and len(first_arg.children) == 0:
                         # This is an array name - pass address
                         var_name = first_arg.lexeme
-                        var_offset = symbol_table.get(var_name)
+                        var_offset = _offset(first_arg)
                         emitter.emit_comment(f"DEBUG: Array {var_name} at offset {var_offset}")
                         
-                        addr_reg = f"$t{register_counter % 10}"
-                        register_counter += 1
+                        addr_reg = self._registro()
                         # Calculate the actual array address
                         emitter.emit(f"addi {addr_reg}, $fp, {var_offset}  # Array address")
                         emitter.emit(f"# DEBUG: Calculated address in {addr_reg}")
@@ -370,7 +632,7 @@ def gen_expression(node, emitter):
                         emitter.emit(f"sw {addr_reg}, 0($sp)")
                     else:
                         # Regular expression
-                        arg_reg = gen_expression(first_arg, emitter)
+                        arg_reg = yield self._expresion(first_arg, emitter)
                         emitter.emit("addi $sp, $sp, -4")
                         emitter.emit(f"sw {arg_reg}, 0($sp)")
             
@@ -378,409 +640,440 @@ def gen_expression(node, emitter):
             emitter.emit(f"jal {func_name}")
             emitter.emit(f"addi $sp, $sp, 8")  # Clean up 2 args
             
-            result_reg = f"$t{register_counter % 10}"
-            register_counter += 1
+            result_reg = self._registro()
             emitter.emit(f"move {result_reg}, $v0")
             return result_reg
         
         else:
-            return gen_call(node, emitter)
+            return (yield self.gen_call(node, emitter))
     
-    else:
+    def _expr_desconocida(self, node, emitter):
         emitter.emit_comment(f"[Warning] Tipo de expresión no manejado: {node.kind}")
         return "$zero"
 
 
 
 
-# === Funciones necesarias para traducir el AST a MIPS ===
+    # === Funciones necesarias para traducir el AST a MIPS ===
 
-def gen_assign(node, emitter):
-    """
-    Traduce una asignación `x = expr`.
-    - Evalúa el lado derecho (gen_expression)
-    - Busca el offset de `x` y guarda el resultado con sw
-    """
-    name = node.lexeme
-    offset = symbol_table.get(name)
+    def gen_assign(self, node, emitter):
+        """
+        Traduce una asignación `x = expr`.
+        - Evalúa el lado derecho (gen_expression)
+        - Busca el offset de `x` y guarda el resultado con sw
+        """
+        name = node.lexeme
+        offset = _offset(node)
     
-    emitter.emit_comment(f"Asignación a variable: {name}")
+        emitter.emit_comment(f"Asignación a variable: {name}")
     
-    # Evaluar expresión del lado derecho
-    result_reg = gen_expression(node.children[0], emitter)
+        # Evaluar expresión del lado derecho
+        result_reg = self.gen_expression(node.children[0], emitter)
     
-    # Verificar si la variable es un arreglo con índice
-    # En el AST, si es asignación a arreglo, necesitaríamos info adicional
-    # Por ahora asumimos asignación a variable simple
+        # Verificar si la variable es un arreglo con índice
+        # En el AST, si es asignación a arreglo, necesitaríamos info adicional
+        # Por ahora asumimos asignación a variable simple
     
-    if offset is not None:
-        emitter.emit(f"sw {result_reg}, {offset}($fp)  # {name} = expresión")
-    else:
-        emitter.emit_comment(f"[Error] Variable no encontrada para asignación: {name}")
+        if offset is not None:
+            emitter.emit(f"sw {result_reg}, {offset}($fp)  # {name} = expresión")
+        else:
+            emitter.emit_comment(f"[Error] Variable no encontrada para asignación: {name}")
     
-    return result_reg
+        return result_reg
 
 
-def gen_var(node, emitter):
-    """
-    Traduce una variable:
-    - Si es simple (`x`), la carga desde stack (lw)
-    - Si es un arreglo indexado (`data[i]`), calcula offset dinámico y hace lw
-    """
-    global register_counter
-    name = node.lexeme
-    offset = symbol_table.get(name)
-    reg = f"$t{register_counter % 10}"
-    register_counter += 1
-    
-    if len(node.children) > 0:  # Array access: data[i]
-        emitter.emit_comment(f"Acceso a arreglo: {name}[index]")
+    def gen_var(self, node, emitter):
+        """
+        Traduce una variable:
+        - Si es simple (`x`), la carga desde stack (lw)
+        - Si es un arreglo indexado (`data[i]`), calcula offset dinámico y hace lw
+        """
+        name = node.lexeme
+        offset = _offset(node)
+        reg = self._registro()
+    
+        if len(node.children) > 0:  # Array access: data[i]
+            emitter.emit_comment(f"Acceso a arreglo: {name}[index]")
         
-        # Evaluar índice
-        index_reg = gen_expression(node.children[0], emitter)
-        offset_reg = f"$t{register_counter % 10}"
-        register_counter += 1
+            # Evaluar índice
+            index_reg = self.gen_expression(node.children[0], emitter)
+            offset_reg = self._registro()
         
-        # Calcular offset en bytes (index * 4)
-        emitter.emit(f"sll {offset_reg}, {index_reg}, 2  # index * 4")
+            # Calcular offset en bytes (index * 4)
+            emitter.emit(f"sll {offset_reg}, {index_reg}, 2  # index * 4")
         
-        # Calcular dirección final
-        if offset is not None:
-            addr_reg = f"$t{register_counter % 10}"
-            register_counter += 1
-            # Dirección base del arreglo
-            emitter.emit(f"addi {addr_reg}, $fp, {offset}")
-            # Sumar el offset del índice
-            emitter.emit(f"add {addr_reg}, {addr_reg}, {offset_reg}")
-            # Cargar el valor
-            emitter.emit(f"lw {reg}, 0({addr_reg})")
-        else:
-            emitter.emit_comment(f"[Error] Arreglo no encontrado: {name}")
-            emitter.emit(f"li {reg}, 0  # Error: usar 0 como valor por defecto")
+            # Calcular dirección final
+            if offset is not None:
+                addr_reg = self._registro()
+                # Dirección base del arreglo
+                emitter.emit(f"addi {addr_reg}, $fp, {offset}")
+                # Sumar el offset del índice
+                emitter.emit(f"add {addr_reg}, {addr_reg}, {offset_reg}")
+                # Cargar el valor
+                emitter.emit(f"lw {reg}, 0({addr_reg})")
+            else:
+                emitter.emit_comment(f"[Error] Arreglo no encontrado: {name}")
+                emitter.emit(f"li {reg}, 0  # Error: usar 0 como valor por defecto")
             
-    else:  # Simple variable: x
-        emitter.emit_comment(f"Cargar variable: {name}")
-        if offset is not None:
-            emitter.emit(f"lw {reg}, {offset}($fp)")
-        else:
-            emitter.emit_comment(f"[Error] Variable no encontrada: {name}")
-            emitter.emit(f"li {reg}, 0  # Error: usar 0 como valor por defecto")
+        else:  # Simple variable: x
+            emitter.emit_comment(f"Cargar variable: {name}")
+            if offset is not None:
+                emitter.emit(f"lw {reg}, {offset}($fp)")
+            else:
+                emitter.emit_comment(f"[Error] Variable no encontrada: {name}")
+                emitter.emit(f"li {reg}, 0  # Error: usar 0 como valor por defecto")
     
-    return reg
+        return reg
 
-# gen_num(node, emitter)
-# Traduce un número constante `NUM: 5` → `li $tX, 5`
-# - Retorna el registro donde quedó el número
-def gen_num(node, emitter):
-    """
-    Traduce un número constante `NUM: 5` → `li $tX, 5`
-    - Retorna el registro donde quedó el número
-    """
-    global register_counter
-    reg = f"$t{register_counter % 10}"
-    register_counter += 1
-    emitter.emit(f"li {reg}, {node.lexeme}")
-    return reg
-
-# gen_addop(node, emitter)
-# Traduce una suma o resta: `a + b`, `x - y`
-# - Evalúa ambos operandos y aplica `add` o `sub`
-def gen_addop(node, emitter):
-    """
-    Traduce una suma o resta: `a + b`, `x - y`
-    - Evalúa ambos operandos y aplica `add` o `sub`
-    """
-    global register_counter
-    
-    emitter.emit_comment(f"Operación aritmética: {node.lexeme}")
-    
-    # Evaluar operandos
-    left_reg = gen_expression(node.children[0], emitter)
-    right_reg = gen_expression(node.children[1], emitter)
-    
-    # Resultado
-    result_reg = f"$t{register_counter % 10}"
-    register_counter += 1
-    
-    # Aplicar operación
-    if node.lexeme == '+':
-        emitter.emit(f"add {result_reg}, {left_reg}, {right_reg}")
-    else:  # '-'
-        emitter.emit(f"sub {result_reg}, {left_reg}, {right_reg}")
-    
-    return result_reg
+    # self.gen_num(node, emitter)
+    # Traduce un número constante `NUM: 5` → `li $tX, 5`
+    # - Retorna el registro donde quedó el número
+    def gen_num(self, node, emitter):
+        """
+        Traduce un número constante `NUM: 5` → `li $tX, 5`
+        - Retorna el registro donde quedó el número
+        """
+        reg = self._registro()
+        emitter.emit(f"li {reg}, {node.lexeme}")
+        return reg
 
-# gen_mulop(node, emitter)
-# Traduce una multiplicación o división: `a * b`, `x / y`
-# - Evalúa ambos lados y aplica `mul` o `div`
-def gen_mulop(node, emitter):
-    """
-    Traduce una multiplicación o división: `a * b`, `x / y`
-    - Evalúa ambos lados y aplica `mul` o `div`
-    """
-    global register_counter
-    
-    emitter.emit_comment(f"Operación multiplicativa: {node.lexeme}")
+    # self.gen_addop(node, emitter)
+    # Traduce una suma o resta: `a + b`, `x - y`
+    # - Evalúa ambos operandos y aplica `add` o `sub`
+    def gen_addop(self, node, emitter):
+        """
+        Traduce una suma o resta: `a + b`, `x - y`
+        - Evalúa ambos operandos y aplica `add` o `sub`
+        """
+    
+        emitter.emit_comment(f"Operación aritmética: {node.lexeme}")
+    
+        # Evaluar operandos
+        left_reg = self.gen_expression(node.children[0], emitter)
+        right_reg = self.gen_expression(node.children[1], emitter)
+    
+        # Resultado
+        result_reg = self._registro()
+    
+        # Aplicar operación
+        if node.lexeme == '+':
+            emitter.emit(f"add {result_reg}, {left_reg}, {right_reg}")
+        else:  # '-'
+            emitter.emit(f"sub {result_reg}, {left_reg}, {right_reg}")
     
-    # Evaluar operandos
-    left_reg = gen_expression(node.children[0], emitter)
-    right_reg = gen_expression(node.children[1], emitter)
-    
-    # Resultado
-    result_reg = f"$t{register_counter % 10}"
-    register_counter += 1
-    
-    # Aplicar operación
-    if node.lexeme == '*':
-        emitter.emit(f"mul {result_reg}, {left_reg}, {right_reg}")
-    else:  # '/'
-        # División en MIPS usa registros especiales hi/lo
-        emitter.emit(f"div {left_reg}, {right_reg}")
-        emitter.emit(f"mflo {result_reg}  # Cociente de la división")
-    
-    return result_reg
+        return result_reg
 
-# gen_relop(node, emitter)
-# Traduce una comparación relacional: `<`, `>`, `!=`, etc.
-# - Usa instrucciones como `slt`, `beq`, `bne`, `bge`, etc.
-# - Retorna un registro con 1 o 0
-def gen_relop(node, emitter):
-    """
-    Translates relational operators: <, >, <=, >=, ==, !=
-    Returns a register containing 1 (true) or 0 (false)
-    """
-    global register_counter
-    
-    left = gen_expression(node.children[0], emitter)
-    right = gen_expression(node.children[1], emitter)
-    result_reg = f"$t{register_counter % 10}"
-    register_counter += 1
-    
-    op = node.lexeme
-    
-    if op == '<':
-        emitter.emit(f"slt {result_reg}, {left}, {right}")
-    elif op == '>':
-        emitter.emit(f"slt {result_reg}, {right}, {left}")
-    elif op == '<=':
-        # a <= b  is  !(a > b)  which is  !(b < a)
-        emitter.emit(f"slt {result_reg}, {right}, {left}")
-        emitter.emit(f"xori {result_reg}, {result_reg}, 1")
-    elif op == '>=':
-        # a >= b  is  !(a < b)
-        emitter.emit(f"slt {result_reg}, {left}, {right}")
-        emitter.emit(f"xori {result_reg}, {result_reg}, 1")
-    elif op == '==':
-        temp_reg = f"$t{register_counter % 10}"
-        register_counter += 1
-        emitter.emit(f"sub {temp_reg}, {left}, {right}")
-        emitter.emit(f"seq {result_reg}, {temp_reg}, $zero")
-    elif op == '!=':
-        temp_reg = f"$t{register_counter % 10}"
-        register_counter += 1
-        emitter.emit(f"sub {temp_reg}, {left}, {right}")
-        emitter.emit(f"sne {result_reg}, {temp_reg}, $zero")
-    
-    return result_reg
-
-# gen_selection_stmt(node, emitter)
-# Traduce una sentencia `if (...) { ... } else { ... }`
-# - Evalúa condición
-# - Genera etiquetas para true, false, y final
-# - Usa saltos `beq`, `bne`, `j`
-def gen_selection_stmt(node, emitter):
-    """
-    Translates if-else statements
-    node.children[0] = condition
-    node.children[1] = then statement
-    node.children[2] = else statement (optional)
-    """
-    emitter.emit_comment("Inicio de if statement")
-    
-    # Evaluate condition
-    cond_reg = gen_expression(node.children[0], emitter)
+    # self.gen_mulop(node, emitter)
+    # Traduce una multiplicación o división: `a * b`, `x / y`
+    # - Evalúa ambos lados y aplica `mul` o `div`
+    def gen_mulop(self, node, emitter):
+        """
+        Traduce una multiplicación o división: `a * b`, `x / y`
+        - Evalúa ambos lados y aplica `mul` o `div`
+        """
     
-    # Generate labels
-    else_label = emitter.new_label("else")
-    end_label = emitter.new_label("endif")
+        emitter.emit_comment(f"Operación multiplicativa: {node.lexeme}")
     
-    # Branch if condition is false (0)
-    emitter.emit(f"beq {cond_reg}, $zero, {else_label}")
+        # Evaluar operandos
+        left_reg = self.gen_expression(node.children[0], emitter)
+        right_reg = self.gen_expression(node.children[1], emitter)
     
-    # Generate then statement
-    generate_code(node.children[1], emitter)
+        # Resultado
+        result_reg = self._registro()
     
-    # Jump to end after then block
-    emitter.emit(f"j {end_label}")
-    
-    # Else label
-    emitter.emit(f"{else_label}:")
+        # Aplicar operación
+        if node.lexeme == '*':
+            emitter.emit(f"mul {result_reg}, {left_reg}, {right_reg}")
+        else:  # '/'
+            # División en MIPS usa registros especiales hi/lo
+            emitter.emit(f"div {left_reg}, {right_reg}")
+            emitter.emit(f"mflo {result_reg}  # Cociente de la división")
     
-    # Generate else statement if it exists
-    if len(node.children) > 2:
-        generate_code(node.children[2], emitter)
+        return result_reg
+
+    # self.gen_relop(node, emitter)
+    # Traduce una comparación relacional: `<`, `>`, `!=`, etc.
+    # - Usa instrucciones como `slt`, `beq`, `bne`, `bge`, etc.
+    # - Retorna un registro con 1 o 0
+    def gen_relop(self, node, emitter):
+        """
+        Translates relational operators: <, >, <=, >=, ==, !=
+        Returns a register containing 1 (true) or 0 (false)
+        """
+    
+        left, right = yield self._operandos(node, emitter)
+        result_reg = self._registro()
+    
+        op = node.lexeme
+    
+        if op == '<':
+            emitter.emit(f"slt {result_reg}, {left}, {right}")
+        elif op == '>':
+            emitter.emit(f"slt {result_reg}, {right}, {left}")
+        elif op == '<=':
+            # a <= b  is  !(a > b)  which is  !(b < a)
+            emitter.emit(f"slt {result_reg}, {right}, {left}")
+            emitter.emit(f"xori {result_reg}, {result_reg}, 1")
+        elif op == '>=':
+            # a >= b  is  !(a < b)
+            emitter.emit(f"slt {result_reg}, {left}, {right}")
+            emitter.emit(f"xori {result_reg}, {result_reg}, 1")
+        elif op == '==':
+            temp_reg = self._registro()
+            emitter.emit(f"sub {temp_reg}, {left}, {right}")
+            emitter.emit(f"seq {result_reg}, {temp_reg}, $zero")
+        elif op == '!=':
+            temp_reg = self._registro()
+            emitter.emit(f"sub {temp_reg}, {left}, {right}")
+            emitter.emit(f"sne {result_reg}, {temp_reg}, $zero")
     
-    # End label
-    emitter.emit(f"{end_label}:")
-    emitter.emit_comment("Fin de if statement")
+        return result_reg
 
+    def _condicion(self, node, falso, emitter):
+        """
+        Traduce la condición 'node' de un if o while y salta a 'falso' si es 0.
+        Un relop salta directo con la comparación contraria (bge, bne, ...)
+        en lugar de dejar 1 o 0 en un registro con gen_relop.
+        """
+        cond = self._plegados.get(node, node)
+        if cond.kind == 'relop':
+            emitter.emit_comment(f"Condición: {cond.lexeme}")
+            left, right = yield self._operandos(cond, emitter)
+            emitter.emit(f"{_SALTO_SI_FALSO[cond.lexeme]} {left}, {right}, {falso}")
+        else:
+            cond_reg = yield self._expresion(node, emitter)
+            emitter.emit(f"beq {cond_reg}, $zero, {falso}")
 
-# gen_iteration_stmt(node, emitter)
-# Traduce `while (...) { ... }`
-# - Genera etiquetas de entrada y fin
-# - Evalúa la condición al inicio de cada vuelta
-# - Salta fuera del bucle si la condición falla
-def gen_iteration_stmt(node, emitter):
-    """
-    Translates while loops
-    node.children[0] = condition
-    node.children[1] = body statement
-    """
-    emitter.emit_comment("Inicio de while loop")
-    
-    # Generate labels
-    loop_start = emitter.new_label("while")
-    loop_end = emitter.new_label("endwhile")
-    
-    # Loop start label
-    emitter.emit(f"{loop_start}:")
-    
-    # Evaluate condition
-    cond_reg = gen_expression(node.children[0], emitter)
-    
-    # Exit loop if condition is false
-    emitter.emit(f"beq {cond_reg}, $zero, {loop_end}")
-    
-    # Generate loop body
-    generate_code(node.children[1], emitter)
-    
-    # Jump back to start
-    emitter.emit(f"j {loop_start}")
-    
-    # End label
-    emitter.emit(f"{loop_end}:")
-    emitter.emit_comment("Fin de while loop")
+    # self.gen_selection_stmt(node, emitter)
+    # Traduce una sentencia `if (...) { ... } else { ... }`
+    # - Evalúa condición
+    # - Genera etiquetas para true, false, y final
+    # - Usa saltos `beq`, `bne`, `j`
+    def gen_selection_stmt(self, node, emitter):
+        """
+        Translates if-else statements
+        node.children[0] = condition
+        node.children[1] = then statement
+        node.children[2] = else statement (optional)
+        """
+        emitter.emit_comment("Inicio de if statement")
+    
+        # Generate labels
+        else_label = emitter.new_label("else")
+        end_label = emitter.new_label("endif")
+    
+        # Evaluate condition and branch if it is false (0)
+        yield self._condicion(node.children[0], else_label, emitter)
+    
+        # Generate then statement
+        yield self._sentencia(node.children[1], emitter)
+    
+        # Jump to end after then block
+        emitter.emit(f"j {end_label}")
+    
+        # Else label
+        self._etiqueta(else_label, emitter)
+    
+        # Generate else statement if it exists
+        if len(node.children) > 2:
+            yield self._sentencia(node.children[2], emitter)
+    
+        # End label
+        self._etiqueta(end_label, emitter)
+        emitter.emit_comment("Fin de if statement")
 
-# gen_return_stmt(node, emitter)
-# Traduce `return expr;` o `return;`
-# - Evalúa la expresión si existe
-# - Guarda el resultado en `$v0`
-# - Salta a la instrucción de retorno
 
-def gen_return_stmt(node, emitter):
-    """
-    Translates return statements
-    Places return value in $v0 and jumps to function epilogue
-    """
-    global current_function_name
-    
-    emitter.emit_comment("Return statement")
-    
-    # If there's a return value, evaluate it and put in $v0
-    if node.children:
-        result_reg = gen_expression(node.children[0], emitter)
-        emitter.emit(f"move $v0, {result_reg}")
-    
-    # Jump to function-specific epilogue
-    function_name = current_function_name if 'current_function_name' in globals() else "epilogue"
-    emitter.emit(f"j {function_name}_epilogue")
+    # self.gen_iteration_stmt(node, emitter)
+    # Traduce `while (...) { ... }`
+    # - Genera etiquetas de entrada y fin
+    # - Evalúa la condición al inicio de cada vuelta
+    # - Salta fuera del bucle si la condición falla
+    def gen_iteration_stmt(self, node, emitter):
+        """
+        Translates while loops
+        node.children[0] = condition
+        node.children[1] = body statement
+        """
+        emitter.emit_comment("Inicio de while loop")
+    
+        # Generate labels
+        loop_start = emitter.new_label("while")
+        loop_end = emitter.new_label("endwhile")
+    
+        # Loop start label
+        self._etiqueta(loop_start, emitter)
+    
+        # Evaluate condition and exit loop if it is false
+        yield self._condicion(node.children[0], loop_end, emitter)
+    
+        # Generate loop body
+        yield self._sentencia(node.children[1], emitter)
+    
+        # Jump back to start
+        emitter.emit(f"j {loop_start}")
+    
+        # End label
+        self._etiqueta(loop_end, emitter)
+        emitter.emit_comment("Fin de while loop")
 
-# gen_call(node, emitter)
-# Traduce una llamada a función
-# - Evalúa cada argumento y los pone en $a0-$a3
-# - Usa `jal` para saltar
-# - El resultado está en `$v0`
-def gen_call(node, emitter):
-    """
-    Translates function calls
-    Handles built-in functions (input, output) and user-defined functions
-    """
-    global register_counter
-    
-    func_name = node.lexeme
-    emitter.emit_comment(f"Llamada a función: {func_name}")
-    
-    # Handle built-in functions
-    if func_name == "input":
-        # input() reads an integer from user
-        emitter.emit("li $v0, 5")  # syscall for read integer
-        emitter.emit("syscall")
-        result_reg = f"$t{register_counter % 10}"
-        register_counter += 1
-        emitter.emit(f"move {result_reg}, $v0")
-        return result_reg
+    # self.gen_return_stmt(node, emitter)
+    # Traduce `return expr;` o `return;`
+    # - Evalúa la expresión si existe
+    # - Guarda el resultado en `$v0`
+    # - Salta a la instrucción de retorno
+
+    def gen_return_stmt(self, node, emitter):
+        """
+        Translates return statements
+        Places return value in $v0 and jumps to function epilogue
+        """
+    
+        emitter.emit_comment("Return statement")
+    
+        # If there's a return value, evaluate it and put in $v0
+        if node.children:
+            result_reg = yield self._expresion(node.children[0], emitter)
+            emitter.emit(f"move $v0, {result_reg}")
+    
+        # Jump to function-specific epilogue
+        function_name = self.current_function_name or "epilogue"
+        emitter.emit(f"j {function_name}_epilogue")
+
+    # self.gen_call(node, emitter)
+    # Traduce una llamada a función
+    # - Evalúa cada argumento y los pone en $a0-$a3
+    # - Usa `jal` para saltar
+    # - El resultado está en `$v0`
+    def gen_call(self, node, emitter):
+        """
+        Translates function calls
+        Handles built-in functions (input, output) and user-defined functions
+        """
     
-    elif func_name == "output":
-        # output(x) prints an integer
-        # Evaluate the argument
-        if node.children and node.children[0].children:
-            arg_reg = gen_expression(node.children[0].children[0].children[0], emitter)
-            emitter.emit(f"move $a0, {arg_reg}")
-            emitter.emit("li $v0, 1")  # syscall for print integer
-            emitter.emit("syscall")
-            # Print newline
-            emitter.emit("la $a0, newline")
-            emitter.emit("li $v0, 4")  # syscall for print string
+        func_name = node.lexeme
+        emitter.emit_comment(f"Llamada a función: {func_name}")
+    
+        # Handle built-in functions
+        if func_name == "input":
+            # input() reads an integer from user
+            emitter.emit("li $v0, 5")  # syscall for read integer
             emitter.emit("syscall")
-        return None
+            result_reg = self._registro()
+            emitter.emit(f"move {result_reg}, $v0")
+            return result_reg
+    
+        elif func_name == "output":
+            # output(x) prints an integer
+            # Evaluate the argument
+            if node.children and node.children[0].children:
+                arg_reg = yield self._expresion(node.children[0].children[0].children[0], emitter)
+                emitter.emit(f"move $a0, {arg_reg}")
+                emitter.emit("li $v0, 1")  # syscall for print integer
+                emitter.emit("syscall")
+                # Print newline
+                emitter.emit("la $a0, newline")
+                emitter.emit("li $v0, 4")  # syscall for print string
+                emitter.emit("syscall")
+            return None
     
-    else:
-        # User-defined function
-        # Evaluate and pass arguments on stack
-        if node.children and node.children[0].children:
-            args_list = node.children[0].children[0].children
-            # Push arguments onto stack (no need to reverse - they'll be accessed by offset)
-            for arg in args_list:
-                arg_reg = gen_expression(arg, emitter)
-                emitter.emit("addi $sp, $sp, -4")
-                emitter.emit(f"sw {arg_reg}, 0($sp)")
+        else:
+            # User-defined function
+            # Evaluate and pass arguments on stack
+            if node.children and node.children[0].children:
+                args_list = node.children[0].children[0].children
+                # Push arguments onto stack (no need to reverse - they'll be accessed by offset)
+                for arg in args_list:
+                    arg_reg = yield self._expresion(arg, emitter)
+                    emitter.emit("addi $sp, $sp, -4")
+                    emitter.emit(f"sw {arg_reg}, 0($sp)")
         
-        # Call function
-        emitter.emit(f"jal {func_name}")
+            # Call function
+            emitter.emit(f"jal {func_name}")
         
-        # Clean up arguments from stack
-        if node.children and node.children[0].children:
-            args_list = node.children[0].children[0].children
-            if len(args_list) > 0:
-                emitter.emit(f"addi $sp, $sp, {4 * len(args_list)}")
+            # Clean up arguments from stack
+            if node.children and node.children[0].children:
+                args_list = node.children[0].children[0].children
+                if len(args_list) > 0:
+                    emitter.emit(f"addi $sp, $sp, {4 * len(args_list)}")
         
-        # Result is in $v0
-        result_reg = f"$t{register_counter % 10}"
-        register_counter += 1
-        emitter.emit(f"move {result_reg}, $v0")
-        return result_reg
+            # Result is in $v0
+            result_reg = self._registro()
+            emitter.emit(f"move {result_reg}, $v0")
+            return result_reg
 
-# Función mejorada para manejar asignaciones a arreglos
-def gen_assign_array(node, emitter, index_reg):
-    """
-    Maneja asignación a elementos de arreglo: arr[i] = expr
-    """
-    name = node.lexeme
-    offset = symbol_table.get(name)
+    # Función mejorada para manejar asignaciones a arreglos
+    def gen_assign_array(self, node, emitter, index_reg):
+        """
+        Maneja asignación a elementos de arreglo: arr[i] = expr
+        """
+        name = node.lexeme
+        offset = _offset(node)
     
-    emitter.emit_comment(f"Asignación a arreglo: {name}[index]")
+        emitter.emit_comment(f"Asignación a arreglo: {name}[index]")
     
-    # Evaluar expresión del lado derecho
-    result_reg = gen_expression(node.children[0], emitter)
+        # Evaluar expresión del lado derecho
+        result_reg = self.gen_expression(node.children[0], emitter)
     
-    if offset is not None:
-        global register_counter
-        offset_reg = f"$t{register_counter % 10}"
-        register_counter += 1
-        addr_reg = f"$t{register_counter % 10}"
-        register_counter += 1
+        if offset is not None:
+            offset_reg = self._registro()
+            addr_reg = self._registro()
         
-        # Calcular offset en bytes
-        emitter.emit(f"sll {offset_reg}, {index_reg}, 2  # index * 4")
+            # Calcular offset en bytes
+            emitter.emit(f"sll {offset_reg}, {index_reg}, 2  # index * 4")
         
-        # Calcular dirección
-        emitter.emit(f"addi {addr_reg}, $fp, {offset}")
-        emitter.emit(f"add {addr_reg}, {addr_reg}, {offset_reg}")
+            # Calcular dirección
+            emitter.emit(f"addi {addr_reg}, $fp, {offset}")
+            emitter.emit(f"add {addr_reg}, {addr_reg}, {offset_reg}")
         
-        # Guardar valor
-        emitter.emit(f"sw {result_reg}, 0({addr_reg})")
-    else:
-        emitter.emit_comment(f"[Error] Arreglo no encontrado: {name}")
+            # Guardar valor
+            emitter.emit(f"sw {result_reg}, 0({addr_reg})")
+        else:
+            emitter.emit_comment(f"[Error] Arreglo no encontrado: {name}")
     
-    return result_reg
+        return result_reg
+
+    # Tablas kind -> handler (ver recorrido.despachar); None: kinds no previstos
+    SENTENCIAS = {
+        'program':            _gen_hijos,
+        'fun_decl':           gen_function,
+        'compound_stmt':      gen_compound_stmt,
+        'var_decl':           gen_var_decl,
+        'expression_stmt':    gen_expression_stmt,
+        'selection_stmt':     gen_selection_stmt,
+        'iteration_stmt':     gen_iteration_stmt,
+        'return_stmt':        gen_return_stmt,
+        'local_declarations': _gen_hijos,
+        'statement_list':     _gen_hijos,
+        None:                 _sentencia_desconocida,
+    }
+    SENTENCIAS.update(dict.fromkeys(['type_specifier', 'ID', 'params', 'VOID', 'param_list',
+                                     'param', 'args', 'arg_list'], _sin_codigo))
+    # expresiones y operaciones
+    SENTENCIAS.update(dict.fromkeys(['assign', 'addop', 'mulop', 'relop', 'var', 'NUM', 'call'],
+                                    _expresion))
+
+    EXPRESIONES = {
+        'NUM':    _expr_num,
+        'var':    _expr_var,
+        'addop':  _expr_addop,
+        'mulop':  _expr_mulop,
+        'relop':  gen_relop,
+        'assign': _expr_assign,
+        'call':   _expr_call,
+        None:     _expr_desconocida,
+    }
+
+
+# Interfaz de módulo: codeGen() usa el generador de la sesión por defecto.
+
+def _por_defecto():
+    from sesion import sesion_por_defecto
+    return sesion_por_defecto.cgen
+
+def codeGen(tree, filename):
+    _por_defecto().codeGen(tree, filename)
 
+def __getattr__(name):
+    if name in ('offset_counter', 'register_counter', 'current_function_name'):
+        return getattr(_por_defecto(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
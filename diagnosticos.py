@@ -0,0 +1,162 @@
+# diagnosticos.py
+# Diagnósticos estructurados. El parser y la semántica no arman texto al encontrar
+# un error: agregan a un ColectorDiagnosticos un registro compacto (severidad,
+# código, offsets, línea y argumentos del mensaje). El texto con la línea y el
+# caret, o el JSON, se arma recién al volcar, y se escribe de una sola vez.
+#
+# El colector puede guardar sólo los primeros 'limite' errores (los demás se
+# cuentan) y cortar el análisis al llegar a 'parar_en' errores: agregar() lanza
+# AnalisisDetenido, que parse() y semantica() atrapan. Con formato='json' volcar()
+# escribe un objeto JSON por línea en lugar del texto.
+
+import sys
+from json.encoder import encode_basestring as _cadena
+
+ERROR = 'error'
+
+# Código -> plantilla del mensaje. El código es también el id de la plantilla.
+PLANTILLAS = {
+    # Sintaxis
+    'P01': "Se esperaba {}, se encontró {}",
+    'P02': "se esperaba identificador en declaration",
+    'P03': "Se esperaba ID después de coma en var_decl",
+    'P04': "La parte izquierda de la asignación debe ser una variable",
+    'P05': "Error en factor",
+    'P06': "La última declaración debe ser la función main",
+    'P07': "Tokens sobrantes después de EOF",
+    # Semántica
+    'S01': "Símbolo '{}' ya declarado en este ámbito",
+    'S02': "Variable '{}' no declarada",
+    'S03': "Asignación de tipo no entero",
+    'S04': "Operación aritmética aplicada a operandos no enteros",
+    'S05': "Operación relacional aplicada a operandos no enteros",
+    'S06': "Llamada a función no declarada: {}",
+    'S07': "Número de argumentos incorrecto en llamada a {}",
+    'S08': "Tipo de argumento inválido en llamada a {}",
+    'S09': "Return con valor en función void",
+    'S10': "Return de tipo no entero en función int",
+    'S11': "Return sin valor en función int",
+    'S12': "Condición de control no entera",
+}
+
+
+class AnalisisDetenido(Exception):
+    """Se llegó a ColectorDiagnosticos.parar_en errores."""
+
+
+class Diagnostico:
+    """
+    Un error: [inicio, fin) en la fuente y/o la línea. Los del parser llevan
+    sólo offsets; los de la semántica, offsets y la línea del nodo. Sin ninguno
+    de los dos (nodo armado fuera del parser) se muestra sólo el mensaje.
+    """
+    __slots__ = ('severidad', 'codigo', 'inicio', 'fin', 'linea', 'args')
+
+    def __init__(self, codigo, inicio=None, fin=None, linea=None, args=(), severidad=ERROR):
+        self.severidad = severidad
+        self.codigo = codigo
+        self.inicio = inicio
+        self.fin = fin
+        self.linea = linea
+        self.args = args
+
+    def mensaje(self):
+        return PLANTILLAS[self.codigo].format(*self.args)
+
+    def desplazado(self, d_off, d_lin=0):
+        """Copia con los offsets y la línea corridos (ver incremental.py)."""
+        return Diagnostico(self.codigo,
+                           None if self.inicio is None else self.inicio + d_off,
+                           None if self.fin is None else self.fin + d_off,
+                           None if self.linea is None else self.linea + d_lin,
+                           self.args, self.severidad)
+
+    def texto(self, mapa):
+        """Mismo texto que imprimían Parser.error y semanticError."""
+        if self.inicio is None and self.linea is None:
+            return f"Error semántico: {self.mensaje()}\n"
+        return mapa.diagnostico(self.mensaje(), self.inicio, self.linea)
+
+    def json(self, mapa=None):
+        # Armado a mano, como en volcado.json_ast
+        linea, columna = self.linea, None
+        if mapa is not None and self.inicio is not None:
+            linea = mapa.linea(self.inicio)
+            columna = self.inicio - mapa.inicios[linea - 1]
+        campos = [f'"severidad": {_cadena(self.severidad)}', f'"codigo": {_cadena(self.codigo)}',
+                  f'"mensaje": {_cadena(self.mensaje())}']
+        for nombre, v in (('inicio', self.inicio), ('fin', self.fin),
+                          ('linea', linea), ('columna', columna)):
+            campos.append(f'"{nombre}": {"null" if v is None else v}')
+        return '{' + ', '.join(campos) + '}'
+
+    def __repr__(self):
+        return f"Diagnostico({self.codigo!r}, {self.inicio!r}, {self.fin!r}, {self.linea!r}, {self.args!r})"
+
+
+class ColectorDiagnosticos:
+    """
+    Registros de diagnósticos de una compilación, en orden de aparición.
+    'limite': cuántos se guardan (None = todos); 'parar_en': a cuántos errores
+    se corta el análisis (None = nunca); 'formato': 'texto' o 'json' para volcar().
+    """
+    def __init__(self, limite=None, parar_en=None, formato='texto'):
+        self.limite = limite
+        self.parar_en = parar_en
+        self.formato = formato
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.registros = []
+        self.errores = 0         # todos, incluidos los que pasaron el límite
+        self.detenido = False    # ¿se cortó el análisis por parar_en?
+        self._volcados = 0       # registros ya escritos por volcar()
+        self._omitidos = 0       # errores sin guardar ya avisados por volcar()
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __iter__(self):
+        return iter(self.registros)
+
+    def agregar(self, codigo, inicio=None, fin=None, linea=None, *args):
+        self.anotar(Diagnostico(codigo, inicio, fin, linea, args))
+
+    def anotar(self, diag):
+        """Agrega un Diagnostico ya armado (p. ej. traído de otro proceso)."""
+        self.errores += 1
+        if self.limite is None or len(self.registros) < self.limite:
+            self.registros.append(diag)
+        if self.parar_en is not None and self.errores >= self.parar_en:
+            self.detenido = True
+            raise AnalisisDetenido(self.errores)
+
+    @property
+    def omitidos(self):
+        return self.errores - len(self.registros)
+
+    def texto(self, mapa, desde=0):
+        """Texto de los registros[desde:]."""
+        return "".join(d.texto(mapa) for d in self.registros[desde:])
+
+    def json(self, mapa=None):
+        """Generador con una línea JSON por registro."""
+        for d in self.registros:
+            yield d.json(mapa)
+
+    def volcar(self, mapa, salida=None):
+        """
+        Escribe en 'salida' (None -> sys.stdout) los registros que todavía no se
+        escribieron, y un aviso si desde el último volcado se omitieron errores.
+        """
+        if self.formato == 'json':
+            texto = "".join(d.json(mapa) + "\n" for d in self.registros[self._volcados:])
+        else:
+            texto = self.texto(mapa, self._volcados)
+        self._volcados = len(self.registros)
+        nuevos = self.omitidos - self._omitidos
+        if nuevos and self.formato != 'json':
+            texto += f"... {nuevos} errores más sin mostrar (límite de {self.limite})\n"
+            self._omitidos += nuevos
+        if texto:
+            (sys.stdout if salida is None else salida).write(texto)
@@ -37,7 +37,11 @@ class TokenType(Enum):
     COMMA   = ','
 
     COMMENT = 'comment'
-    
+
+    # Cada miembro es único y se compara por identidad: el hash por identidad es
+    # el de C y evita llamar a Enum.__hash__ (Python) en cada búsqueda de tablas
+    __hash__ = object.__hash__
+
 
 class StateType(Enum):
     START     = 0
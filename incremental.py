@@ -0,0 +1,371 @@
+# incremental.py
+# Front end incremental (lexer + parser + semántica) para un editor. Después de
+# cada edición se re-analizan sólo las declaraciones top-level que tocan los tokens
+# cambiados y se re-chequean sólo las funciones nuevas y las que usan un símbolo
+# global cuya declaración cambió. Los diagnósticos y el árbol son los mismos que
+# daría compilar el texto completo desde cero (parse(False) + semantica(False)).
+#
+# Las declaraciones que quedan después de la edición no se recorren: llevan un
+# desplazamiento pendiente (offset y línea) que se aplica a sus nodos sólo cuando
+# hace falta (re-chequeo o programa()). Sus errores se guardan como registros de
+# diagnosticos.py y el texto se arma al pedir diagnosticos().
+
+from bisect import bisect_left, bisect_right
+
+from globalTypes import *
+from diagnosticos import ColectorDiagnosticos, Diagnostico
+from lexer import LexerTokens, tokenize, _Inicios
+from parser import ASTNode
+from semantica import AnalizadorSemantico
+from sesion import MOTORES_PARSER
+from sourcemap import SourceMap
+
+_INICIO_DECL = (TokenType.INT, TokenType.VOID)
+
+
+class MapaFlujo(SourceMap):
+    """
+    SourceMap sobre un TokenStream: la línea de un offset sale del token que lo
+    precede (búsqueda binaria), así que no hace falta la tabla de inicios de
+    línea de todo el texto después de cada edición.
+    """
+    def __init__(self, flujo):
+        super().__init__(flujo.fuente)
+        self.flujo = flujo
+
+    def linea(self, offset):
+        f = self.flujo
+        i = bisect_right(_Inicios(f), offset) - 1
+        if i < 0:
+            return 1 + self.texto.count('\n', 0, offset)
+        return f.linea(i) + self.texto.count('\n', f.inicio(i), offset)
+
+    def _linea_de(self, offset):
+        texto = self.texto
+        ini = texto.rfind('\n', 0, offset) + 1
+        fin = texto.find('\n', offset)
+        if fin < 0:
+            fin = len(texto)
+        if fin > ini and texto[fin-1] == '\r':
+            fin -= 1
+        return self.linea(offset), ini, fin
+
+
+def _cabecera(nodo):
+    # Lo que la declaración aporta a la tabla global
+    k = nodo.kind
+    if k == 'var_decl':
+        return (k,) + tuple(c.lexeme for c in nodo.children)
+    if k == 'fun_decl':
+        params = nodo.children[2]
+        firma = ()
+        if params.children and params.children[0].kind != 'VOID':
+            firma = tuple((p.children[0].lexeme, len(p.children))
+                          for p in params.children[0].children)
+        return (k, nodo.children[0].lexeme, nodo.children[1].lexeme, firma)
+    return (k,)
+
+
+def _firma_simbolo(info):
+    return (info.kind, info.type, info.array_size, tuple(info.params))
+
+
+def _desplazar(nodos, d_off, d_lin):
+    # Aplica el desplazamiento pendiente a todos los nodos de una declaración
+    pila = list(nodos)
+    while pila:
+        n = pila.pop()
+        n.lineno += d_lin
+        if n.inicio is not None:
+            n.inicio += d_off
+        if n.fin is not None:
+            n.fin += d_off
+        pila.extend(n.children)
+
+
+class _Decl:
+    """Una declaración top-level: sus nodos, sus tokens y sus diagnósticos."""
+    __slots__ = ('nodos', 't_ini', 't_fin', 'diag_parser', 'diag_sem', 'nombres',
+                 'cabecera', 'd_off', 'd_lin')
+
+    def __init__(self, nodos, t_ini, t_fin, diag_parser):
+        self.nodos = nodos
+        self.t_ini = t_ini           # primer token
+        self.t_fin = t_fin           # token siguiente (el último que miró el parser)
+        self.diag_parser = diag_parser
+        self.diag_sem = []
+        self.nombres = ()            # nombres que buscó el chequeo de la función
+        self.cabecera = tuple(_cabecera(n) for n in nodos)
+        self.d_off = 0               # desplazamiento pendiente de offsets y líneas
+        self.d_lin = 0
+
+    def es_funcion(self):
+        return len(self.nodos) == 1 and self.nodos[0].kind == 'fun_decl'
+
+    def aplica_desplazamiento(self, extra_off=0, extra_lin=0):
+        # 'extra' es la parte del ajuste común (ver FrontEndIncremental._ajuste)
+        # que le toca; después de aplicarlo el pendiente real queda en cero
+        off, lin = self.d_off + extra_off, self.d_lin + extra_lin
+        if off or lin:
+            _desplazar(self.nodos, off, lin)
+            self.diag_parser = [r.desplazado(off) for r in self.diag_parser]
+            self.diag_sem = [r.desplazado(off, lin) for r in self.diag_sem]
+        self.d_off, self.d_lin = -extra_off, -extra_lin
+
+
+class _Tokens:
+    # Vista de t_ini o t_fin reales de decls[desde:], para usar bisect sin copiar
+    __slots__ = ('fe', 'campo', 'desde')
+    def __init__(self, fe, campo, desde=0):
+        self.fe, self.campo, self.desde = fe, campo, desde
+    def __len__(self):
+        return len(self.fe.decls) - self.desde
+    def __getitem__(self, i):
+        return self.fe._real(self.desde + i, self.campo)
+
+
+class _AnalizadorRegistro(AnalizadorSemantico):
+    # Anota qué nombres busca cada función, para saber a quién re-chequear cuando
+    # cambia un símbolo global. El índice de referencias no se arma (sólo sirve
+    # para imprimir tablas, que aquí no se imprimen).
+    indexa_referencias = False
+
+    def __init__(self, prs):
+        super().__init__(prs)
+        self.nombres = set()
+
+    def lookup_symbol(self, name):
+        self.nombres.add(name)
+        return super().lookup_symbol(name)
+
+
+class FrontEndIncremental:
+    """
+    fe = FrontEndIncremental(texto)
+    fe.editar(offset, borrados, insertado)   # una o más veces
+    fe.diagnosticos()                        # texto de parse(False) + semantica(False)
+    fe.programa()                            # AST anotado, listo para cgen
+
+    Como en TokenStream, después de una edición queda un ajuste pendiente
+    '_ajuste' = [k, tokens, offset, línea]: las declaraciones decls[k:] guardan
+    t_ini, t_fin, d_off y d_lin sin sumarle esos deltas. Así una edición no
+    recorre las declaraciones que siguen, sólo mueve 'k'.
+    """
+    def __init__(self, fuente, motor_parser='ll1'):
+        self.flujo = tokenize(fuente)
+        self.parser = MOTORES_PARSER[motor_parser](salida=None)
+        self.semantica = _AnalizadorRegistro(self.parser)
+        self.decls = []
+        self._ajuste = None
+        self._con_diag = set()            # declaraciones con algún diagnóstico
+        self.t_fin = 0                    # token donde terminó program()
+        self.programa_nodo = None
+        self._hijos_al_dia = False        # ¿programa_nodo.children refleja decls?
+        self.globales = {}                # ámbito global de la semántica
+        self.diag_globales = []
+        # Estadísticas de la última edición
+        self.reanalizadas = 0
+        self.rechequeadas = 0
+        self._reanaliza(0, 0, 0, 0)
+
+    # Ajuste pendiente de las declaraciones
+
+    def _real(self, i, campo):
+        v = getattr(self.decls[i], campo)
+        a = self._ajuste
+        return v + a[1] if a is not None and i >= a[0] else v
+
+    def _extra(self, i):
+        # (offset, línea) del ajuste que le corresponde a decls[i]
+        a = self._ajuste
+        return (a[2], a[3]) if a is not None and i >= a[0] else (0, 0)
+
+    def _mueve_ajuste(self, k):
+        # Lleva el comienzo del ajuste a decls[k]; sólo toca las que quedan entre medio
+        a = self._ajuste
+        if a is None:
+            return
+        k_viejo, d_tok, d_off, d_lin = a
+        if k > k_viejo:
+            rango, s = self.decls[k_viejo:k], 1
+        else:
+            rango, s = self.decls[k:k_viejo], -1
+        for d in rango:
+            d.t_ini += s * d_tok
+            d.t_fin += s * d_tok
+            d.d_off += s * d_off
+            d.d_lin += s * d_lin
+        a[0] = k
+
+    # Edición
+
+    def editar(self, offset, borrados, insertado, nuevo=None):
+        """
+        Reemplaza fuente[offset:offset+borrados] por 'insertado' y actualiza todo.
+        'nuevo' es el texto ya editado, si el llamador lo tiene (ver TokenStream.editar).
+        """
+        viejo = self.flujo.fuente
+        if nuevo is None:
+            nuevo = viejo[:offset] + insertado + viejo[offset + borrados:]
+        d_off = len(insertado) - borrados
+        d_lin = insertado.count('\n') - viejo.count('\n', offset, offset + borrados)
+        a, j_viejo, j_nuevo = self.flujo.editar(offset, borrados, insertado, nuevo)
+        self._reanaliza(a, j_viejo, j_nuevo - j_viejo, d_off, d_lin)
+
+    def _reanaliza(self, a, j_viejo, d_tok, d_off, d_lin=0):
+        # Tokens [a, j_viejo) del flujo viejo pasaron a ser [a, j_viejo + d_tok)
+        decls = self.decls
+        j_nuevo = j_viejo + d_tok
+        # Primera declaración que miró algún token cambiado (incluido el siguiente)
+        k0 = bisect_left(_Tokens(self, 't_fin'), a)
+        if k0 == len(decls) and a > self.t_fin and self.programa_nodo is not None:
+            # La edición cae después de donde terminó program()
+            self.reanalizadas = self.rechequeadas = 0
+            return
+        inicio = self._real(k0, 't_ini') if k0 < len(decls) else self.t_fin
+        viejas = _Tokens(self, 't_ini', k0)
+
+        # Parser posicionado en el token 'inicio'
+        f = self.flujo
+        p = self.parser
+        lex = LexerTokens(f, None, materializa=False)
+        lex.indice = inicio
+        p.lex, p.programa, p.mapa = lex, f.fuente, MapaFlujo(f)
+        p.fin = f.inicio(inicio - 1) + f.largos[inicio - 1] if inicio > 0 else 0
+        p.advance()
+        if self.programa_nodo is None:
+            self.programa_nodo = ASTNode('program', None, lex.lineno, p.inicio, p.fin)
+        prog = self.programa_nodo
+        if inicio == 0:
+            # program empieza en el primer token que no se salta el parser
+            prog.lineno, prog.inicio = lex.lineno, p.inicio
+
+        nuevas = []
+        m = len(decls)
+        while p.token in _INICIO_DECL:
+            t_ini = lex.indice - 1
+            p.diagnosticos = ColectorDiagnosticos()
+            r = p.declaration()
+            nodos = r if isinstance(r, list) else [r]
+            t_fin = lex.indice - 1
+            nuevas.append(_Decl(nodos, t_ini, t_fin, p.diagnosticos.registros))
+            if t_fin >= j_nuevo:
+                # ¿Empieza aquí una declaración vieja que ya no cambió?
+                r = bisect_left(viejas, t_fin - d_tok)
+                if r < len(viejas) and viejas[r] == t_fin - d_tok and viejas[r] >= j_viejo:
+                    m = k0 + r
+                    break
+
+        # Se reemplazan decls[k0:m]; las que siguen suman la edición al ajuste
+        quitadas = decls[k0:m]
+        if m < len(decls):
+            self._mueve_ajuste(m)
+            if self._ajuste is None:
+                self._ajuste = [m, 0, 0, 0]
+            aj = self._ajuste
+            aj[1] += d_tok
+            aj[2] += d_off
+            aj[3] += d_lin
+            decls[k0:m] = nuevas
+            aj[0] = k0 + len(nuevas)
+            self.t_fin += d_tok
+            prog.fin += d_off
+        else:
+            if self._ajuste is not None and self._ajuste[0] < k0:
+                self._mueve_ajuste(k0)
+            self._ajuste = None
+            decls[k0:] = nuevas
+            self.t_fin = lex.indice - 1
+            prog.fin = max(p.fin_previo, prog.inicio)   # como Parser.cierra
+        self._con_diag.difference_update(quitadas)
+        self._con_diag.update(d for d in nuevas if d.diag_parser)
+        self.reanalizadas = len(nuevas)
+
+        self._hijos_al_dia = False
+
+        self._rechequea(quitadas, nuevas)
+
+    def _hijos_programa(self):
+        # Los hijos de program se arman de nuevo sólo cuando alguien los necesita
+        if not self._hijos_al_dia:
+            self.programa_nodo.children[:] = [n for d in self.decls for n in d.nodos]
+            self._hijos_al_dia = True
+        return self.programa_nodo
+
+    # Semántica
+
+    def _rechequea(self, quitadas, nuevas):
+        s = self.semantica
+        rechequear = [(None, d) for d in nuevas if d.es_funcion()]
+        if [d.cabecera for d in quitadas] != [d.cabecera for d in nuevas]:
+            # Cambió la tabla global: se rearma y se ve qué nombres cambiaron
+            viejos = {n: _firma_simbolo(i) for n, i in self.globales.items()}
+            s.diagnosticos = ColectorDiagnosticos()
+            s.tabla_global(self._hijos_programa())
+            self.diag_globales = s.diagnosticos.registros
+            self.globales = s.depth[0]
+            nuevos = {n: _firma_simbolo(i) for n, i in self.globales.items()}
+            cambiados = {n for n in viejos.keys() | nuevos.keys() if viejos.get(n) != nuevos.get(n)}
+            if cambiados:
+                nuevas_ids = set(map(id, nuevas))
+                rechequear += [(i, d) for i, d in enumerate(self.decls)
+                               if d.es_funcion() and id(d) not in nuevas_ids
+                               and not cambiados.isdisjoint(d.nombres)]
+        for i, d in rechequear:
+            # Las nuevas quedan antes del ajuste: no tienen nada pendiente
+            d.aplica_desplazamiento(*(self._extra(i) if i is not None else (0, 0)))
+            s.tabla.reiniciar(self.globales)
+            s.current_func_ret = []
+            s.nombres = set()
+            s.diagnosticos = ColectorDiagnosticos()
+            s.chequear_funcion(d.nodos[0])
+            d.diag_sem = s.diagnosticos.registros
+            d.nombres = s.nombres
+            if d.diag_sem or d.diag_parser:
+                self._con_diag.add(d)
+            else:
+                self._con_diag.discard(d)
+        self.rechequeadas = len(rechequear)
+
+    # Resultados
+
+    def registros(self):
+        """Los diagnosticos.Diagnostico de parse(False) + semantica(False), en orden."""
+        res = []
+        # Sólo se miran las declaraciones con diagnósticos, en orden de fuente
+        con_diag = sorted((self.decls.index(d), d) for d in self._con_diag)
+        for i, d in con_diag:
+            off, _ = self._extra(i)
+            res.extend(r.desplazado(d.d_off + off) for r in d.diag_parser)
+        # Controles del final de parse()
+        f = self.flujo
+        ini = f.inicio(self.t_fin)
+        fin = ini + f.largos[self.t_fin]
+        if self.decls:
+            last = self.decls[-1].nodos[-1]
+            if not (last.kind == 'fun_decl' and last.children[1].lexeme == 'main'):
+                res.append(Diagnostico('P06', ini, fin))
+        if f.tipo(self.t_fin) != TokenType.ENDFILE:
+            res.append(Diagnostico('P07', ini, fin))
+        # Semántica: tabla global y funciones en orden
+        res.extend(self.diag_globales)
+        for i, d in con_diag:
+            off, lin = self._extra(i)
+            res.extend(r.desplazado(d.d_off + off, d.d_lin + lin) for r in d.diag_sem)
+        return res
+
+    def diagnosticos(self):
+        """Mismo texto que parse(False) seguido de semantica(tree, False)."""
+        mapa = MapaFlujo(self.flujo)
+        partes = [r.texto(mapa) for r in self.registros()]
+        if not self.diag_globales and not any(d.diag_sem for d in self._con_diag):
+            partes.append("\nType Checking Finished\n")
+        return "".join(partes)
+
+    def programa(self):
+        """El nodo program con todos los desplazamientos pendientes aplicados."""
+        self._mueve_ajuste(len(self.decls))
+        self._ajuste = None
+        for d in self.decls:
+            d.aplica_desplazamiento()
+        return self._hijos_programa()
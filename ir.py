@@ -0,0 +1,448 @@
+# ir.py
+# Representación intermedia de tres direcciones entre el AST y MIPS. bajar()
+# traduce una fun_decl ya chequeada por la semántica a una FuncionIR:
+#
+# - Cada valor va a un temporal nuevo (t0, t1, ...: registros virtuales sin
+#   límite; seleccion.py los pasa a registros.asignar()).
+# - Los accesos a memoria son explícitos: 'load' y 'store' con una base (un
+#   temporal, o None para $fp) y un offset, y 'addr' para la dirección de un
+#   arreglo local. Los lugares del marco son los que anotó la semántica en
+#   node.ligadura, igual que en cgen.
+# - Las instrucciones van en bloques básicos; cada bloque termina con un
+#   'jump', un 'branch' o un 'ret', y sus sucesores y predecesores forman el
+#   grafo de flujo de control. Los bloques a los que no se llega se quitan.
+#
+# volcar() da el texto de una FuncionIR para depurar (main.py --volcar-ir) y
+# reusar_valores() es la primera pasada sobre el IR (numeración de valores
+# dentro de cada bloque).
+#
+# La bajada usa el mismo motor que cgen (recorrido.ejecutar y tablas kind ->
+# handler), así que no tiene límite de profundidad. El orden de evaluación y
+# la convención de llamada son los de cgen: los argumentos se apilan en orden
+# (salvo en findMax y calculateSum, como allí) y el resultado vuelve en $v0.
+
+from recorrido import ejecutar
+
+# Operación de cada operador de addop, mulop y relop
+OPERACIONES = {'+': 'add', '-': 'sub', '*': 'mul', '/': 'div',
+               '<': 'slt', '<=': 'sle', '>': 'sgt', '>=': 'sge', '==': 'seq', '!=': 'sne'}
+_SIMBOLOS = {op: s for s, op in OPERACIONES.items()}
+
+TERMINADORES = frozenset(('jump', 'branch', 'ret'))
+
+# Operaciones sin efectos (el resultado depende sólo de los operandos) y, de
+# ellas, las conmutativas
+_PURAS = frozenset(('li', 'addr', 'sll')) | frozenset(_SIMBOLOS)
+_CONMUTATIVAS = frozenset(('add', 'mul', 'seq', 'sne'))
+
+# Funciones que cgen llama con los argumentos al revés (la dirección del
+# arreglo queda en 8($fp))
+_ARGUMENTOS_AL_REVES = frozenset(('findMax', 'calculateSum'))
+
+
+class Instr:
+    """
+    Una instrucción: op, el temporal que escribe (dst) y hasta tres operandos.
+
+        li     dst, a=constante           load   dst, a=base, b=offset
+        mov    dst, a                     store  a=valor, b=base, c=offset
+        add, sub, mul, div, slt, sle,     addr   dst, a=offset ($fp + a)
+        sgt, sge, seq, sne  dst, a, b     arg    a (se apila)
+        sll    dst, a, b=constante
+        input  dst                        call   dst, a=nombre, b=argumentos
+        output a                          jump   a=bloque
+        ret    a (o None)                 branch a=condición, b=si no es 0, c=si es 0
+    """
+    __slots__ = ('op', 'dst', 'a', 'b', 'c')
+
+    def __init__(self, op, dst=None, a=None, b=None, c=None):
+        self.op = op
+        self.dst = dst
+        self.a = a
+        self.b = b
+        self.c = c
+
+    def usos(self):
+        """Temporales que lee."""
+        op = self.op
+        if op in _SIMBOLOS:
+            return (self.a, self.b)
+        if op in ('mov', 'sll', 'arg', 'output', 'branch') or (op == 'ret' and self.a is not None):
+            return (self.a,)
+        if op == 'load':
+            return () if self.a is None else (self.a,)
+        if op == 'store':
+            return (self.a,) if self.b is None else (self.a, self.b)
+        return ()
+
+    def renombrar(self, nombres):
+        """Cambia cada temporal leído que esté en 'nombres' por su valor."""
+        op = self.op
+        if op in _SIMBOLOS:
+            self.a = nombres.get(self.a, self.a)
+            self.b = nombres.get(self.b, self.b)
+        elif op in ('mov', 'sll', 'arg', 'output', 'branch', 'ret', 'load'):
+            if self.a is not None:
+                self.a = nombres.get(self.a, self.a)
+        elif op == 'store':
+            self.a = nombres.get(self.a, self.a)
+            if self.b is not None:
+                self.b = nombres.get(self.b, self.b)
+
+    def __repr__(self):
+        return texto(self)
+
+
+class Bloque:
+    __slots__ = ('numero', 'prefijo', 'instrucciones', 'sucesores', 'predecesores')
+
+    def __init__(self, numero, prefijo):
+        self.numero = numero
+        self.prefijo = prefijo      # para la etiqueta en MIPS (como las de cgen)
+        self.instrucciones = []
+        self.sucesores = []
+        self.predecesores = []
+
+    def __repr__(self):
+        return f"B{self.numero}"
+
+
+class FuncionIR:
+    __slots__ = ('nombre', 'marco', 'temporales', 'bloques')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.marco = 0          # bytes de los locales
+        self.temporales = 0
+        self.bloques = []       # el primero es la entrada
+
+    def instrucciones(self):
+        return sum(len(b.instrucciones) for b in self.bloques)
+
+
+def _temporal(t):
+    return f"t{t}"
+
+
+def _memoria(base, offset):
+    base = 'fp' if base is None else _temporal(base)
+    return f"[{base} {'-' if offset < 0 else '+'} {abs(offset)}]"
+
+
+def texto(i):
+    """Texto de una instrucción, como en volcar()."""
+    op = i.op
+    if op in _SIMBOLOS:
+        return f"{_temporal(i.dst)} = {_temporal(i.a)} {_SIMBOLOS[op]} {_temporal(i.b)}"
+    if op == 'li':
+        return f"{_temporal(i.dst)} = {i.a}"
+    if op == 'mov':
+        return f"{_temporal(i.dst)} = {_temporal(i.a)}"
+    if op == 'sll':
+        return f"{_temporal(i.dst)} = {_temporal(i.a)} << {i.b}"
+    if op == 'load':
+        return f"{_temporal(i.dst)} = {_memoria(i.a, i.b)}"
+    if op == 'store':
+        return f"{_memoria(i.b, i.c)} = {_temporal(i.a)}"
+    if op == 'addr':
+        return f"{_temporal(i.dst)} = fp {'-' if i.a < 0 else '+'} {abs(i.a)}"
+    if op == 'call':
+        return f"{_temporal(i.dst)} = call {i.a}, {i.b}"
+    if op == 'input':
+        return f"{_temporal(i.dst)} = input"
+    if op in ('arg', 'output'):
+        return f"{op} {_temporal(i.a)}"
+    if op == 'jump':
+        return f"jump {i.a!r}"
+    if op == 'branch':
+        return f"if {_temporal(i.a)} goto {i.b!r} else {i.c!r}"
+    if op == 'ret':
+        return "ret" if i.a is None else f"ret {_temporal(i.a)}"
+    return op
+
+
+def volcar(funcion):
+    """Texto de 'funcion': sus bloques con predecesores e instrucciones."""
+    lineas = [f"function {funcion.nombre}  (marco {funcion.marco}, "
+              f"{funcion.temporales} temporales, {len(funcion.bloques)} bloques)"]
+    for b in funcion.bloques:
+        desde = ', '.join(map(repr, b.predecesores))
+        lineas.append(f"{b!r} ({b.prefijo}):" + (f"    <- {desde}" if desde else ""))
+        lineas.extend(f"    {texto(i)}" for i in b.instrucciones)
+    return '\n'.join(lineas) + '\n'
+
+
+class Bajada:
+    """
+    Traduce fun_decls a FuncionIR. Como en cgen, cada kind tiene su handler en
+    SENTENCIAS o EXPRESIONES; los de expresiones devuelven el temporal con el
+    valor y los que traducen hijos son generadores (ver recorrido.py).
+    """
+
+    def __init__(self, plegados=None):
+        # nodo -> expresión simplificada (plegado.plegar); se traduce el reemplazo
+        self._plegados = plegados or {}
+
+    def funcion(self, decl):
+        f = self._f = FuncionIR(decl.children[1].lexeme)
+        self._bloque = Bloque(0, 'entry')
+        f.bloques.append(self._bloque)
+        ejecutar(self._sentencia(decl.children[3]))
+        self._agregar(Instr('ret'))
+        _armar_grafo(f)
+        return f
+
+    # Temporales, bloques e instrucciones
+
+    def _nuevo(self, prefijo):
+        # Un bloque entra en f.bloques cuando empieza a llenarse (ver
+        # _terminar), así que quedan en el orden del código
+        return Bloque(-1, prefijo)
+
+    def _temporal(self):
+        t = self._f.temporales
+        self._f.temporales += 1
+        return t
+
+    def _emitir(self, op, a=None, b=None, c=None):
+        # Instrucción que escribe un temporal nuevo; lo devuelve
+        dst = self._temporal()
+        self._bloque.instrucciones.append(Instr(op, dst, a, b, c))
+        return dst
+
+    def _agregar(self, instr):
+        self._bloque.instrucciones.append(instr)
+
+    def _terminar(self, instr, siguiente=None):
+        # Cierra el bloque actual; lo que sigue va a 'siguiente' (o a un bloque
+        # sin predecesores, si no se llega: p. ej. después de un return)
+        self._bloque.instrucciones.append(instr)
+        self._bloque = siguiente if siguiente is not None else self._nuevo('dead')
+        self._f.bloques.append(self._bloque)
+
+    def _empezar(self, bloque):
+        # El bloque actual cae en 'bloque'
+        self._terminar(Instr('jump', a=bloque), bloque)
+
+    # Despacho
+
+    def _sentencia(self, node):
+        if node is None:
+            return None
+        tabla = self.SENTENCIAS
+        return tabla.get(node.kind, tabla[None])(self, node)
+
+    def _expresion(self, node):
+        node = self._plegados.get(node, node)
+        tabla = self.EXPRESIONES
+        return tabla.get(node.kind, tabla[None])(self, node)
+
+    # Sentencias
+
+    def _hijos(self, node):
+        # compound_stmt, local_declarations y statement_list
+        for child in node.children:
+            yield self._sentencia(child)
+
+    def _como_expresion(self, node):
+        return self._expresion(node)
+
+    def _declaracion(self, node):
+        size = 1
+        if len(node.children) == 3 and node.children[2].kind == 'NUM':
+            size = int(node.children[2].lexeme)
+        self._f.marco += size * 4
+
+    def _expresion_stmt(self, node):
+        if node.children:
+            yield self._expresion(node.children[0])
+
+    def _if(self, node):
+        cond = yield self._expresion(node.children[0])
+        entonces, fin = self._nuevo('then'), self._nuevo('endif')
+        sino = self._nuevo('else') if len(node.children) > 2 else fin
+        self._terminar(Instr('branch', a=cond, b=entonces, c=sino), entonces)
+        yield self._sentencia(node.children[1])
+        if sino is not fin:
+            self._terminar(Instr('jump', a=fin), sino)
+            yield self._sentencia(node.children[2])
+        self._empezar(fin)
+
+    def _while(self, node):
+        cabeza = self._nuevo('while')
+        self._empezar(cabeza)
+        cond = yield self._expresion(node.children[0])
+        cuerpo, fin = self._nuevo('do'), self._nuevo('endwhile')
+        self._terminar(Instr('branch', a=cond, b=cuerpo, c=fin), cuerpo)
+        yield self._sentencia(node.children[1])
+        self._terminar(Instr('jump', a=cabeza), fin)
+
+    def _return(self, node):
+        valor = None
+        if node.children:
+            valor = yield self._expresion(node.children[0])
+        self._terminar(Instr('ret', a=valor))
+
+    def _desconocida(self, node):
+        return None
+
+    # Expresiones: cada una devuelve el temporal con su valor
+
+    def _num(self, node):
+        return self._emitir('li', int(node.lexeme))
+
+    def _direccion(self, node, lig):
+        # Dirección del primer elemento de un arreglo: la trae el parámetro o
+        # es la del local
+        if lig.clase == 'param':
+            return self._emitir('load', None, lig.slot)
+        return self._emitir('addr', lig.slot)
+
+    def _elemento(self, node, lig):
+        # (base, offset) del elemento node[índice]
+        indice = yield self._expresion(node.children[-1])
+        desplazamiento = self._emitir('sll', indice, 2)
+        return self._emitir('add', self._direccion(node, lig), desplazamiento)
+
+    def _var(self, node):
+        lig = node.ligadura
+        if lig is None or lig.slot is None:
+            return self._emitir('li', 0)
+        if node.children:
+            direccion = yield self._elemento(node, lig)
+            return self._emitir('load', direccion, 0)
+        if lig.es_arreglo:
+            return self._direccion(node, lig)
+        return self._emitir('load', None, lig.slot)
+
+    def _binaria(self, node):
+        izq = yield self._expresion(node.children[0])
+        der = yield self._expresion(node.children[1])
+        return self._emitir(OPERACIONES[node.lexeme], izq, der)
+
+    def _assign(self, node):
+        lig = node.ligadura
+        valor = yield self._expresion(node.children[0])
+        if len(node.children) > 1:
+            # Como en cgen: primero el valor y después el índice
+            if lig is not None and lig.slot is not None:
+                direccion = yield self._elemento(node, lig)
+                self._agregar(Instr('store', a=valor, b=direccion, c=0))
+        elif lig is not None and lig.slot is not None:
+            self._agregar(Instr('store', a=valor, c=lig.slot))
+        return valor
+
+    def _call(self, node):
+        nombre = node.lexeme
+        args = node.children[0].children[0].children if node.children and node.children[0].children else []
+        if nombre == 'input':
+            return self._emitir('input')
+        if nombre == 'output':
+            if not args:
+                return self._emitir('li', 0)
+            valor = yield self._expresion(args[0])
+            self._agregar(Instr('output', a=valor))
+            return valor
+        if nombre in _ARGUMENTOS_AL_REVES:
+            args = args[::-1]
+        for arg in args:
+            valor = yield self._expresion(arg)
+            self._agregar(Instr('arg', a=valor))
+        return self._emitir('call', nombre, len(args))
+
+    def _expresion_desconocida(self, node):
+        return self._emitir('li', 0)
+
+    SENTENCIAS = {
+        'compound_stmt':      _hijos,
+        'local_declarations': _hijos,
+        'statement_list':     _hijos,
+        'var_decl':           _declaracion,
+        'expression_stmt':    _expresion_stmt,
+        'selection_stmt':     _if,
+        'iteration_stmt':     _while,
+        'return_stmt':        _return,
+        None:                 _desconocida,
+    }
+    SENTENCIAS.update(dict.fromkeys(['assign', 'addop', 'mulop', 'relop', 'var', 'NUM', 'call'],
+                                    _como_expresion))
+
+    EXPRESIONES = {
+        'NUM':    _num,
+        'var':    _var,
+        'addop':  _binaria,
+        'mulop':  _binaria,
+        'relop':  _binaria,
+        'assign': _assign,
+        'call':   _call,
+        None:     _expresion_desconocida,
+    }
+
+
+def _armar_grafo(f):
+    # Sucesores de cada terminador; se quitan los bloques a los que no se llega
+    for b in f.bloques:
+        fin = b.instrucciones[-1]
+        if fin.op == 'jump':
+            b.sucesores = [fin.a]
+        elif fin.op == 'branch':
+            b.sucesores = [fin.b] if fin.b is fin.c else [fin.b, fin.c]
+    alcanzados = {f.bloques[0]}
+    pila = [f.bloques[0]]
+    while pila:
+        for s in pila.pop().sucesores:
+            if s not in alcanzados:
+                alcanzados.add(s)
+                pila.append(s)
+    f.bloques = [b for b in f.bloques if b in alcanzados]
+    for k, b in enumerate(f.bloques):
+        b.numero = k
+        for s in b.sucesores:
+            s.predecesores.append(b)
+
+
+def reusar_valores(funcion):
+    """
+    Numeración de valores local: dentro de cada bloque, una operación sin
+    efectos igual a una anterior, o una carga de un lugar del marco cuyo valor
+    ya está en un temporal (cargado o guardado antes), se quita y sus usos
+    pasan al temporal que ya lo tiene. Cada temporal se escribe una sola vez,
+    así que renombrar es seguro. Devuelve cuántas instrucciones quitó.
+    """
+    nombres = {}     # temporal quitado -> el que tiene su valor
+    quitadas = 0
+    for b in funcion.bloques:
+        valores = {}
+        nuevas = []
+        for i in b.instrucciones:
+            i.renombrar(nombres)
+            op = i.op
+            if op in _PURAS:
+                a, c = i.a, i.b
+                if op in _CONMUTATIVAS and c < a:
+                    a, c = c, a
+                clave = (op, a, c)
+            elif op == 'load' and i.a is None:
+                # Los lugares de variables del marco sólo cambian con un store
+                # a $fp (los arreglos se escriben por dirección y no se
+                # cargan así; una llamada no toca el marco de quien llama)
+                clave = ('load', i.b)
+            else:
+                if op == 'store' and i.b is None:
+                    valores[('load', i.c)] = i.a
+                nuevas.append(i)
+                continue
+            t = valores.get(clave)
+            if t is None:
+                valores[clave] = i.dst
+                nuevas.append(i)
+            else:
+                nombres[i.dst] = t
+                quitadas += 1
+        b.instrucciones = nuevas
+    return quitadas
+
+
+def bajar(decl, plegados=None):
+    """FuncionIR de la fun_decl 'decl' (con los reemplazos de plegado.plegar)."""
+    return Bajada(plegados).funcion(decl)
@@ -1,270 +1,852 @@
+import mmap
+import operator
+import re
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, compress, repeat
 from globalTypes import *
 
-def globales(prog, pos, long):
-    global programa, posicion, progLong
-    programa = prog
-    posicion = pos
-    progLong = long
-
-lineno = 1 
-
 '''
 Comenzamos usando la aplicación de reserved lookup, es una función que nos ayuda a encontrar las palabras reservadas del lenguaje C-
 '''
 def reservedLookup(tokenString):
+    return PALABRAS_RESERVADAS.get(tokenString, TokenType.ID)
 
-    for w in ReservedWords:
-        if tokenString == w.value:
-            return TokenType(tokenString)
-    return TokenType.ID
+# Tabla de palabras reservadas: lexema -> TokenType (búsqueda O(1) en lugar de recorrer el enum)
+PALABRAS_RESERVADAS = {w.value: TokenType(w.value) for w in ReservedWords}
 
 
-""" La función getToken se encarga de leer el siguiente token del programa fuente utilizando un autómata finito. Este autómata comienza en un estado inicial y, según el primer carácter que encuentra, transita a diferentes estados (por ejemplo, para números, identificadores, comentarios, operadores, etc.). Durante la transición, va acumulando en una cadena el lexema correspondiente hasta que determina que el token está completo.
+# Motor basado en una sola expresión regular precompilada.
+#
+# Cada alternativa es un grupo con nombre; el motor de re prueba las alternativas de
+# izquierda a derecha, así que van primero las más frecuentes. Los grupos reproducen
+# las transiciones del autómata de getTokenAutomata:
+#   - un ID seguido de un dígito (o un NUM seguido de una letra) es un ERROR que
+#     incluye ese último carácter,
+#   - un comentario sin cerrar llega hasta el final del programa,
+#   - '!' sin '=' y cualquier carácter desconocido son ERROR de un carácter.
+# Los caracteres no ASCII (y los ID/NUM pegados a ellos) se delegan al autómata,
+# que usa str.isalpha/isdigit; así el resultado es idéntico también fuera de ASCII.
+_patron = re.compile(r"""
+    [ \t\n]*
+    (?:
+        (?P<OP>[<>=!]=?|[-+*;,(){}\[\]$]|/(?!\*))
+      | (?P<ID>[A-Za-z]+)(?![A-Za-z0-9]|[^\x00-\x7f])
+      | (?P<NUM>[0-9]+)(?![A-Za-z0-9]|[^\x00-\x7f])
+      | (?P<COMMENT>/\*[\s\S]*?(?:\*/|\Z))
+      | (?P<IDERR>[A-Za-z]+[0-9])
+      | (?P<NUMERR>[0-9]+[A-Za-z])
+      | (?P<LENTO>[^\x00-\x7f]|[A-Za-z0-9])
+      | (?P<ERROR>[\x00-\x7f])
+      | (?P<EOF>\Z)
+    )""", re.VERBOSE)
 
-Una vez que se ha reconocido completamente el token, la función retorna un par formado por el tipo de token y su lexema. En otras palabras, getToken analiza el programa carácter por carácter, siguiendo un conjunto de reglas predefinidas mediante estados, para extraer y clasificar las unidades léxicas, permitiendo luego que el compilador o analizador sintáctico procese la estructura del programa. """
-def getToken(imprime=True):
-    global posicion, programa, progLong, lineno
-
-    tokenString = ""
-    currentToken = None
-    state = StateType.START
-    # Inicializa el estado como START y comienza un loop mientras que no se haya llegado al final del programa
-    while state != StateType.DONE:
-        if posicion >= progLong:
-            if state == StateType.INCOMMENT:
-                currentToken = TokenType.COMMENT
-            else:
-                currentToken = TokenType.ENDFILE
-            state = StateType.DONE
-            break
-        # Obtenemos el caracter actual del programa
-        c = programa[posicion]
+_operadores = {
+    '==': TokenType.EQEQ, '<=': TokenType.LE, '>=': TokenType.GE, '!=': TokenType.NE,
+    '=': TokenType.EQ, '<': TokenType.LT, '>': TokenType.GT,
+    '+': TokenType.PLUS, '-': TokenType.MINUS, '*': TokenType.TIMES, '/': TokenType.OVER,
+    '(': TokenType.LPAREN, ')': TokenType.RPAREN, '{': TokenType.LBRACE, '}': TokenType.RBRACE,
+    '[': TokenType.LBRACKET, ']': TokenType.RBRACKET, ';': TokenType.SEMI, ',': TokenType.COMMA,
+    '!': TokenType.ERROR, '$': TokenType.ENDFILE,
+}
+
+
+# Estado del análisis léxico. Antes vivía en variables globales del módulo (programa,
+# posicion, progLong, lineno); ahora cada Lexer tiene el suyo, así que varias
+# compilaciones pueden avanzar a la vez en hilos distintos.
+
+class Lexer:
+    def __init__(self, salida=None):
+        self.programa = ''
+        self.posicion = 0
+        self.progLong = 0
+        self.lineno = 1
+        self.inicio = 0       # offset donde empieza el último token; termina en posicion
+        self.salida = salida  # None -> sys.stdout
+
+    def globales(self, prog, pos, long):
+        self.programa = prog
+        self.posicion = pos
+        self.progLong = long
+
+    """ La función getTokenAutomata se encarga de leer el siguiente token del programa fuente utilizando un autómata finito. Este autómata comienza en un estado inicial y, según el primer carácter que encuentra, transita a diferentes estados (por ejemplo, para números, identificadores, comentarios, operadores, etc.). Durante la transición, va acumulando en una cadena el lexema correspondiente hasta que determina que el token está completo.
 
-        # Dependiendo el estado en el que se encuentre, se ejecutará una acción diferente
-        if state == StateType.START:
-            if c == '$':
-                # end-of-file sentinel
+    Una vez que se ha reconocido completamente el token, la función retorna un par formado por el tipo de token y su lexema. En otras palabras, getToken analiza el programa carácter por carácter, siguiendo un conjunto de reglas predefinidas mediante estados, para extraer y clasificar las unidades léxicas, permitiendo luego que el compilador o analizador sintáctico procese la estructura del programa. """
+    def getTokenAutomata(self, imprime=True):
+        programa, progLong = self.programa, self.progLong
+        posicion, lineno = self.posicion, self.lineno
+
+        tokenString = ""
+        currentToken = None
+        state = StateType.START
+        # Inicializa el estado como START y comienza un loop mientras que no se haya llegado al final del programa
+        while state != StateType.DONE:
+            if posicion >= progLong:
+                if state == StateType.INCOMMENT:
+                    currentToken = TokenType.COMMENT
+                else:
+                    currentToken = TokenType.ENDFILE
                 state = StateType.DONE
-                currentToken = TokenType.ENDFILE
-                tokenString = '$'
-                posicion += 1
                 break
+            # Obtenemos el caracter actual del programa
+            c = programa[posicion]
 
-            elif c in [' ', '\t', '\n']:
-                posicion += 1
-                if c == '\n':
-                    lineno += 1
-                continue
-            elif c == '/':
-                # Si el caracter es un '/', se verifica si el siguiente caracter es un '*', si lo es, se cambia al estado de INCOMMENT
-                if (posicion + 1 < progLong) and (programa[posicion + 1] == '*'):
-                    state = StateType.INCOMMENT
+            # Dependiendo el estado en el que se encuentre, se ejecutará una acción diferente
+            if state == StateType.START:
+                if c == '$':
+                    # end-of-file sentinel
+                    state = StateType.DONE
+                    currentToken = TokenType.ENDFILE
+                    tokenString = '$'
+                    posicion += 1
+                    break
+
+                elif c in [' ', '\t', '\n']:
+                    posicion += 1
+                    if c == '\n':
+                        lineno += 1
+                    continue
+                elif c == '/':
+                    # Si el caracter es un '/', se verifica si el siguiente caracter es un '*', si lo es, se cambia al estado de INCOMMENT
+                    if (posicion + 1 < progLong) and (programa[posicion + 1] == '*'):
+                        state = StateType.INCOMMENT
+                        tokenString += c
+                        posicion += 1
+                        c = programa[posicion]
+                        tokenString += c
+                        posicion += 1
+                        continue
+                    else:
+                        # Si no es un '/', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE
+                        state = StateType.DONE
+                        currentToken = TokenType.OVER
+                        tokenString += c
+                        posicion += 1
+                #Si el caracter es un '=', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para ver si es un igual o un igual igual ya que son tokens diferentes.
+                elif c == '=':
+                    if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                        tokenString += c  
+                        posicion += 1
+                        tokenString += programa[posicion] 
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.EQEQ
+                    else:
+                        tokenString += c
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.EQ
+                # Si el caracter es un '<', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para observar si es un menor a sólo o un menor o igual a, ya que se manejan como tokens diferentes. 
+                elif c == '<':
+                    if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                        tokenString += c
+                        posicion += 1
+                        tokenString += programa[posicion]
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.LE
+                
+                    else:
+                        tokenString += c
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.LT
+                # Si el caracter es un '>', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para observar si es un mayor a sólo o un mayor o igual a, ya que se manejan como tokens diferentes.
+                elif c == '>':
+                    if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                        tokenString += c
+                        posicion += 1
+                        tokenString += programa[posicion]
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.GE
+                    else:
+                        tokenString += c
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.GT
+                # Si el caracter es un '!', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Si no es un diferente a, entonces se maneja como un error.
+                elif c == '!':
+                    if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                        tokenString += c
+                        posicion += 1
+                        tokenString += programa[posicion]
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.NE
+                    else:
+                        tokenString += c
+                        posicion += 1
+                        state = StateType.DONE
+                        currentToken = TokenType.ERROR
+                #Si c isdigit, se cambia al estado de INNUM y se agrega el caracter a la cadena de tokenString. Esto es para observar si es un número o un identificador, ya que se manejan como tokens diferentes. El estado INNUM es para ver que todo el tokens sea un INT.
+                elif c.isdigit():
+                    state = StateType.INNUM
                     tokenString += c
                     posicion += 1
-                    c = programa[posicion]
+                # Si c es alfabético, se cambia al estado de INID y se agrega el caracter a la cadena de tokenString. Esto es para observar si es un número o un identificador, ya que se manejan como tokens diferentes. El estado INID es para ver que todo el tokens sea un ID.
+                elif c.isalpha():
+                    state = StateType.INID
                     tokenString += c
                     posicion += 1
-                    continue
-                else:
-                    # Si no es un '/', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE
+                #Los siguientes son tokens normales que no requieren de más verificación. Se cambian al estado de DONE y se agrega el caracter a la cadena de tokenString.
+                elif c == '(':
                     state = StateType.DONE
-                    currentToken = TokenType.OVER
+                    currentToken = TokenType.LPAREN
                     tokenString += c
                     posicion += 1
-            #Si el caracter es un '=', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para ver si es un igual o un igual igual ya que son tokens diferentes.
-            elif c == '=':
-                if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
-                    tokenString += c  
+                elif c == ')':
+                    state = StateType.DONE
+                    currentToken = TokenType.RPAREN
+                    tokenString += c
                     posicion += 1
-                    tokenString += programa[posicion] 
+                elif c == '[':
+                    state = StateType.DONE
+                    currentToken = TokenType.LBRACKET
+                    tokenString += c
                     posicion += 1
+                elif c == ']':
                     state = StateType.DONE
-                    currentToken = TokenType.EQEQ
-                else:
+                    currentToken = TokenType.RBRACKET
                     tokenString += c
                     posicion += 1
+
+                elif c == ';':
                     state = StateType.DONE
-                    currentToken = TokenType.EQ
-            # Si el caracter es un '<', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para observar si es un menor a sólo o un menor o igual a, ya que se manejan como tokens diferentes. 
-            elif c == '<':
-                if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                    currentToken = TokenType.SEMI
                     tokenString += c
                     posicion += 1
-                    tokenString += programa[posicion]
+                elif c == ',':
+                    state = StateType.DONE
+                    currentToken = TokenType.COMMA
+                    tokenString += c
                     posicion += 1
+                elif c == '{':
                     state = StateType.DONE
-                    currentToken = TokenType.LE
-                
-                else:
+                    currentToken = TokenType.LBRACE
                     tokenString += c
                     posicion += 1
+                elif c == '}':
                     state = StateType.DONE
-                    currentToken = TokenType.LT
-            # Si el caracter es un '>', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Esto es para observar si es un mayor a sólo o un mayor o igual a, ya que se manejan como tokens diferentes.
-            elif c == '>':
-                if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                    currentToken = TokenType.RBRACE
                     tokenString += c
                     posicion += 1
-                    tokenString += programa[posicion]
+                elif c == '[':
+                    state = StateType.DONE
+                    currentToken = TokenType.LBRACKET
+                    tokenString += c
                     posicion += 1
+                elif c == ']':
                     state = StateType.DONE
-                    currentToken = TokenType.GE
-                else:
+                    currentToken = TokenType.RBRACKET
                     tokenString += c
                     posicion += 1
+                elif c == '+':
                     state = StateType.DONE
-                    currentToken = TokenType.GT
-            # Si el caracter es un '!', se verifica si el siguiente caracter es un '=', si lo es, se cambia al estado de DONE. Si no es un diferente a, entonces se maneja como un error.
-            elif c == '!':
-                if (posicion + 1 < progLong) and (programa[posicion + 1] == '='):
+                    currentToken = TokenType.PLUS
                     tokenString += c
                     posicion += 1
-                    tokenString += programa[posicion]
+                elif c == '-':
+                    state = StateType.DONE
+                    currentToken = TokenType.MINUS
+                    tokenString += c
                     posicion += 1
+                elif c == '*':
                     state = StateType.DONE
-                    currentToken = TokenType.NE
+                    currentToken = TokenType.TIMES
+                    tokenString += c
+                    posicion += 1
+
                 else:
+                    state = StateType.DONE
+                    currentToken = TokenType.ERROR
+                    tokenString += c
+                    posicion += 1
+            # Si el estado es INCOMMENT, se verifica si el siguiente caracter es un '/', si lo es, se cambia al estado de DONE. Esto es para observar si es un comentario o no.
+            elif state == StateType.INCOMMENT:
+                if c == '*' and (posicion + 1 < progLong) and (programa[posicion + 1] == '/'):
+                    tokenString += c
+                    posicion += 1
+                    c = programa[posicion]
                     tokenString += c
                     posicion += 1
                     state = StateType.DONE
+                    currentToken = TokenType.COMMENT
+                else:
+                    tokenString += c
+                    if c == '\n':
+                        lineno += 1
+                    posicion += 1
+
+    
+            # Si el estado es INNUM, se verifica si el siguiente caracter es un dígito, si lo es, se agrega a la cadena de tokenString. Si no es un dígito, se verifica si es alfabético, si lo es, se cambia al estado de ERROR y se cambia al estado de DONE. Si no es ninguno de los dos, se cambia al estado de DONE.
+            elif state == StateType.INNUM:
+                if c.isdigit():
+                    tokenString += c
+                    posicion += 1
+                elif c.isalpha():
+                    tokenString += c
                     currentToken = TokenType.ERROR
-            #Si c isdigit, se cambia al estado de INNUM y se agrega el caracter a la cadena de tokenString. Esto es para observar si es un número o un identificador, ya que se manejan como tokens diferentes. El estado INNUM es para ver que todo el tokens sea un INT.
-            elif c.isdigit():
-                state = StateType.INNUM
-                tokenString += c
-                posicion += 1
-            # Si c es alfabético, se cambia al estado de INID y se agrega el caracter a la cadena de tokenString. Esto es para observar si es un número o un identificador, ya que se manejan como tokens diferentes. El estado INID es para ver que todo el tokens sea un ID.
-            elif c.isalpha():
-                state = StateType.INID
-                tokenString += c
-                posicion += 1
-            #Los siguientes son tokens normales que no requieren de más verificación. Se cambian al estado de DONE y se agrega el caracter a la cadena de tokenString.
-            elif c == '(':
-                state = StateType.DONE
-                currentToken = TokenType.LPAREN
-                tokenString += c
-                posicion += 1
-            elif c == ')':
-                state = StateType.DONE
-                currentToken = TokenType.RPAREN
-                tokenString += c
-                posicion += 1
-            elif c == '[':
-                state = StateType.DONE
-                currentToken = TokenType.LBRACKET
-                tokenString += c
-                posicion += 1
-            elif c == ']':
-                state = StateType.DONE
-                currentToken = TokenType.RBRACKET
-                tokenString += c
-                posicion += 1
+                    state = StateType.DONE
+                    posicion += 1
+                else:
+                    currentToken = TokenType.NUM
+                    state = StateType.DONE
 
-            elif c == ';':
-                state = StateType.DONE
-                currentToken = TokenType.SEMI
-                tokenString += c
-                posicion += 1
-            elif c == ',':
-                state = StateType.DONE
-                currentToken = TokenType.COMMA
-                tokenString += c
-                posicion += 1
-            elif c == '{':
-                state = StateType.DONE
-                currentToken = TokenType.LBRACE
-                tokenString += c
-                posicion += 1
-            elif c == '}':
-                state = StateType.DONE
-                currentToken = TokenType.RBRACE
-                tokenString += c
-                posicion += 1
-            elif c == '[':
-                state = StateType.DONE
-                currentToken = TokenType.LBRACKET
-                tokenString += c
-                posicion += 1
-            elif c == ']':
-                state = StateType.DONE
-                currentToken = TokenType.RBRACKET
-                tokenString += c
-                posicion += 1
-            elif c == '+':
-                state = StateType.DONE
-                currentToken = TokenType.PLUS
-                tokenString += c
-                posicion += 1
-            elif c == '-':
-                state = StateType.DONE
-                currentToken = TokenType.MINUS
-                tokenString += c
-                posicion += 1
-            elif c == '*':
-                state = StateType.DONE
-                currentToken = TokenType.TIMES
-                tokenString += c
-                posicion += 1
+            # Si el estado es INID, se verifica si el siguiente caracter es alfabético, si lo es, se agrega a la cadena de tokenString. Si no es alfabético, se verifica si es un dígito, si lo es, se cambia al estado de ERROR y se cambia al estado de DONE. Si no es ninguno de los dos, se cambia al estado de DONE.
+            elif state == StateType.INID:
+                if c.isalpha():
+                    tokenString += c
+                    posicion += 1
+                elif c.isdigit():
+                    tokenString += c
+                    currentToken = TokenType.ERROR
+                    state = StateType.DONE
+                    posicion += 1
+                else:
+                    currentToken = TokenType.ID
+                    state = StateType.DONE
 
+        self.posicion, self.lineno = posicion, lineno
+        self.inicio = posicion - len(tokenString)
+
+        # Si el token es un identificador, se verifica si es una palabra reservada, si lo es, se cambia al token correspondiente. Si no es una palabra reservada, se deja como un identificador. Esto es una vez que tengas un token marcado cómo ID, se debe verificar que en realidad sea un ID y no una palabra reservada
+        if currentToken == TokenType.ID:
+            currentToken = reservedLookup(tokenString)
+
+        #Si el token es un error se maneja de manera diferente, sino se imprime el token con el valor.
+        if imprime:
+            if currentToken == TokenType.ERROR:
+                print(f"ERROR EN LÍNEA {lineno}: {currentToken} = {tokenString}", file=self.salida)
             else:
-                state = StateType.DONE
-                currentToken = TokenType.ERROR
-                tokenString += c
-                posicion += 1
-        # Si el estado es INCOMMENT, se verifica si el siguiente caracter es un '/', si lo es, se cambia al estado de DONE. Esto es para observar si es un comentario o no.
-        elif state == StateType.INCOMMENT:
-            if c == '*' and (posicion + 1 < progLong) and (programa[posicion + 1] == '/'):
-                tokenString += c
-                posicion += 1
-                c = programa[posicion]
-                tokenString += c
-                posicion += 1
-                state = StateType.DONE
-                currentToken = TokenType.COMMENT
+                print(f"Línea {lineno}: {currentToken} = {tokenString}", file=self.salida)
+
+        return currentToken, tokenString
+
+    """ getToken reconoce el siguiente token con una sola llamada a _patron.match, que salta
+    el espacio en blanco y clasifica el lexema en un grupo con nombre. Devuelve los mismos
+    pares (TokenType, lexema) que getTokenAutomata y mantiene posicion y lineno al día. """
+    def getToken(self, imprime=True):
+        posicion, progLong = self.posicion, self.progLong
+        m = _patron.match(self.programa, posicion, progLong)
+        grupo = m.lastgroup
+        inicio = m.start(grupo)
+        if inicio != posicion:
+            self.lineno += self.programa.count('\n', posicion, inicio)
+
+        if grupo == 'LENTO':
+            self.posicion = inicio
+            return self.getTokenAutomata(imprime)
+
+        tokenString = m.group(grupo)
+        self.inicio = inicio
+        self.posicion = posicion = m.end()
+        if grupo == 'OP':
+            currentToken = _operadores[tokenString]
+        elif grupo == 'ID':
+            # Igual que el autómata: un ID/NUM que toca el final del programa (sin '$') es ENDFILE
+            currentToken = TokenType.ENDFILE if posicion >= progLong else PALABRAS_RESERVADAS.get(tokenString, TokenType.ID)
+        elif grupo == 'NUM':
+            currentToken = TokenType.ENDFILE if posicion >= progLong else TokenType.NUM
+        elif grupo == 'COMMENT':
+            currentToken = TokenType.COMMENT
+            self.lineno += tokenString.count('\n')
+        elif grupo == 'EOF':
+            currentToken = TokenType.ENDFILE
+        else:
+            currentToken = TokenType.ERROR
+
+        if imprime:
+            if currentToken == TokenType.ERROR:
+                print(f"ERROR EN LÍNEA {self.lineno}: {currentToken} = {tokenString}", file=self.salida)
             else:
-                tokenString += c
-                if c == '\n':
-                    lineno += 1
-                posicion += 1
+                print(f"Línea {self.lineno}: {currentToken} = {tokenString}", file=self.salida)
 
-    
-        # Si el estado es INNUM, se verifica si el siguiente caracter es un dígito, si lo es, se agrega a la cadena de tokenString. Si no es un dígito, se verifica si es alfabético, si lo es, se cambia al estado de ERROR y se cambia al estado de DONE. Si no es ninguno de los dos, se cambia al estado de DONE.
-        elif state == StateType.INNUM:
-            if c.isdigit():
-                tokenString += c
-                posicion += 1
-            elif c.isalpha():
-                tokenString += c
-                currentToken = TokenType.ERROR
-                state = StateType.DONE
-                posicion += 1
+        return currentToken, tokenString
+
+
+# Modo bytes: el programa se lee de un mmap del archivo, sin pasarlo a str ni
+# agregarle el centinela '$'. El fin de entrada es simplemente posicion == progLong.
+# Las clases de caracteres son ASCII (no se llama a str.isalpha/isdigit) y cualquier
+# byte no ASCII es un ERROR de un byte.
+_patron_bytes = re.compile(rb"""
+    [ \t\n]*
+    (?:
+        (?P<OP>[<>=!]=?|[-+*;,(){}\[\]$]|/(?!\*))
+      | (?P<ID>[A-Za-z]+)(?![A-Za-z0-9])
+      | (?P<NUM>[0-9]+)(?![A-Za-z0-9])
+      | (?P<COMMENT>/\*[\s\S]*?(?:\*/|\Z))
+      | (?P<IDERR>[A-Za-z]+[0-9])
+      | (?P<NUMERR>[0-9]+[A-Za-z])
+      | (?P<ERROR>[\x00-\xff])
+      | (?P<EOF>\Z)
+    )""", re.VERBOSE)
+
+_operadores_bytes = {op.encode(): (tipo, op) for op, tipo in _operadores.items()}
+
+
+class LexerBytes(Lexer):
+    """
+    Lexer sobre un mmap de solo lectura. Los comentarios se devuelven como
+    memoryview del mmap (sin copiar); los ID y NUM se decodifican una sola vez
+    por lexema distinto y se reutiliza el mismo str; los operadores son
+    constantes. Así la memoria pico queda cerca del tamaño del archivo.
+    """
+    def __init__(self, salida=None):
+        super().__init__(salida)
+        self._archivo = None
+        self._lexemas = {}   # bytes -> (TokenType, str) para ID y NUM
+
+    def abrir(self, ruta):
+        self.cerrar()
+        self._archivo = open(ruta, 'rb')
+        try:
+            buf = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            buf = b''  # archivo vacío: no se puede mapear
+        self.globales(buf, 0, len(buf))
+
+    def cerrar(self):
+        if isinstance(self.programa, mmap.mmap):
+            self.programa.close()
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        self.programa = b''
+
+    def _saltos(self, a, b):
+        # mmap no tiene count(); los saltos entre tokens son pocos, find basta
+        buf, n = self.programa, 0
+        i = buf.find(b'\n', a, b)
+        while i >= 0:
+            n += 1
+            i = buf.find(b'\n', i + 1, b)
+        return n
+
+    def getToken(self, imprime=True):
+        posicion, buf = self.posicion, self.programa
+        m = _patron_bytes.match(buf, posicion, self.progLong)
+        grupo = m.lastgroup
+        inicio = m.start(grupo)
+        if inicio != posicion:
+            self.lineno += self._saltos(posicion, inicio)
+        self.inicio = inicio
+        self.posicion = fin = m.end()
+
+        if grupo == 'OP':
+            currentToken, tokenString = _operadores_bytes[m.group(grupo)]
+        elif grupo == 'ID' or grupo == 'NUM':
+            lex = m.group(grupo)
+            par = self._lexemas.get(lex)
+            if par is None:
+                s = lex.decode('ascii')
+                tipo = PALABRAS_RESERVADAS.get(s, TokenType.ID) if grupo == 'ID' else TokenType.NUM
+                par = self._lexemas[lex] = (tipo, s)
+            currentToken, tokenString = par
+        elif grupo == 'COMMENT':
+            currentToken = TokenType.COMMENT
+            tokenString = memoryview(buf)[inicio:fin]
+            self.lineno += self._saltos(inicio, fin)
+        elif grupo == 'EOF':
+            currentToken, tokenString = TokenType.ENDFILE, ''
+        else:
+            currentToken = TokenType.ERROR
+            tokenString = m.group(grupo).decode('ascii', 'replace')
+
+        if imprime:
+            texto = bytes(tokenString).decode('ascii', 'replace') if isinstance(tokenString, memoryview) else tokenString
+            if currentToken == TokenType.ERROR:
+                print(f"ERROR EN LÍNEA {self.lineno}: {currentToken} = {texto}", file=self.salida)
             else:
-                currentToken = TokenType.NUM
-                state = StateType.DONE
+                print(f"Línea {self.lineno}: {currentToken} = {texto}", file=self.salida)
 
-        # Si el estado es INID, se verifica si el siguiente caracter es alfabético, si lo es, se agrega a la cadena de tokenString. Si no es alfabético, se verifica si es un dígito, si lo es, se cambia al estado de ERROR y se cambia al estado de DONE. Si no es ninguno de los dos, se cambia al estado de DONE.
-        elif state == StateType.INID:
-            if c.isalpha():
-                tokenString += c
-                posicion += 1
-            elif c.isdigit():
-                tokenString += c
-                currentToken = TokenType.ERROR
-                state = StateType.DONE
-                posicion += 1
+        return currentToken, tokenString
+
+
+# Tokenización en bloque: tokenize(source) produce todo el flujo de tokens de una
+# vez, en columnas (struct-of-arrays) en lugar de una tupla nueva por token.
+#
+#   tipos   array('B')  código de TokenType (índice en TIPOS)
+#   inicios array('q')  offset del token en la fuente
+#   largos  array('I')  largo del lexema
+#   lineas  array('i')  valor de lineno después de leer el token (igual que getToken)
+#   ids     array('i')  para ID y NUM, índice del lexema en 'simbolos'; -1 si no
+#
+# Los comentarios se descartan aquí mismo y los lexemas de ID/NUM se internan en
+# 'simbolos', así que dos apariciones del mismo nombre comparten el mismo id y el
+# mismo objeto str. El último token siempre es ENDFILE (no hace falta el '$').
+
+TIPOS = list(TokenType)
+CODIGO = {t: i for i, t in enumerate(TIPOS)}
+_COD_COMMENT = CODIGO[TokenType.COMMENT]
+_COD_ENDFILE = CODIGO[TokenType.ENDFILE]
+_COD_ID = CODIGO[TokenType.ID]
+_COD_NUM = CODIGO[TokenType.NUM]
+
+# Lexema de los tokens que siempre se escriben igual (operadores, palabras
+# reservadas y ENDFILE, que conserva su '$' aunque la fuente no lo lleve)
+_LEXEMA_FIJO = [t.value if isinstance(t.value, str) else None for t in TIPOS]
+
+# Un solo grupo de captura: re.split devuelve [hueco, token, hueco, token, ..., hueco]
+_patron_bloque = re.compile(r"(/\*[\s\S]*?(?:\*/|\Z)|[A-Za-z]+[0-9]?|[0-9]+[A-Za-z]?|[<>=!]=|[^ \t\n])")
+
+def _clasificar(lex):
+    tipo = _operadores.get(lex)
+    if tipo is not None:
+        return tipo
+    c = lex[0]
+    if lex.startswith('/*'):
+        return TokenType.COMMENT
+    if c.isdigit():
+        return TokenType.ERROR if lex[-1].isalpha() else TokenType.NUM
+    if c.isalpha():
+        return TokenType.ERROR if lex[-1].isdigit() else PALABRAS_RESERVADAS.get(lex, TokenType.ID)
+    return TokenType.ERROR
+
+
+class TokenStream:
+    """
+    Flujo de tokens en columnas; ver tokenize(). Se puede serializar con pickle.
+
+    Después de editar() puede quedar un desplazamiento pendiente: desde el token
+    '_ajuste[0]' en adelante, inicios y lineas guardan el valor real menos
+    '_ajuste[1]' y '_ajuste[2]'. inicio(i) y linea(i) devuelven el valor real;
+    materializa() aplica el ajuste a los arreglos (lo hace LexerTokens).
+    """
+    def __init__(self, fuente, tipos, inicios, largos, lineas, ids, simbolos):
+        self.fuente   = fuente
+        self.tipos    = tipos
+        self.inicios  = inicios
+        self.largos   = largos
+        self.lineas   = lineas
+        self.ids      = ids
+        self.simbolos = simbolos  # lexemas internados de ID y NUM
+        self._ajuste  = None      # [desde, delta de offset, delta de línea]
+        self._id_de   = None      # lexema -> id, se arma en la primera edición
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def tipo(self, i):
+        return TIPOS[self.tipos[i]]
+
+    def inicio(self, i):
+        a = self._ajuste
+        return self.inicios[i] + a[1] if a is not None and i >= a[0] else self.inicios[i]
+
+    def linea(self, i):
+        a = self._ajuste
+        return self.lineas[i] + a[2] if a is not None and i >= a[0] else self.lineas[i]
+
+    def lexema(self, i):
+        v = self.ids[i]
+        if v >= 0:
+            return self.simbolos[v]
+        fijo = _LEXEMA_FIJO[self.tipos[i]]
+        if fijo is not None:
+            return fijo
+        ini = self.inicio(i)
+        return self.fuente[ini:ini + self.largos[i]]
+
+    def materializa(self):
+        """Aplica el desplazamiento pendiente a todos los tokens."""
+        if self._ajuste is not None:
+            self._mueve_ajuste(len(self.tipos))
+            self._ajuste = None
+
+    def _mueve_ajuste(self, k):
+        # Lleva el inicio del ajuste pendiente al token k. Sólo se tocan los
+        # tokens entre la posición vieja y la nueva: si las ediciones están
+        # cerca unas de otras (como al escribir) el costo es chico.
+        desde, d_off, d_lin = self._ajuste
+        if k > desde:
+            _suma(self.inicios, desde, k, d_off)
+            _suma(self.lineas, desde, k, d_lin)
+        elif k < desde:
+            _suma(self.inicios, k, desde, -d_off)
+            _suma(self.lineas, k, desde, -d_lin)
+        self._ajuste[0] = k
+
+    def editar(self, offset, borrados, insertado, nuevo=None):
+        """
+        Aplica a la fuente la edición "en 'offset' se borran 'borrados'
+        caracteres y se inserta 'insertado'" y actualiza el flujo sin volver a
+        tokenizar todo. Se re-analiza desde el último token que termina antes
+        de la edición hasta que un token nuevo empieza justo donde empezaba uno
+        viejo (ya desplazado) y pasado el texto insertado; de ahí en adelante el
+        texto es el mismo, así que los tokens también. Los tokens posteriores
+        sólo se desplazan, y de forma perezosa.
+
+        Si el llamador ya tiene el texto editado completo (el buffer del editor)
+        lo pasa en 'nuevo' y nos ahorramos copiar la fuente.
+
+        Devuelve (a, b_viejo, b_nuevo): los tokens [a, b_viejo) del flujo
+        anterior fueron reemplazados por los tokens [a, b_nuevo) del nuevo.
+        """
+        viejo = self.fuente
+        if nuevo is None:
+            nuevo = viejo[:offset] + insertado + viejo[offset + borrados:]
+        fin_edicion = offset + len(insertado)
+        delta = len(insertado) - borrados
+        if self._ajuste is None:
+            self._ajuste = [len(self.tipos), 0, 0]
+
+        # Punto de arranque: fin del último token que termina antes de la edición.
+        # Ahí el lexer está en estado inicial; el token que termina justo en
+        # 'offset' puede crecer con lo insertado, así que también se re-analiza.
+        a = bisect_left(_Inicios(self), offset) - 1
+        while a >= 0 and self.inicio(a) + self.largos[a] >= offset:
+            a -= 1
+        if a >= 0:
+            pos, linea = self.inicio(a) + self.largos[a], self.linea(a)
+        else:
+            pos, linea = 0, 1
+        a += 1
+        self._mueve_ajuste(a)
+        _, d_off, d_lin = self._ajuste
+
+        # Re-análisis de la ventana dañada
+        if self._id_de is None:
+            self._id_de = {lx: i for i, lx in enumerate(self.simbolos)}
+        id_de, simbolos = self._id_de, self.simbolos
+        tipos, inicios, largos, lineas, ids = (array('B'), array('q'), array('I'),
+                                               array('i'), array('i'))
+        j = a                   # próximo token viejo que todavía no quedó atrás
+        n_viejo = len(self.tipos)
+        ascii = nuevo.isascii()
+        sincronizado = False
+        for m in _patron_bloque.finditer(nuevo, pos):
+            ini = m.start()
+            lex = m.group()
+            linea += nuevo.count('\n', pos, ini)
+            pos = m.end()
+            if not ascii and not lex.startswith('/*') and not (lex + nuevo[pos:pos+1]).isascii():
+                # Un no ASCII en el lexema o justo después: lo decide str.isalpha,
+                # igual que en tokenize
+                return self._reemplaza_todo(nuevo)
+            if ini >= fin_edicion:
+                # ¿Hay un token viejo que empezaba aquí (antes de la edición)?
+                objetivo = ini - delta - d_off
+                while j < n_viejo and self.inicios[j] < objetivo:
+                    j += 1
+                if (j < n_viejo and self.inicios[j] == objetivo
+                        and self.largos[j] == len(lex) and self.tipos[j] != _COD_ENDFILE):
+                    sincronizado = True
+                    break
+            cod = CODIGO[_clasificar(lex)]
+            if cod == _COD_COMMENT:
+                linea += lex.count('\n')
+                continue
+            tipos.append(cod)
+            inicios.append(ini)
+            largos.append(len(lex))
+            lineas.append(linea)
+            if cod == _COD_ID or cod == _COD_NUM:
+                v = id_de.get(lex)
+                if v is None:
+                    v = id_de[lex] = len(simbolos)
+                    simbolos.append(lex)
+                ids.append(v)
             else:
-                currentToken = TokenType.ID
-                state = StateType.DONE
+                ids.append(-1)
+
+        if sincronizado:
+            # Los tokens nuevos se guardan con el mismo ajuste que el resto
+            d_off += delta
+            d_lin += nuevo.count('\n', offset, fin_edicion) - viejo.count('\n', offset, offset + borrados)
+            _suma(inicios, 0, len(inicios), -d_off)
+            _suma(lineas, 0, len(lineas), -d_lin)
+            self._ajuste = [a, d_off, d_lin]
+        else:
+            # Se llegó al final: la ventana llega hasta ENDFILE inclusive
+            j = n_viejo
+            linea += nuevo.count('\n', pos)
+            tipos.append(_COD_ENDFILE); inicios.append(len(nuevo)); largos.append(0)
+            lineas.append(linea); ids.append(-1)
+            self._ajuste = None
+        self.tipos[a:j] = tipos
+        self.inicios[a:j] = inicios
+        self.largos[a:j] = largos
+        self.lineas[a:j] = lineas
+        self.ids[a:j] = ids
+        self.fuente = nuevo
+        return a, j, a + len(tipos)
+
+    def _reemplaza_todo(self, nuevo):
+        n_viejo = len(self.tipos)
+        otro = tokenize(nuevo)
+        self.__dict__.update(otro.__dict__)
+        return 0, n_viejo, len(self.tipos)
+
+
+def _suma(arr, a, b, d):
+    # arr[a:b] += d, sin ciclo en Python
+    if d and b > a:
+        arr[a:b] = array(arr.typecode, map(operator.add, arr[a:b], repeat(d)))
+
+
+class _Inicios:
+    # Vista de los inicios reales de un TokenStream para usar bisect sin copiar
+    __slots__ = ('flujo',)
+    def __init__(self, flujo):
+        self.flujo = flujo
+    def __len__(self):
+        return len(self.flujo.tipos)
+    def __getitem__(self, i):
+        return self.flujo.inicio(i)
+
+
+def tokenize(source):
+    """
+    Analiza 'source' completo (sin centinela '$') y devuelve un TokenStream con
+    los mismos tokens que daría getToken, salvo los comentarios. El trabajo por
+    token se hace con map/accumulate/compress sobre listas, no en un ciclo Python.
+    """
+    partes = _patron_bloque.split(source)
+    lexemas = partes[1::2]
+    n = len(lexemas)
+    unicos = dict.fromkeys(lexemas)
+
+    # Un carácter no ASCII fuera de comentario puede ser letra o dígito para
+    # str.isalpha/isdigit; esos casos los resuelve el Lexer carácter por carácter
+    if not source.isascii():
+        for lx in unicos:
+            if not lx.isascii() and not lx.startswith('/*'):
+                return _tokenize_lento(source)
+
+    # Clasificamos cada lexema distinto una sola vez
+    clase = {lx: CODIGO[_clasificar(lx)] for lx in unicos}
+    tipos = list(map(clase.__getitem__, lexemas))
 
-    # Si el token es un identificador, se verifica si es una palabra reservada, si lo es, se cambia al token correspondiente. Si no es una palabra reservada, se deja como un identificador. Esto es una vez que tengas un token marcado cómo ID, se debe verificar que en realidad sea un ID y no una palabra reservada
-    if currentToken == TokenType.ID:
-        currentToken = reservedLookup(tokenString)
+    # Offsets y líneas a partir de sumas acumuladas sobre huecos y tokens
+    tam = list(map(len, partes))
+    inicios = list(accumulate(tam, initial=0))[1:2*n:2]
+    saltos = list(accumulate(map(str.count, partes, repeat('\n')), initial=1))
+    lineas = saltos[2:2*n+1:2]
+    largos = tam[1::2]
 
-    #Si el token es un error se maneja de manera diferente, sino se imprime el token con el valor.
-    if imprime:
-        if currentToken == TokenType.ERROR:
-            print(f"ERROR EN LÍNEA {lineno}: {currentToken} = {tokenString}")
+    # Internado de ID y NUM, en orden de primera aparición
+    cod_id, cod_num = CODIGO[TokenType.ID], CODIGO[TokenType.NUM]
+    simbolos = [lx for lx, c in clase.items() if c == cod_id or c == cod_num]
+    id_de = {lx: i for i, lx in enumerate(simbolos)}
+    ids = list(map(id_de.get, lexemas, repeat(-1)))
+
+    # Fuera comentarios
+    columnas = (tipos, inicios, largos, lineas, ids)
+    if _COD_COMMENT in clase.values():
+        sin_com = list(map(operator.ne, tipos, repeat(_COD_COMMENT)))
+        columnas = [compress(c, sin_com) for c in columnas]
+    flujo = TokenStream(source, *map(array, 'BqIii', columnas), simbolos)
+    _agregar_fin(flujo, len(source), saltos[-1])
+    return flujo
+
+def _tokenize_lento(source):
+    # Fuente con caracteres no ASCII: usamos el Lexer token por token para respetar
+    # str.isalpha/isdigit. El espacio final evita que el último ID se lea como ENDFILE.
+    lx = Lexer()
+    prog = source + ' '
+    lx.globales(prog, 0, len(prog))
+    flujo = TokenStream(source, array('B'), array('q'), array('I'), array('i'), array('i'), [])
+    id_de = {}
+    while True:
+        tok, lex = lx.getToken(False)
+        if tok == TokenType.ENDFILE and lx.posicion >= len(prog):
+            break
+        if tok == TokenType.COMMENT:
+            continue
+        flujo.tipos.append(CODIGO[tok])
+        flujo.inicios.append(lx.posicion - len(lex))
+        flujo.largos.append(len(lex))
+        flujo.lineas.append(lx.lineno)
+        if tok == TokenType.ID or tok == TokenType.NUM:
+            if lex not in id_de:
+                id_de[lex] = len(flujo.simbolos)
+                flujo.simbolos.append(lex)
+            flujo.ids.append(id_de[lex])
+        else:
+            flujo.ids.append(-1)
+    _agregar_fin(flujo, len(source), lx.lineno)
+    return flujo
+
+def _agregar_fin(flujo, fin, linea):
+    flujo.tipos.append(_COD_ENDFILE)
+    flujo.inicios.append(fin)
+    flujo.largos.append(0)
+    flujo.lineas.append(linea)
+    flujo.ids.append(-1)
+
+
+class LexerTokens(Lexer):
+    """
+    Lexer que entrega los tokens de un TokenStream ya calculado, por índice.
+    El Parser lo consume con getToken() igual que a los demás; 'indice' es el
+    próximo token a entregar y se puede mover para empezar en cualquier punto.
+    Con materializa=False no se aplica el ajuste pendiente de editar() (ver
+    TokenStream): sirve para re-analizar un trozo sin tocar todo el flujo.
+    """
+    def __init__(self, flujo, salida=None, materializa=True):
+        super().__init__(salida)
+        if materializa:
+            flujo.materializa()
+        self.flujo = flujo
+        self.indice = 0
+        self.programa = flujo.fuente
+        self.progLong = len(flujo.fuente)
+
+    def getToken(self, imprime=True):
+        f = self.flujo
+        i = self.indice
+        if i >= len(f.tipos):
+            # Pasado el fin, como getToken: ENDFILE otra vez, ya sin el '$'
+            if imprime:
+                print(f"Línea {self.lineno}: {TokenType.ENDFILE} = ", file=self.salida)
+            self.inicio = self.posicion
+            return TokenType.ENDFILE, ''
+        self.indice = i + 1
+        cod = f.tipos[i]
+        a = f._ajuste
+        if a is None or i < a[0]:
+            self.lineno = f.lineas[i]
+            self.inicio = f.inicios[i]
         else:
-            print(f"Línea {lineno}: {currentToken} = {tokenString}")
+            self.lineno = f.lineas[i] + a[2]
+            self.inicio = f.inicios[i] + a[1]
+        self.posicion = self.inicio + f.largos[i]
+        v = f.ids[i]
+        if v >= 0:
+            tokenString = f.simbolos[v]
+        else:
+            tokenString = _LEXEMA_FIJO[cod]
+            if tokenString is None:  # ERROR: texto tal cual de la fuente
+                tokenString = f.fuente[self.inicio:self.posicion]
+        currentToken = TIPOS[cod]
+
+        if imprime:
+            if currentToken == TokenType.ERROR:
+                print(f"ERROR EN LÍNEA {self.lineno}: {currentToken} = {tokenString}", file=self.salida)
+            else:
+                print(f"Línea {self.lineno}: {currentToken} = {tokenString}", file=self.salida)
+
+        return currentToken, tokenString
+
+
+# Interfaz de módulo: las funciones de siempre operan sobre el Lexer de la sesión
+# por defecto, y lexer.programa / lexer.lineno / ... leen su estado.
+
+def _por_defecto():
+    from sesion import sesion_por_defecto
+    return sesion_por_defecto.lexer
+
+def globales(prog, pos, long):
+    _por_defecto().globales(prog, pos, long)
+
+def getToken(imprime=True):
+    return _por_defecto().getToken(imprime)
+
+def getTokenAutomata(imprime=True):
+    return _por_defecto().getTokenAutomata(imprime)
 
-    return currentToken, tokenString
+def __getattr__(name):
+    if name in ('programa', 'posicion', 'progLong', 'lineno'):
+        return getattr(_por_defecto(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,21 +2,126 @@
 # For this code generator implementation we used the:
 # - Parser, Semantic Analyzer, and Code Generator from Emilia Salazar Leipen
 
+import io
+import sys
+
 from globalTypes import *
-from parser import parser, globales as parser_globales
+from parser import parser
 from semantica import semantica
 from cgen import *
+from sesion import sesion_por_defecto
+
+
+def opcion(nombre):
+    # Valor de '--nombre=valor' en la línea de comandos, o None
+    for a in sys.argv[1:]:
+        if a.startswith(f'--{nombre}='):
+            return a.split('=', 1)[1]
+    return None
+
+
+def informe_mirilla():
+    # Con --informe-mirilla, cuántas veces se aplicó cada regla de mirilla.py
+    # (en las funciones que se tradujeron; las de la caché ya vienen optimizadas)
+    mirilla = sesion_por_defecto.cgen.mirilla
+    if '--informe-mirilla' in sys.argv and mirilla is not None:
+        print("Mirilla:")
+        for linea in mirilla.informe():
+            print(f"  {linea}")
+
 
 if __name__ == "__main__":
-    path = 'pruebas.c-' #sample.c-
-    with open(path, 'r') as f:
-        prog = f.read()
-    prog += '$'
-    progLong = len(prog)
-    posicion = 0
-
-    parser_globales(prog, posicion, progLong)
-    ast = parser(imprime=True)
-    semantica(ast, imprime=True)
-    codeGen(ast,"output.s")
+    # Uso: python main.py [archivo.c-] [--mmap] [--columnar] [--cache] [--paralelo]
+    #                     [--max-errores=N] [--parar-en=N] [--diagnosticos=json]
+    #                     [--emision=release|anotada|debug] [--ir] [--volcar-ir]
+    #                     [--sin-plegado] [--informe-plegado] [--sin-mirilla] [--informe-mirilla]
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    path = args[0] if args else 'pruebas.c-' #sample.c-
 
+    # Diagnósticos (diagnosticos.py): cuántos se muestran, a cuántos se corta
+    # el análisis y si salen como texto o como una línea JSON por error
+    diagnosticos = sesion_por_defecto.parser.diagnosticos
+    if opcion('max-errores') is not None:
+        diagnosticos.limite = int(opcion('max-errores'))
+    if opcion('parar-en') is not None:
+        diagnosticos.parar_en = int(opcion('parar-en'))
+    if opcion('diagnosticos') is not None:
+        diagnosticos.formato = opcion('diagnosticos')
+
+    if opcion('emision') is not None:
+        # Comentarios en output.s: ninguno, sólo las líneas de la fuente o todos
+        sesion_por_defecto.cgen.nivel = NIVELES[opcion('emision')]
+
+    if '--ir' in sys.argv or '--volcar-ir' in sys.argv:
+        # Código por la representación intermedia (ir.py); con --volcar-ir
+        # también queda en output.ir
+        sesion_por_defecto.cgen.ir = True
+        if '--volcar-ir' in sys.argv:
+            sesion_por_defecto.cgen.volcado_ir = open('output.ir', 'w')
+
+    if '--sin-plegado' in sys.argv:
+        # Sin el plegado de constantes (plegado.py): cada operación como en la fuente
+        sesion_por_defecto.cgen.plegar = False
+    if '--informe-plegado' in sys.argv:
+        # Por función, cuántas instrucciones ahorra el plegado
+        sesion_por_defecto.cgen.informe_plegado = sys.stdout
+    if '--sin-mirilla' in sys.argv:
+        # Sin la optimización de mirilla (mirilla.py) sobre el MIPS de cada función
+        sesion_por_defecto.cgen.mirilla = None
+
+    if '--columnar' in sys.argv:
+        # AST en arreglos (arbol.py): menos memoria en programas grandes
+        sesion_por_defecto.parser.columnar = True
+
+    cache = clave = None
+    if '--cache' in sys.argv:
+        # Archivo ya compilado con esta versión: el árbol anotado y los mensajes
+        # salen de la caché y se pasa directo a la generación de código
+        from cache_ast import CacheAST
+        from cache_funciones import CacheFunciones, ARCHIVO_CACHE
+        cache = CacheAST()
+        # Si no, cada función que no cambió sale de la caché por función
+        funciones = CacheFunciones(ARCHIVO_CACHE)
+        sesion_por_defecto.semantica.cache = sesion_por_defecto.cgen.cache = funciones
+        clave = cache.clave(path, sesion_por_defecto.motor_parser)
+        entrada = cache.cargar(clave)
+        if entrada is not None:
+            ast, texto = entrada
+            sys.stdout.write(texto)
+            codeGen(ast, "output.s")
+            informe_mirilla()
+            funciones.guardar()
+            sys.exit(0)
+        # Se captura lo que imprimen parser y semántica para guardarlo también
+        salida_real, sys.stdout = sys.stdout, io.StringIO()
+
+    try:
+        if '--mmap' in sys.argv:
+            # Archivos muy grandes: se lee con mmap, sin copia en str ni centinela '$'
+            sesion_por_defecto.globales_mmap(path)
+            ast = parser(imprime=True)
+        else:
+            with open(path, 'r') as f:
+                prog = f.read()
+            if '--paralelo' in sys.argv:
+                # Declaraciones top-level analizadas en un pool de procesos (paralelo.py)
+                ast = sesion_por_defecto.parse_paralelo(prog, imprime=True)
+            else:
+                # Todo el archivo se tokeniza de una vez; el parser consume el flujo por índice
+                sesion_por_defecto.globales_tokens(prog)
+                ast = parser(imprime=True)
+        # Con --paralelo también el chequeo de las funciones se reparte (un proceso por CPU)
+        semantica(ast, imprime=True, trabajadores=None if '--paralelo' in sys.argv else 1)
+    finally:
+        if cache is not None:
+            texto, sys.stdout = sys.stdout.getvalue(), salida_real
+            sys.stdout.write(texto)
+    if diagnosticos.detenido:
+        # Análisis cortado por --parar-en: no hay árbol completo que generar
+        sys.exit(1)
+    if cache is not None:
+        cache.guardar(clave, ast, texto)
+    codeGen(ast,"output.s")
+    informe_mirilla()
+    if cache is not None:
+        funciones.guardar()
@@ -0,0 +1,328 @@
+# mirilla.py
+# Optimización de mirilla sobre el MIPS de cada función, ya con registros
+# físicos (después de registros.asignar) y antes de escribirlo. Una ventana de
+# hasta tres instrucciones recorre el texto y cada regla de REGLAS dice qué
+# secuencia busca, con qué la cambia y bajo qué condición; se repite hasta que
+# ninguna regla cambia nada. Mirilla.aciertos cuenta cuántas veces se aplicó
+# cada una.
+#
+# Los patrones son líneas con variables entre llaves; la letra dice qué
+# aceptan (ver _VARIABLES) y una variable repetida tiene que valer lo mismo en
+# toda la regla: "sw {R}, {M}", "lw {R}, {M}" es un lw del lugar que se
+# acaba de guardar con el mismo registro.
+#
+# Las líneas de comentario no cuentan para la ventana (se quedan donde
+# estaban) y las etiquetas sí: una regla no junta instrucciones de los dos
+# lados de una etiqueta salvo que la nombre.
+#
+# Algunas reglas necesitan saber si un registro ya no se lee (_muerto). Como
+# cgen y seleccion.py no dejan ningún valor vivo a través de una etiqueta (ver
+# registros.py), basta con mirar hacia adelante hasta la próxima etiqueta o
+# salto; sólo se aplica a los registros que reparte registros.asignar.
+
+import re
+from collections import Counter
+
+from registros import ESCRIBEN, TEMPORALES, GUARDADOS, AUXILIARES
+
+# Qué acepta cada letra de variable
+_REG = r'\$\w+'
+_ETIQUETA = r'[^\s,:()#]+'
+_VARIABLES = {
+    'R': _REG, 'S': _REG, 'D': _REG, 'A': _REG, 'B': _REG,
+    'K': r'-?\d+', 'C': r'-?\d+',
+    'L': _ETIQUETA, 'E': _ETIQUETA,
+    'M': r'-?\d+\(\$\w+\)',
+    'O': r'\w+', 'P': r'\w+',
+    'X': r'.+', 'Y': r'.+', 'I': r'.+',
+}
+
+_REGISTRO = re.compile(_REG)
+# Saltos condicionales y el de la condición contraria
+_CONTRARIO = {'beq': 'bne', 'bne': 'beq', 'blt': 'bge', 'bge': 'blt', 'bgt': 'ble', 'ble': 'bgt'}
+_SALTOS = frozenset(_CONTRARIO)
+_ASIGNABLES = frozenset(TEMPORALES + GUARDADOS + AUXILIARES)
+# Los que no sobreviven a un jal (la función llamada los puede cambiar;
+# registros.asignar guarda y recupera los que hacen falta)
+_DE_LLAMADA = frozenset(TEMPORALES + AUXILIARES)
+
+
+def _compilar(patron):
+    # Regex de las líneas del patrón juntas con '\n': la primera aparición de
+    # cada variable es un grupo y las siguientes, una referencia a él
+    partes = re.split(r'\{(\w)\}', '\n'.join(patron))
+    vistas = set()
+    regex = []
+    for k, parte in enumerate(partes):
+        if k % 2 == 0:
+            regex.append(re.escape(parte))
+        elif parte in vistas:
+            regex.append(f"(?P={parte})")
+        else:
+            vistas.add(parte)
+            regex.append(f"(?P<{parte}>{_VARIABLES[parte]})")
+    return re.compile(''.join(regex))
+
+
+class Regla:
+    """
+    Una regla de mirilla: las líneas de 'patron' seguidas se cambian por las
+    de 'reemplazo' (plantillas con las mismas variables, o una función
+    variables -> líneas). 'condicion(v, muerto)' puede rechazar el cambio o
+    agregar variables; muerto(reg) dice si 'reg' ya no se lee después de la
+    ventana. 'operaciones' dice, para las líneas que empiezan con una
+    variable, con qué operaciones pueden empezar (None: cualquiera); así la
+    mayoría de las ventanas se descartan sin probar la regex.
+    """
+    __slots__ = ('nombre', 'largo', 'regex', 'operaciones', 'reemplazo', 'condicion')
+
+    def __init__(self, nombre, patron, reemplazo, condicion=None, operaciones=None):
+        self.nombre = nombre
+        self.largo = len(patron)
+        self.regex = _compilar(patron)
+        if operaciones is None:
+            operaciones = [None if '{' in p.split(' ', 1)[0] else frozenset((p.split(' ', 1)[0],))
+                           for p in patron]
+        self.operaciones = tuple(operaciones)
+        self.reemplazo = reemplazo
+        self.condicion = condicion
+
+
+# Lecturas y escrituras de registros de una instrucción
+
+def _operacion(texto):
+    return texto.split(' ', 1)[0]
+
+
+def escribe(texto):
+    """Registro que escribe la instrucción 'texto' (None si no escribe uno)."""
+    op, _, operandos = texto.partition(' ')
+    return operandos.split(',', 1)[0] if op in ESCRIBEN else None
+
+
+def _leidos(texto):
+    # Texto de los operandos que se leen
+    op, _, operandos = texto.partition(' ')
+    return operandos.partition(',')[2] if op in ESCRIBEN else operandos
+
+
+def lee(texto, reg):
+    """¿La instrucción 'texto' lee 'reg'?"""
+    return reg in _REGISTRO.findall(_leidos(texto))
+
+
+def _sustituir_lectura(texto, reg, otro):
+    # 'texto' leyendo 'otro' donde leía 'reg'
+    op, _, operandos = texto.partition(' ')
+    cambiar = lambda m: otro if m[0] == reg else m[0]
+    if op in ESCRIBEN:
+        escrito, coma, resto = operandos.partition(',')
+        return f"{op} {escrito}{coma}{_REGISTRO.sub(cambiar, resto)}"
+    return f"{op} {_REGISTRO.sub(cambiar, operandos)}"
+
+
+def _muerto(codigo, desde, reg):
+    # ¿El valor de 'reg' ya no se lee desde codigo[desde]?
+    if reg not in _ASIGNABLES:
+        return False
+    for k in range(desde, len(codigo)):
+        texto = codigo[k]
+        if texto[-1] == ':':
+            return True
+        if lee(texto, reg):
+            return False
+        op = _operacion(texto)
+        if op in ('j', 'jr') or (op == 'jal' and reg in _DE_LLAMADA) or escribe(texto) == reg:
+            return True
+    return True
+
+
+def _cabe16(v):
+    return -32768 <= v <= 32767
+
+
+def _envolver(v):
+    return (v + 2 ** 31) % 2 ** 32 - 2 ** 31
+
+
+# Condiciones de las reglas
+
+def _inmediato(v, muerto):
+    # li + operación: el li deja de hacer falta si la constante cabe en el
+    # inmediato y el otro operando no es el mismo registro
+    return v['S'] != v['R'] and _cabe16(int(v['K']))
+
+
+def _resta_inmediata(v, muerto):
+    v['N'] = -int(v['K'])
+    return v['S'] != v['R'] and _cabe16(v['N'])
+
+
+def _desplazar(v, muerto):
+    v['N'] = _envolver(int(v['K']) << int(v['C']))
+    return True
+
+
+def _offset(v, muerto):
+    v['N'] = int(v['K']) + int(v['C'])
+    return v['S'] != v['R'] and _cabe16(v['N'])
+
+
+def _escritura_muerta(v, muerto):
+    # El valor se pisa en la instrucción siguiente sin leerlo
+    return v['R'] not in _REGISTRO.findall(v['Y'])
+
+
+def _cero(v, muerto):
+    # li R, 0 + salto: el salto compara con $zero si R no se lee más
+    return v['S'] != v['R'] and muerto(v['R'])
+
+
+def _saltar_al_reves(v):
+    return (f"{_CONTRARIO[v['O']]} {v['A']}, {v['B']}, {v['E']}", f"{v['L']}:")
+
+
+def _copia_atras(v, muerto):
+    # op R, ...; move D, R: si R no se lee más, op escribe D directamente
+    return v['O'] in ESCRIBEN and v['D'] != v['R'] and muerto(v['R'])
+
+
+def _copia_adelante(v, muerto):
+    # move R, S; op ... R ...: op lee S y el move sobra si R no se lee más
+    i = v['I']
+    return (v['S'] != v['R'] and lee(i, v['R'])
+            and (escribe(i) == v['R'] or muerto(v['R'])))
+
+
+REGLAS = (
+    Regla("salto al siguiente", ("j {L}", "{L}:"), ("{L}:",)),
+    Regla("salto sobre salto", ("{O} {A}, {B}, {L}", "j {E}", "{L}:"), _saltar_al_reves,
+          operaciones=(_SALTOS, frozenset(('j',)), None)),
+    Regla("guardar y cargar", ("sw {R}, {M}", "lw {R}, {M}"), ("sw {R}, {M}",)),
+    Regla("guardar y cargar", ("sw {R}, {M}", "lw {D}, {M}"), ("sw {R}, {M}", "move {D}, {R}")),
+    Regla("guardar dos veces", ("sw {R}, {M}", "sw {D}, {M}"), ("sw {D}, {M}",)),
+    Regla("move a sí mismo", ("move {R}, {R}",), ()),
+    Regla("addi cero", ("addi {R}, {S}, 0",), ("move {R}, {S}",)),
+    Regla("dirección en el offset", ("addi {R}, {R}, {K}", "add {R}, {R}, {S}", "lw {R}, {C}({R})"),
+          ("add {R}, {R}, {S}", "lw {R}, {N}({R})"), _offset),
+    Regla("li y suma", ("li {R}, {K}", "add {R}, {S}, {R}"), ("addi {R}, {S}, {K}",), _inmediato),
+    Regla("li y suma", ("li {R}, {K}", "add {R}, {R}, {S}"), ("addi {R}, {S}, {K}",), _inmediato),
+    Regla("li y resta", ("li {R}, {K}", "sub {R}, {S}, {R}"), ("addi {R}, {S}, {N}",),
+          _resta_inmediata),
+    Regla("li y slt", ("li {R}, {K}", "slt {R}, {S}, {R}"), ("slti {R}, {S}, {K}",), _inmediato),
+    Regla("li y sll", ("li {R}, {K}", "sll {R}, {R}, {C}"), ("li {R}, {N}",), _desplazar),
+    Regla("cero en el salto", ("li {R}, 0", "{O} {S}, {R}, {L}"), ("{O} {S}, $zero, {L}",),
+          _cero, operaciones=(frozenset(('li',)), _SALTOS)),
+    Regla("cero en el salto", ("li {R}, 0", "{O} {R}, {S}, {L}"), ("{O} $zero, {S}, {L}",),
+          _cero, operaciones=(frozenset(('li',)), _SALTOS)),
+    Regla("sub y seq", ("sub {R}, {A}, {B}", "seq {R}, {R}, $zero"), ("seq {R}, {A}, {B}",)),
+    Regla("sub y sne", ("sub {R}, {A}, {B}", "sne {R}, {R}, $zero"), ("sne {R}, {A}, {B}",)),
+    Regla("escritura muerta", ("{O} {R}, {X}", "{P} {R}, {Y}"), ("{P} {R}, {Y}",),
+          _escritura_muerta, operaciones=(ESCRIBEN, ESCRIBEN)),
+    Regla("copia hacia atrás", ("{O} {R}, {X}", "move {D}, {R}"), ("{O} {D}, {X}",), _copia_atras,
+          operaciones=(ESCRIBEN, frozenset(('move',)))),
+    Regla("copia hacia adelante", ("move {R}, {S}", "{I}"),
+          lambda v: (_sustituir_lectura(v['I'], v['R'], v['S']),), _copia_adelante),
+)
+
+
+class Mirilla:
+    """Aplica REGLAS al texto de cada función y cuenta los aciertos de cada regla."""
+
+    def __init__(self, reglas=REGLAS):
+        self.aciertos = Counter()
+        self.reglas = reglas
+        self._por_par = {}      # (operación, la de la siguiente) -> reglas que pueden aplicarse
+
+    def optimizar(self, lineas):
+        """Las líneas de 'lineas' (instrucciones, etiquetas y comentarios) optimizadas."""
+        # Instrucciones sin el comentario final; de cada una, los comentarios
+        # que la preceden y el suyo (que se pierde si la instrucción cambia).
+        # antes[-1] son los comentarios del final
+        codigo, ops, antes, finales = [], [], [], []
+        pendientes = []
+        for linea in lineas:
+            if not linea or linea[0] == '#':
+                pendientes.append(linea)
+                continue
+            texto, marca, final = linea.partition('  #')
+            codigo.append(texto)
+            ops.append(_operacion(texto))
+            antes.append(pendientes)
+            finales.append(marca + final)
+            pendientes = []
+        antes.append(pendientes)
+
+        # Con la vuelta atrás de _aplicar, una pasada deja fijas las reglas que
+        # sólo miran la ventana; otra hace falta sólo si una regla se rechazó
+        # porque un registro seguía vivo y algo cambió (pudo dejar de leerse)
+        cambio = True
+        self._vivo = True
+        while cambio and self._vivo:
+            cambio = self._vivo = False
+            i = 0
+            while i < len(codigo):
+                par = (ops[i], ops[i + 1] if i + 1 < len(ops) else None)
+                reglas = self._por_par.get(par)
+                if reglas is None:
+                    reglas = self._por_par[par] = self._candidatas(*par)
+                if reglas and self._aplicar(reglas, codigo, ops, antes, finales, i):
+                    cambio = True
+                    i = max(i - 2, 0)       # la ventana puede empezar antes
+                else:
+                    i += 1
+
+        resultado = []
+        for texto, previos, final in zip(codigo, antes, finales):
+            resultado.extend(previos)
+            resultado.append(texto + final)
+        resultado.extend(antes[-1])
+        return resultado
+
+    def _candidatas(self, op, siguiente):
+        # Reglas cuyas dos primeras líneas pueden empezar con 'op' y 'siguiente'
+        def admite(permitidas, op):
+            return permitidas is None or op in permitidas
+        return [r for r in self.reglas if admite(r.operaciones[0], op)
+                and (r.largo == 1 or (siguiente is not None and admite(r.operaciones[1], siguiente)))]
+
+    def _aplicar(self, reglas, codigo, ops, antes, finales, i):
+        # Prueba en codigo[i] las 'reglas' (las candidatas para sus operaciones)
+        for regla in reglas:
+            fin = i + regla.largo
+            if fin > len(codigo):
+                continue
+            if regla.largo > 2 and not (regla.operaciones[2] is None
+                                        or ops[i + 2] in regla.operaciones[2]):
+                continue
+            m = regla.regex.fullmatch('\n'.join(codigo[i:fin]))
+            if m is None:
+                continue
+            v = m.groupdict()
+            if regla.condicion is not None and not regla.condicion(
+                    v, lambda reg: self._muerto(codigo, fin, reg)):
+                continue
+            reemplazo = regla.reemplazo
+            nuevas = (reemplazo(v) if callable(reemplazo)
+                      else [plantilla.format(**v) for plantilla in reemplazo])
+            # Los comentarios de las que se van quedan delante de lo que sigue
+            previos = [c for lista in antes[i:fin] for c in lista]
+            finales[i:fin] = [finales[i + k] if k < regla.largo and codigo[i + k] == nueva else ''
+                              for k, nueva in enumerate(nuevas)]
+            codigo[i:fin] = nuevas
+            ops[i:fin] = [_operacion(nueva) for nueva in nuevas]
+            antes[i:fin] = [[] for _ in nuevas]
+            antes[i] = previos + antes[i]
+            self.aciertos[regla.nombre] += 1
+            return True
+        return False
+
+    def _muerto(self, codigo, fin, reg):
+        if _muerto(codigo, fin, reg):
+            return True
+        self._vivo = True
+        return False
+
+    def informe(self):
+        """Líneas 'regla  aciertos', de la más usada a la menos."""
+        return [f"{nombre:24s} {n:8d}" for nombre, n in self.aciertos.most_common()]
@@ -0,0 +1,411 @@
+# paralelo.py
+# Análisis sintáctico y semántico repartidos entre procesos.
+#
+# Sintaxis: un barrido rápido de la fuente
+# (saltando comentarios y contando llaves) encuentra dónde termina cada declaración
+# top-level: en su ';' o en la '}' que cierra la función. Los trozos entre esos
+# cortes se analizan en un pool de procesos, cada uno con su propio ArbolColumnar,
+# y el proceso principal los une en orden de fuente bajo un solo nodo program.
+#
+# El resultado es el mismo que el del parse() en serie, mensajes incluidos: un
+# trozo sólo se usa si se analizó sin errores y se terminó justo en su final. En
+# el primer trozo que no cumple eso el resto de la fuente se analiza aquí mismo,
+# de corrido, porque la recuperación de errores puede cruzar los cortes.
+#
+# Semántica: armada la tabla global, el chequeo de cada función sólo lee los
+# globales y sus locales. Los procesos del pool heredan (con fork) el árbol y la
+# tabla global, chequean cada uno un grupo de funciones consecutivas y devuelven
+# por función los tipos y las ligaduras que anotaron, los diagnósticos y el texto
+# de sus tablas, y por grupo su parte del índice de referencias. El proceso
+# principal los aplica en orden de fuente, así que la salida es la misma que la
+# de semantica() en serie.
+
+import io
+import multiprocessing
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import arbol
+from arbol import ArbolColumnar, NodoColumnar
+from diagnosticos import AnalisisDetenido, ColectorDiagnosticos
+from referencias import IndiceReferencias
+from globalTypes import *
+from lexer import tokenize
+from sourcemap import SourceMap
+from volcado import imprimir_ast
+
+UMBRAL_PARALELO = 256 * 1024     # caracteres; debajo de esto no conviene el pool
+UMBRAL_FUNCIONES = 64            # funciones; ídem para la semántica
+TROZOS_POR_TRABAJADOR = 4        # más trozos que procesos para repartir mejor
+
+_INICIO_DECL = (TokenType.INT, TokenType.VOID)
+
+# Un grupo por alternativa: comentario (como en el lexer, sin cerrar llega al
+# final), '{', '}' y ';'
+_patron_limites = re.compile(r"(/\*[\s\S]*?(?:\*/|\Z))|(\{)|(\})|(;)")
+
+
+def limites_decls(fuente):
+    """
+    Offsets justo después del ';' o la '}' que cierra cada declaración top-level.
+    Es sólo un barrido de llaves: si la fuente tiene errores los cortes pueden no
+    coincidir con las declaraciones, y eso lo detecta el análisis de cada trozo.
+    """
+    limites = []
+    prof = 0
+    for m in _patron_limites.finditer(fuente):
+        g = m.lastindex
+        if g == 2:
+            prof += 1
+        elif g == 3:
+            prof -= 1
+            if prof <= 0:
+                prof = 0
+                limites.append(m.end())
+        elif g == 4 and prof == 0:
+            limites.append(m.end())
+    return limites
+
+
+def _cortes(fuente, limites, trozos):
+    # (offset, línea) donde empieza cada trozo, con trozos de tamaño parecido.
+    # Nunca se corta en el último límite: lo que sigue no tiene declaraciones.
+    objetivo = len(fuente) / trozos
+    cortes = [(0, 1)]
+    ultimo, linea = 0, 1
+    for fin in limites[:-1]:
+        if fin - ultimo >= objetivo:
+            linea += fuente.count('\n', ultimo, fin)
+            cortes.append((fin, linea))
+            ultimo = fin
+    return cortes
+
+
+class _Trozo:
+    """Resultado de analizar fuente[offset:]: nodos, errores y estado final del parser."""
+    __slots__ = ('arbol', 'kinds', 'tipos', 'raices', 'diags', 'primero', 'fin_en_eof',
+                 'inicio_final', 'fin_final', 'fin_previo')
+
+    def limpio(self):
+        return not self.diags and self.fin_en_eof
+
+
+def _analizar(trabajo):
+    # Corre en un proceso del pool (o en el principal para el resto de la fuente).
+    # Offsets y líneas del árbol y de los errores quedan absolutos.
+    clase, texto, off, linea = trabajo
+    p = clase(salida=None, columnar=True)
+    p.globales_tokens(tokenize(texto))
+    p.arbol = a = ArbolColumnar()
+    p._nuevo = a.crear
+    p.advance()
+    d_lin = linea - 1
+    t = _Trozo()
+    t.primero = (p.lex.lineno + d_lin, p.inicio + off)
+    raices = []
+    # Mismo ciclo que program()
+    while p.token in _INICIO_DECL:
+        r = p.declaration()
+        raices.extend(n.i for n in (r if isinstance(r, list) else [r]))
+    if d_lin:
+        a.lineas = array('i', [v + d_lin for v in a.lineas])
+    if off:
+        a.inicios = array('q', [v + off if v >= 0 else v for v in a.inicios])
+        a.fines = array('q', [v + off if v >= 0 else v for v in a.fines])
+    a._id_simbolo = {}    # no hace falta del otro lado
+    t.arbol, t.raices = a, raices
+    t.kinds, t.tipos = list(arbol.KINDS), list(arbol.TIPOS_DATO)
+    t.diags = [r.desplazado(off) for r in p.diagnosticos]
+    t.fin_en_eof = p.token == TokenType.ENDFILE
+    # Si el trozo no consumió nada, fin_previo es 0 y 'off' es justo el fin del
+    # último token del trozo anterior (los cortes caen al final de un token)
+    t.inicio_final, t.fin_final = p.inicio + off, p.fin + off
+    t.fin_previo = p.fin_previo + off
+    return t
+
+
+def _resultados(clase, fuente, trabajadores, pool):
+    # Trozos analizados en orden de fuente; el último cubre hasta el final
+    cortes = _cortes(fuente, limites_decls(fuente), trabajadores * TROZOS_POR_TRABAJADOR)
+    if len(cortes) < 2:
+        return [_analizar((clase, fuente, 0, 1))]
+    finales = [c[0] for c in cortes[1:]] + [len(fuente)]
+    trabajos = [(clase, fuente[ini:fin], ini, linea)
+                for (ini, linea), fin in zip(cortes, finales)]
+    propio = pool is None
+    if propio:
+        pool = ProcessPoolExecutor(trabajadores)
+    res = []
+    try:
+        for k, t in enumerate(pool.map(_analizar, trabajos)):
+            if not t.limpio() and k < len(trabajos) - 1:
+                # Desde aquí decide la recuperación de errores: de corrido hasta el final
+                ini, linea = cortes[k]
+                res.append(_analizar((clase, fuente[ini:], ini, linea)))
+                break
+            res.append(t)
+    finally:
+        if propio:
+            pool.shutdown(cancel_futures=True)
+    return res
+
+
+def parsear_paralelo(prs, fuente, trabajadores=None, imprime=True, umbral=UMBRAL_PARALELO, pool=None):
+    """
+    Lo mismo que prs.globales_tokens(tokenize(fuente)) seguido de prs.parse(imprime),
+    con las declaraciones top-level analizadas en 'trabajadores' procesos (por
+    omisión, uno por CPU). El árbol es siempre columnar (ver arbol.py). Debajo
+    de 'umbral' caracteres se analiza todo en este proceso. Se puede pasar un
+    ProcessPoolExecutor ya creado en 'pool'.
+    """
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    prs.programa, prs.mapa = fuente, SourceMap(fuente)
+    prs._error = False
+    prs.diagnosticos.reiniciar()
+    clase = type(prs)
+    if trabajadores <= 1 or len(fuente) < umbral:
+        trozos = [_analizar((clase, fuente, 0, 1))]
+    else:
+        trozos = _resultados(clase, fuente, trabajadores, pool)
+
+    # Unión en orden: program primero, como en el análisis en serie
+    prs.arbol = a = ArbolColumnar()
+    prs._nuevo = a.crear
+    linea, inicio = trozos[0].primero
+    root = a.crear('program', None, linea, inicio, None)
+    a.raiz = root.i
+    try:
+        for t in trozos:
+            base = a.anexar(t.arbol, t.kinds, t.tipos)
+            for r in t.raices:
+                a.agregar_hijo(root.i, base + r)
+            for r in t.diags:
+                prs._error = True
+                prs.diagnosticos.anotar(r)
+        final = trozos[-1]
+        root.fin = max(final.fin_previo, root.inicio)
+
+        # Controles del final de parse(), con el parser donde quedó el último trozo
+        prs.inicio, prs.fin = final.inicio_final, final.fin_final
+        hijos = a.hijos(root.i)
+        if hijos:
+            last = a.nodo(hijos[-1])
+            if not (last.kind == 'fun_decl' and last.children[1].lexeme == 'main'):
+                prs.error('P06')
+        if not final.fin_en_eof:
+            prs.error('P07')
+    except AnalisisDetenido:
+        # Como en parse(): con parar_en queda un program vacío
+        prs.arbol = a = ArbolColumnar()
+        root = a.crear('program', None, linea, inicio, inicio)
+        a.raiz = root.i
+    prs.diagnosticos.volcar(prs.mapa, prs.salida)
+    if imprime:
+        imprimir_ast(root, prs.salida)
+        print(file=prs.salida)
+    return root
+
+
+# Semántica
+
+def _indice_grupo(globales):
+    # Índice para un grupo de funciones en el pool: los globales (copias de los
+    # del proceso principal) ocupan sus mismos números y empiezan sin usos
+    indice = IndiceReferencias()
+    indice.simbolos = list(globales)
+    for info in globales:
+        info.primer_uso = info.ultimo_uso = -1
+    return indice
+
+
+def _para_anexar(indice, n_globales):
+    # Lo que necesita IndiceReferencias.anexar: los locales y el uso de cada global
+    usados = [(g.id, g.primer_uso, g.ultimo_uso) for g in indice.simbolos[:n_globales]
+              if g.primer_uso >= 0]
+    indice.simbolos = indice.simbolos[n_globales:]
+    indice._por_nombre = None
+    return indice, usados
+
+
+class _Funcion:
+    """Resultado de chequear una función en el pool."""
+    __slots__ = ('posiciones', 'tipos', 'ligaduras', 'diags', 'texto', 'error')
+
+
+class _Grupo:
+    """Funciones consecutivas chequeadas en un mismo proceso, con su índice."""
+    __slots__ = ('funciones', 'indice', 'globales', 'tipos_dato')
+
+
+def _preorden(nodo):
+    # Nodos de la función en preorden (índices si el árbol es columnar)
+    if isinstance(nodo, NodoColumnar):
+        return nodo.arbol.preorden(nodo.i)
+    res = []
+    pila = [nodo]
+    pop, extend, agregar = pila.pop, pila.extend, res.append
+    while pila:
+        n = pop()
+        agregar(n)
+        extend(n.children[::-1])
+    return res
+
+
+def _leer_tipos(decl):
+    # (posiciones, códigos) de los nodos de la función con tipo de dato: en el
+    # árbol columnar la posición es el índice del nodo, que es el mismo en el
+    # proceso principal; en el de punteros, el lugar del nodo en el preorden
+    if isinstance(decl, NodoColumnar):
+        tipos = decl.arbol.tipos
+        nodos = [n for n in _preorden(decl) if tipos[n]]
+        return array('i', nodos), bytes([tipos[n] for n in nodos])
+    codigo = arbol.codigo_tipo
+    posiciones, codigos = array('i'), bytearray()
+    for k, n in enumerate(_preorden(decl)):
+        t = getattr(n, 'type', None)
+        if t is not None:
+            posiciones.append(k)
+            codigos.append(codigo(t))
+    return posiciones, bytes(codigos)
+
+
+def _poner_tipos(decl, posiciones, codigos, nombres):
+    # 'nombres' es TIPOS_DATO del proceso que leyó los códigos
+    if isinstance(decl, NodoColumnar):
+        tipos = decl.arbol.tipos
+        for n, c in zip(posiciones, codigos.translate(arbol.traduccion(nombres, arbol.codigo_tipo))):
+            tipos[n] = c
+    else:
+        orden = _preorden(decl)
+        for k, c in zip(posiciones, codigos):
+            orden[k].type = nombres[c]
+
+
+def _leer_ligaduras(decl):
+    # Ligaduras de la función (arbol.Ligadura) por posición, como en _leer_tipos
+    if isinstance(decl, NodoColumnar):
+        ligaduras = decl.arbol.ligaduras
+        return {n: ligaduras[n] for n in _preorden(decl) if n in ligaduras}
+    return {k: n.ligadura for k, n in enumerate(_preorden(decl))
+            if getattr(n, 'ligadura', None) is not None}
+
+
+def _poner_ligaduras(decl, ligaduras):
+    # Los nodos sin ligadura en el proceso que chequeó quedan sin ligadura aquí
+    if isinstance(decl, NodoColumnar):
+        propias = decl.arbol.ligaduras
+        for n in _preorden(decl):
+            l = ligaduras.get(n)
+            if l is None:
+                propias.pop(n, None)
+            else:
+                propias[n] = l
+    else:
+        for k, n in enumerate(_preorden(decl)):
+            l = ligaduras.get(k)
+            if l is not None or getattr(n, 'ligadura', None) is not None:
+                n.ligadura = l
+
+
+# Estado de cada proceso del pool: (funciones, tabla global, imprime, indexa).
+# Con fork los procesos heredan el árbol tal cual, sin copiarlo ni convertirlo.
+_estado_semantica = None
+
+def _iniciar_semantica(*estado):
+    global _estado_semantica
+    _estado_semantica = estado
+
+
+def _chequear(posiciones):
+    # Corre en un proceso del pool: chequea las funciones de esas posiciones
+    # con la tabla global del proceso principal
+    from semantica import AnalizadorSemantico
+
+    class Trabajador(AnalizadorSemantico):
+        def volcar_diagnosticos(self):
+            # Los diagnósticos los vuelca el proceso principal, en orden
+            pass
+
+    funciones, globales, imprime, indexa = _estado_semantica
+    g = _Grupo()
+    g.funciones = []
+    s = Trabajador()
+    s.indice = None
+    if indexa:
+        # Los globales en el orden de sus números en el índice (son los primeros)
+        ordenados = sorted(globales.values(), key=lambda info: info.id)
+        s.indice = _indice_grupo(ordenados)
+    for k in posiciones:
+        decl = funciones[k]
+        f = _Funcion()
+        s.tabla.reiniciar(globales)
+        s.current_func_ret = []
+        s.diagnosticos = ColectorDiagnosticos()
+        s._ambitos_indice = [0]
+        s.salida = io.StringIO()
+        f.error = None
+        try:
+            s.chequear_funcion(decl, imprime)
+        except Exception as e:
+            # Como en serie: lo anotado hasta el error sale y el error se relanza allá
+            f.error = e
+        f.posiciones, f.tipos = _leer_tipos(decl)
+        f.ligaduras = _leer_ligaduras(decl)
+        f.diags = s.diagnosticos.registros
+        f.texto = s.salida.getvalue()
+        g.funciones.append(f)
+        if f.error is not None:
+            break
+    g.indice, g.globales = (None, None) if s.indice is None else \
+        _para_anexar(s.indice, len(ordenados))
+    g.tipos_dato = list(arbol.TIPOS_DATO)
+    return g
+
+
+def chequear_paralelo(sem, funciones, imprime=False, trabajadores=None, umbral=UMBRAL_FUNCIONES):
+    """
+    Paso 2 de sem.semantica() (chequear_funcion sobre cada fun_decl de
+    'funciones') repartido entre 'trabajadores' procesos (por omisión, uno por
+    CPU), con la tabla global ya armada. Debajo de 'umbral' funciones se
+    chequean en este proceso.
+    """
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    if trabajadores <= 1 or not funciones or len(funciones) < umbral:
+        for decl in funciones:
+            sem.chequear_funcion(decl, imprime)
+        return
+
+    tam = -(-len(funciones) // (trabajadores * TROZOS_POR_TRABAJADOR))
+    grupos = [range(k, min(k + tam, len(funciones))) for k in range(0, len(funciones), tam)]
+    estado = (funciones, sem.depth[0], imprime, sem.indice is not None)
+    n_globales = 0 if sem.indice is None else len(sem.indice.simbolos)
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('fork' if 'fork' in metodos else None)
+    pool = ProcessPoolExecutor(trabajadores, contexto, _iniciar_semantica, estado)
+    decls = iter(funciones)
+    try:
+        for g in pool.map(_chequear, grupos):
+            for f in g.funciones:
+                for d in f.diags:
+                    sem.tipoError_ocurrido = True
+                    sem.diagnosticos.anotar(d)
+                decl = next(decls)
+                _poner_tipos(decl, f.posiciones, f.tipos, g.tipos_dato)
+                _poner_ligaduras(decl, f.ligaduras)
+                if f.error is not None:
+                    # Como en serie, el índice conserva lo anotado hasta el error
+                    if g.indice is not None:
+                        sem.indice.anexar(g.indice, n_globales, g.globales)
+                    raise f.error
+                if imprime:
+                    # Como en chequear_funcion: los errores antes que las tablas
+                    sem.volcar_diagnosticos()
+                    print(f.texto, end="", file=sem.salida)
+            if g.indice is not None:
+                sem.indice.anexar(g.indice, n_globales, g.globales)
+    finally:
+        pool.shutdown(cancel_futures=True)
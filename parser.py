@@ -1,18 +1,27 @@
+import io
+
 import lexer
 from globalTypes import *
-from lexer import getToken, globales as lexer_globales, TokenType
+from lexer import Lexer, LexerBytes, LexerTokens, TokenType
+from sourcemap import SourceMap
+from arbol import ArbolColumnar
+from volcado import imprimir_ast
+from diagnosticos import AnalisisDetenido, ColectorDiagnosticos
 
 
 # Parser descendente recursivo para C-. Genera un AST enriquecido con números de línea.
 
 
 class ASTNode:
-    def __init__(self, kind, lexeme=None):
+    def __init__(self, kind, lexeme=None, lineno=None, inicio=None, fin=None):
         self.kind = kind
         self.lexeme = lexeme
         self.children = []
-        # Capturamos línea actual de lexer
-        self.lineno = lexer.lineno
+        # Capturamos línea actual de lexer (el Parser la pasa explícitamente)
+        self.lineno = lexer.lineno if lineno is None else lineno
+        # Offsets en la fuente: primer carácter del nodo y uno después del último
+        self.inicio = inicio
+        self.fin = fin
 
     def add(self, node):
         if node:
@@ -23,388 +32,469 @@ class ASTNode:
                 self.children.append(node)
 
     def __repr__(self, lvl=0):
-        pad = '  ' * lvl
-        s = f"{pad}{self.kind}"
-        if self.lexeme is not None:
-            s += f": {self.lexeme}"
-        s += "\n"
-        for c in self.children:
-            s += c.__repr__(lvl+1)
-        return s
-
-# Globals
-programa = ''
-lineas = []
-token = None
-lexeme = None
-_error = False
+        # El volcado es iterativo (ver volcado.py); para árboles grandes conviene
+        # imprimir_ast() directo sobre el stream en lugar de armar el str
+        s = io.StringIO()
+        imprimir_ast(self, s, lvl)
+        return s.getvalue()
+
+
+# Estado del parser: token actual con sus offsets, mapa de la fuente y bandera de error.
+# Cada Parser tiene su propio Lexer, así que no comparte nada con otras compilaciones.
+# Con columnar=True los nodos se guardan en un ArbolColumnar (ver arbol.py) y el
+# parser maneja vistas NodoColumnar en lugar de ASTNode.
+
+class Parser:
+    def __init__(self, lex=None, salida=None, columnar=False):
+        self.lex = lex if lex is not None else Lexer(salida)
+        self.salida = salida  # None -> sys.stdout
+        self.columnar = columnar
+        self.arbol = None     # ArbolColumnar del último parse (si columnar)
+        self._nuevo = ASTNode
+        self.programa = ''
+        self.mapa = SourceMap('')
+        self.token = None
+        self.lexeme = None
+        self.inicio = 0       # offsets del token actual
+        self.fin = 0
+        self.fin_previo = 0   # fin del último token consumido
+        self._error = False
+        # Los errores se guardan aquí y se escriben al final de parse() (ver diagnosticos.py)
+        self.diagnosticos = ColectorDiagnosticos()
+
+    def globales(self, prog, pos, lng):
+        self.lex.globales(prog, pos, lng)
+        self.programa = prog
+        self.mapa = SourceMap(prog)
+
+    def globales_mmap(self, ruta):
+        """
+        Prepara el análisis leyendo 'ruta' con un mmap (ver lexer.LexerBytes):
+        no se copia el archivo a un str; el mapa de líneas se arma sobre el
+        mmap sólo si hay que mostrar un error.
+        """
+        self.lex = LexerBytes(self.salida)
+        self.lex.abrir(ruta)
+        self.programa = self.lex.programa
+        self.mapa = SourceMap(self.programa)
+
+    def globales_tokens(self, flujo):
+        """
+        Prepara el análisis sobre un TokenStream (ver lexer.tokenize). El parser
+        lo consume por índice y ya no pasa por los comentarios.
+        """
+        self.lex = LexerTokens(flujo, self.salida)
+        self.programa = flujo.fuente
+        self.mapa = SourceMap(flujo.fuente)
+
+    def texto_linea(self, ln):
+        return self.mapa.texto_linea(ln)
+
+    def nodo(self, kind, lexeme=None, inicio=None, fin=None):
+        # Sin offsets explícitos el nodo abarca el token actual
+        if inicio is None:
+            inicio, fin = self.inicio, self.fin
+        return self._nuevo(kind, lexeme, self.lex.lineno, inicio, fin)
+
+    def cierra(self, node):
+        # El nodo termina en el último token consumido (vacío si no consumió ninguno)
+        node.fin = max(self.fin_previo, node.inicio)
+        return node
 
-def globales(prog, pos, lng):
-    lexer_globales(prog, pos, lng)
-    global programa, lineas
-    programa = prog
-    lineas = programa.splitlines()
-
-# Error con contexto y caret
-
-def error(msg):
-    global _error
-    _error = True
-    ln = lexer.lineno
-    texto = lineas[ln-1] if 0 <= ln-1 < len(lineas) else ''
-    print(f"Línea {ln}: {msg}")
-    if texto:
-        print(texto)
-        idx = texto.find(lexeme) if lexeme else -1
-        if idx >= 0:
-            print(' ' * idx + '^')
-
-# Avanza token, ignorando comentarios
-
-def advance():
-    global token, lexeme
-    token, lexeme = getToken(False)
-    while token == TokenType.COMMENT or (token == TokenType.ERROR and isinstance(lexeme, str) and lexeme.startswith('/*')):
-        token, lexeme = getToken(False)
+    # Error en el token actual: 'codigo' es una plantilla de diagnosticos.PLANTILLAS
 
-# Recuperación pánico
+    def error(self, codigo, *args):
+        self._error = True
+        self.diagnosticos.agregar(codigo, self.inicio, self.fin, None, *args)
 
-def panic_recovery(sync):
-    while token not in sync and token != TokenType.ENDFILE:
-        advance()
+    # Avanza token, ignorando comentarios
 
-# Match con recover
+    def advance(self):
+        lex = self.lex
+        getToken = lex.getToken
+        self.fin_previo = self.fin
+        token, lexeme = getToken(False)
+        while token is TokenType.COMMENT or (token is TokenType.ERROR and isinstance(lexeme, str) and lexeme.startswith('/*')):
+            token, lexeme = getToken(False)
+        self.token, self.lexeme = token, lexeme
+        self.inicio, self.fin = lex.inicio, lex.posicion
 
-def match(expected):
-    global token
-    if token == expected:
-        advance()
-    else:
-        error(f"Se esperaba {expected.name}, se encontró {token.name}")
-        panic_recovery({TokenType.SEMI, TokenType.RBRACE})
-        if token == expected:
-            advance()
+    # Recuperación pánico
 
-# Entry point
+    def panic_recovery(self, sync):
+        while self.token not in sync and self.token != TokenType.ENDFILE:
+            self.advance()
 
-def parser(imprime=True):
-    global _error, token
-    advance()
-    root = program()
-    # Última debe ser main
-    if root.children:
-        last = root.children[-1]
-        if not (isinstance(last, ASTNode) and last.kind=='fun_decl' and last.children[1].lexeme=='main'):
-            error("La última declaración debe ser la función main")
-    if token != TokenType.ENDFILE:
-        error("Tokens sobrantes después de EOF")
-    if imprime:
-        print(root)
-    return root
-
-# 1. program → declaration-list
-
-def program():
-    node = ASTNode('program')
-    while token in {TokenType.INT, TokenType.VOID}:
-        node.add(declaration())
-    return node
-
-# 2. declaration → var-declaration | fun-declaration
-
-def declaration():
-    tipo = lexeme
-    match(token)
-    if token != TokenType.ID:
-        error("se esperaba identificador en declaration")
-        panic_recovery({TokenType.SEMI})
-        return ASTNode('error_decl')
-    name = lexeme
-    match(TokenType.ID)
-    # función
-    if token == TokenType.LPAREN:
-        fn = ASTNode('fun_decl')
-        fn.add(ASTNode('type_specifier', tipo))
-        fn.add(ASTNode('ID', name))
-        match(TokenType.LPAREN)
-        fn.add(params())
-        match(TokenType.RPAREN)
-        fn.add(compound_stmt())
-        return fn
-    # variable(s)
-    decls = []
-    def add_var(nm, arr_size=None):
-        v = ASTNode('var_decl')
-        v.add(ASTNode('type_specifier', tipo))
-        v.add(ASTNode('ID', nm))
-        if arr_size is not None:
-            v.add(ASTNode('NUM', arr_size))
-        decls.append(v)
-    # arreglo
-    if token == TokenType.LBRACKET:
-        match(TokenType.LBRACKET)
-        sz = lexeme
-        match(TokenType.NUM)
-        match(TokenType.RBRACKET)
-        add_var(name, sz)
-    else:
-        add_var(name)
-    while token == TokenType.COMMA:
-        match(TokenType.COMMA)
-        if token != TokenType.ID:
-            error("Se esperaba ID después de coma en var_decl")
-            break
-        nm2 = lexeme
-        match(TokenType.ID)
-        if token == TokenType.LBRACKET:
-            match(TokenType.LBRACKET)
-            sz2 = lexeme
-            match(TokenType.NUM)
-            match(TokenType.RBRACKET)
-            add_var(nm2, sz2)
+    # Match con recover
+
+    def match(self, expected):
+        if self.token == expected:
+            self.advance()
+        else:
+            self.error('P01', expected.name, self.token.name)
+            self.panic_recovery({TokenType.SEMI, TokenType.RBRACE})
+            if self.token == expected:
+                self.advance()
+
+    # Entry point
+
+    def parse(self, imprime=True):
+        self._error = False
+        self.diagnosticos.reiniciar()
+        if self.columnar:
+            self.arbol = ArbolColumnar()
+            self._nuevo = self.arbol.crear
         else:
-            add_var(nm2)
-    match(TokenType.SEMI)
-    return decls[0] if len(decls)==1 else decls
-
-# 3. params → param-list | void
-
-def params():
-    node = ASTNode('params')
-    if token == TokenType.VOID:
-        node.add(ASTNode('VOID', lexeme))
-        match(TokenType.VOID)
-    elif token != TokenType.RPAREN:
-        node.add(param_list())
-    return node
-
-# 4. param-list
-
-def param_list():
-    node = ASTNode('param_list')
-    node.add(param())
-    while token == TokenType.COMMA:
-        match(TokenType.COMMA)
-        node.add(param())
-    return node
-
-# 5. param → type-specifier ID [ ]
-
-def param():
-    node = ASTNode('param')
-    node.add(ASTNode('type_specifier', lexeme))
-    match(token)
-    if token == TokenType.ID:
-        node.add(ASTNode('ID', lexeme))
-        match(TokenType.ID)
-    if token == TokenType.LBRACKET:
-        match(TokenType.LBRACKET)
-        match(TokenType.RBRACKET)
-    return node
-
-# 6. compound-stmt → { local-declarations statement-list }
-
-def compound_stmt():
-    node = ASTNode('compound_stmt')
-    match(TokenType.LBRACE)
-    node.add(local_declarations())
-    node.add(statement_list())
-    match(TokenType.RBRACE)
-    return node
-
-# 7. local-declarations
-
-def local_declarations():
-    node = ASTNode('local_declarations')
-    while token in {TokenType.INT, TokenType.VOID}:
-        decl = declaration()
-        if isinstance(decl, list):
-            # Handle multiple declarations
-            for d in decl:
-                node.add(d)
+            self.arbol = None
+            self._nuevo = ASTNode
+        self.advance()
+        try:
+            root = self.program()
+            # Última debe ser main
+            if root.children:
+                last = root.children[-1]
+                if not (getattr(last, 'kind', None)=='fun_decl' and last.children[1].lexeme=='main'):
+                    self.error('P06')
+            if self.token != TokenType.ENDFILE:
+                self.error('P07')
+        except AnalisisDetenido:
+            # Se llegó a diagnosticos.parar_en: queda un program vacío
+            root = self.nodo('program')
+        finally:
+            self.diagnosticos.volcar(self.mapa, self.salida)
+        if self.arbol is not None:
+            self.arbol.raiz = root.i
+        if imprime:
+            imprimir_ast(root, self.salida)
+            print(file=self.salida)
+        return root
+
+    # 1. program → declaration-list
+
+    def program(self):
+        node = self.nodo('program')
+        while self.token in {TokenType.INT, TokenType.VOID}:
+            node.add(self.declaration())
+        return self.cierra(node)
+
+    # 2. declaration → var-declaration | fun-declaration
+
+    def declaration(self):
+        inicio = self.inicio
+        tipo, tipo_span = self.lexeme, (self.inicio, self.fin)
+        self.match(self.token)
+        if self.token != TokenType.ID:
+            self.error('P02')
+            self.panic_recovery({TokenType.SEMI})
+            return self.nodo('error_decl')
+        name, name_span = self.lexeme, (self.inicio, self.fin)
+        self.match(TokenType.ID)
+        # función
+        if self.token == TokenType.LPAREN:
+            fn = self.nodo('fun_decl', None, inicio)
+            fn.add(self.nodo('type_specifier', tipo, *tipo_span))
+            fn.add(self.nodo('ID', name, *name_span))
+            self.match(TokenType.LPAREN)
+            fn.add(self.params())
+            self.match(TokenType.RPAREN)
+            fn.add(self.compound_stmt())
+            return self.cierra(fn)
+        # variable(s)
+        decls = []
+        def add_var(nm, nm_span, arr_size=None, arr_span=None):
+            v = self.nodo('var_decl', None, inicio)
+            v.add(self.nodo('type_specifier', tipo, *tipo_span))
+            v.add(self.nodo('ID', nm, *nm_span))
+            if arr_size is not None:
+                v.add(self.nodo('NUM', arr_size, *arr_span))
+            decls.append(v)
+        # arreglo
+        if self.token == TokenType.LBRACKET:
+            self.match(TokenType.LBRACKET)
+            sz, sz_span = self.lexeme, (self.inicio, self.fin)
+            self.match(TokenType.NUM)
+            self.match(TokenType.RBRACKET)
+            add_var(name, name_span, sz, sz_span)
         else:
-            node.add(decl)
-    return node
-
-# 8. statement-list
-
-def statement_list():
-    node = ASTNode('statement_list')
-    while token not in {TokenType.RBRACE, TokenType.ENDFILE}:
-        node.add(statement())
-    return node
-
-# 9. statement → expression-stmt | compound-stmt | selection-stmt | iteration-stmt | return-stmt
-
-def statement():
-    if token == TokenType.LBRACE:
-        return compound_stmt()
-    if token == TokenType.IF:
-        return selection_stmt()
-    if token == TokenType.WHILE:
-        return iteration_stmt()
-    if token == TokenType.RETURN:
-        return return_stmt()
-    return expression_stmt()
-
-# 10. expression-stmt
-
-def expression_stmt():
-    node = ASTNode('expression_stmt')
-    if token != TokenType.SEMI:
-        node.add(expression())
-    match(TokenType.SEMI)
-    return node
-
-# 11. selection-stmt
-
-def selection_stmt():
-    node = ASTNode('selection_stmt')
-    match(TokenType.IF)
-    match(TokenType.LPAREN)
-    node.add(expression())
-    match(TokenType.RPAREN)
-    node.add(statement())
-    if token == TokenType.ELSE:
-        match(TokenType.ELSE)
-        node.add(statement())
-    return node
-
-# 12. iteration-stmt
-
-def iteration_stmt():
-    node = ASTNode('iteration_stmt')
-    match(TokenType.WHILE)
-    match(TokenType.LPAREN)
-    node.add(expression())
-    match(TokenType.RPAREN)
-    node.add(statement())
-    return node
-
-# 13. return-stmt
-
-def return_stmt():
-    node = ASTNode('return_stmt')
-    match(TokenType.RETURN)
-    if token != TokenType.SEMI:
-        node.add(expression())
-    match(TokenType.SEMI)
-    return node
-
-# 14. expression → var = expression | simple-expression
-
-def expression():
-    node = simple_expression()
-    if token == TokenType.EQ:
-        if not (isinstance(node, ASTNode) and node.kind=='var'):
-            error("La parte izquierda de la asignación debe ser una variable")
-        
-        # Store the entire var node (including index if present)
-        var_node = node
-        match(TokenType.EQ)
-        rhs = expression()
-        
-        # Create assignment node
-        assign = ASTNode('assign', var_node.lexeme)
-        
-        # If the variable has an index (array assignment), add it first
-        if var_node.children:  # Array assignment: var[index] = value
-            assign.add(rhs)                   # Add value FIRST
-            assign.add(var_node.children[0])  # Add index SECOND
-        else:  # Simple assignment: var = value
-            assign.add(rhs)
-        
-        return assign
-    return node
-
-# 15. simple-expression
-
-def simple_expression():
-    node = additive_expression()
-    if token in {TokenType.LT, TokenType.LE, TokenType.GT, TokenType.GE, TokenType.EQEQ, TokenType.NE}:
-        op = lexeme
-        match(token)
-        rel = ASTNode('relop', op)
-        rel.add(node)
-        rel.add(additive_expression())
-        return rel
-    return node
-
-# 16. additive-expression
-
-def additive_expression():
-    node = term()
-    while token in {TokenType.PLUS, TokenType.MINUS}:
-        op = lexeme
-        match(token)
-        addn = ASTNode('addop', op)
-        addn.add(node)
-        addn.add(term())
-        node = addn
-    return node
-
-# 17. term
-
-def term():
-    node = factor()
-    while token in {TokenType.TIMES, TokenType.OVER}:
-        op = lexeme
-        match(token)
-        mul = ASTNode('mulop', op)
-        mul.add(node)
-        mul.add(factor())
-        node = mul
-    return node
-
-# 18. factor
-
-def factor():
-    if token == TokenType.LPAREN:
-        match(TokenType.LPAREN)
-        node = expression()
-        match(TokenType.RPAREN)
+            add_var(name, name_span)
+        while self.token == TokenType.COMMA:
+            self.match(TokenType.COMMA)
+            if self.token != TokenType.ID:
+                self.error('P03')
+                break
+            nm2, nm2_span = self.lexeme, (self.inicio, self.fin)
+            self.match(TokenType.ID)
+            if self.token == TokenType.LBRACKET:
+                self.match(TokenType.LBRACKET)
+                sz2, sz2_span = self.lexeme, (self.inicio, self.fin)
+                self.match(TokenType.NUM)
+                self.match(TokenType.RBRACKET)
+                add_var(nm2, nm2_span, sz2, sz2_span)
+            else:
+                add_var(nm2, nm2_span)
+        self.match(TokenType.SEMI)
+        for v in decls:
+            self.cierra(v)
+        return decls[0] if len(decls)==1 else decls
+
+    # 3. params → param-list | void
+
+    def params(self):
+        node = self.nodo('params')
+        if self.token == TokenType.VOID:
+            node.add(self.nodo('VOID', self.lexeme))
+            self.match(TokenType.VOID)
+        elif self.token != TokenType.RPAREN:
+            node.add(self.param_list())
+        return self.cierra(node)
+
+    # 4. param-list
+
+    def param_list(self):
+        node = self.nodo('param_list')
+        node.add(self.param())
+        while self.token == TokenType.COMMA:
+            self.match(TokenType.COMMA)
+            node.add(self.param())
+        return self.cierra(node)
+
+    # 5. param → type-specifier ID [ ]
+
+    def param(self):
+        node = self.nodo('param')
+        node.add(self.nodo('type_specifier', self.lexeme))
+        self.match(self.token)
+        if self.token == TokenType.ID:
+            node.add(self.nodo('ID', self.lexeme))
+            self.match(TokenType.ID)
+        if self.token == TokenType.LBRACKET:
+            self.match(TokenType.LBRACKET)
+            self.match(TokenType.RBRACKET)
+        return self.cierra(node)
+
+    # 6. compound-stmt → { local-declarations statement-list }
+
+    def compound_stmt(self):
+        node = self.nodo('compound_stmt')
+        self.match(TokenType.LBRACE)
+        node.add(self.local_declarations())
+        node.add(self.statement_list())
+        self.match(TokenType.RBRACE)
+        return self.cierra(node)
+
+    # 7. local-declarations
+
+    def local_declarations(self):
+        node = self.nodo('local_declarations')
+        while self.token in {TokenType.INT, TokenType.VOID}:
+            decl = self.declaration()
+            if isinstance(decl, list):
+                # Handle multiple declarations
+                for d in decl:
+                    node.add(d)
+            else:
+                node.add(decl)
+        return self.cierra(node)
+
+    # 8. statement-list
+
+    def statement_list(self):
+        node = self.nodo('statement_list')
+        while self.token not in {TokenType.RBRACE, TokenType.ENDFILE}:
+            node.add(self.statement())
+        return self.cierra(node)
+
+    # 9. statement → expression-stmt | compound-stmt | selection-stmt | iteration-stmt | return-stmt
+
+    def statement(self):
+        if self.token == TokenType.LBRACE:
+            return self.compound_stmt()
+        if self.token == TokenType.IF:
+            return self.selection_stmt()
+        if self.token == TokenType.WHILE:
+            return self.iteration_stmt()
+        if self.token == TokenType.RETURN:
+            return self.return_stmt()
+        return self.expression_stmt()
+
+    # 10. expression-stmt
+
+    def expression_stmt(self):
+        node = self.nodo('expression_stmt')
+        if self.token != TokenType.SEMI:
+            node.add(self.expression())
+        self.match(TokenType.SEMI)
+        return self.cierra(node)
+
+    # 11. selection-stmt
+
+    def selection_stmt(self):
+        node = self.nodo('selection_stmt')
+        self.match(TokenType.IF)
+        self.match(TokenType.LPAREN)
+        node.add(self.expression())
+        self.match(TokenType.RPAREN)
+        node.add(self.statement())
+        if self.token == TokenType.ELSE:
+            self.match(TokenType.ELSE)
+            node.add(self.statement())
+        return self.cierra(node)
+
+    # 12. iteration-stmt
+
+    def iteration_stmt(self):
+        node = self.nodo('iteration_stmt')
+        self.match(TokenType.WHILE)
+        self.match(TokenType.LPAREN)
+        node.add(self.expression())
+        self.match(TokenType.RPAREN)
+        node.add(self.statement())
+        return self.cierra(node)
+
+    # 13. return-stmt
+
+    def return_stmt(self):
+        node = self.nodo('return_stmt')
+        self.match(TokenType.RETURN)
+        if self.token != TokenType.SEMI:
+            node.add(self.expression())
+        self.match(TokenType.SEMI)
+        return self.cierra(node)
+
+    # 14. expression → var = expression | simple-expression
+
+    def expression(self):
+        node = self.simple_expression()
+        if self.token == TokenType.EQ:
+            if getattr(node, 'kind', None) != 'var':
+                self.error('P04')
+
+            # Store the entire var node (including index if present)
+            var_node = node
+            self.match(TokenType.EQ)
+            rhs = self.expression()
+
+            # Create assignment node
+            assign = self.nodo('assign', var_node.lexeme, var_node.inicio)
+
+            # If the variable has an index (array assignment), add it first
+            if var_node.children:  # Array assignment: var[index] = value
+                assign.add(rhs)                   # Add value FIRST
+                assign.add(var_node.children[0])  # Add index SECOND
+            else:  # Simple assignment: var = value
+                assign.add(rhs)
+
+            return self.cierra(assign)
+        return node
+
+    # 15. simple-expression
+
+    def simple_expression(self):
+        node = self.additive_expression()
+        if self.token in {TokenType.LT, TokenType.LE, TokenType.GT, TokenType.GE, TokenType.EQEQ, TokenType.NE}:
+            op = self.lexeme
+            self.match(self.token)
+            rel = self.nodo('relop', op, node.inicio)
+            rel.add(node)
+            rel.add(self.additive_expression())
+            return self.cierra(rel)
+        return node
+
+    # 16. additive-expression
+
+    def additive_expression(self):
+        node = self.term()
+        while self.token in {TokenType.PLUS, TokenType.MINUS}:
+            op = self.lexeme
+            self.match(self.token)
+            addn = self.nodo('addop', op, node.inicio)
+            addn.add(node)
+            addn.add(self.term())
+            node = self.cierra(addn)
         return node
-    if token == TokenType.NUM:
-        v = lexeme; match(TokenType.NUM)
-        return ASTNode('NUM', v)
-    if token == TokenType.ID:
-        name = lexeme; match(TokenType.ID)
-        # 1) var indexada
-        if token == TokenType.LBRACKET:
-            match(TokenType.LBRACKET)
-            idx = expression()
-            match(TokenType.RBRACKET)
-            var_node = ASTNode('var', name)
-            var_node.add(idx)
-            return var_node
-        # 2) llamada
-        if token == TokenType.LPAREN:
-            call = ASTNode('call', name)
-            match(TokenType.LPAREN)
-            call.add(args())
-            match(TokenType.RPAREN)
-            return call
-        # 3) var simple
-        return ASTNode('var', name)
-    error("Error en factor")
-    advance()
-    return ASTNode('error_factor')
-
-
-# 19. args → arg-list | empty
-
-def args():
-    node = ASTNode('args')
-    if token != TokenType.RPAREN:
-        node.add(arg_list())
-    return node
-
-# 20. arg-list
-
-def arg_list():
-    node = ASTNode('arg_list')
-    node.add(expression())
-    while token == TokenType.COMMA:
-        match(TokenType.COMMA)
-        node.add(expression())
-    return node
+
+    # 17. term
+
+    def term(self):
+        node = self.factor()
+        while self.token in {TokenType.TIMES, TokenType.OVER}:
+            op = self.lexeme
+            self.match(self.token)
+            mul = self.nodo('mulop', op, node.inicio)
+            mul.add(node)
+            mul.add(self.factor())
+            node = self.cierra(mul)
+        return node
+
+    # 18. factor
+
+    def factor(self):
+        inicio = self.inicio
+        if self.token == TokenType.LPAREN:
+            self.match(TokenType.LPAREN)
+            node = self.expression()
+            self.match(TokenType.RPAREN)
+            return node
+        if self.token == TokenType.NUM:
+            v = self.lexeme; self.match(TokenType.NUM)
+            return self.cierra(self.nodo('NUM', v, inicio))
+        if self.token == TokenType.ID:
+            name = self.lexeme; self.match(TokenType.ID)
+            # 1) var indexada
+            if self.token == TokenType.LBRACKET:
+                self.match(TokenType.LBRACKET)
+                idx = self.expression()
+                self.match(TokenType.RBRACKET)
+                var_node = self.nodo('var', name, inicio)
+                var_node.add(idx)
+                return self.cierra(var_node)
+            # 2) llamada
+            if self.token == TokenType.LPAREN:
+                call = self.nodo('call', name, inicio)
+                self.match(TokenType.LPAREN)
+                call.add(self.args())
+                self.match(TokenType.RPAREN)
+                return self.cierra(call)
+            # 3) var simple
+            return self.cierra(self.nodo('var', name, inicio))
+        self.error('P05')
+        self.advance()
+        return self.cierra(self.nodo('error_factor', None, inicio))
+
+
+    # 19. args → arg-list | empty
+
+    def args(self):
+        node = self.nodo('args')
+        if self.token != TokenType.RPAREN:
+            node.add(self.arg_list())
+        return self.cierra(node)
+
+    # 20. arg-list
+
+    def arg_list(self):
+        node = self.nodo('arg_list')
+        node.add(self.expression())
+        while self.token == TokenType.COMMA:
+            self.match(TokenType.COMMA)
+            node.add(self.expression())
+        return self.cierra(node)
+
+
+# Interfaz de módulo: parser() y globales() trabajan sobre el Parser de la sesión
+# por defecto.
+
+def _por_defecto():
+    from sesion import sesion_por_defecto
+    return sesion_por_defecto.parser
+
+def globales(prog, pos, lng):
+    _por_defecto().globales(prog, pos, lng)
+
+def parser(imprime=True):
+    return _por_defecto().parse(imprime)
+
+def __getattr__(name):
+    if name in ('programa', 'mapa', 'token', 'lexeme', '_error'):
+        return getattr(_por_defecto(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,508 @@
+# parser_ll1.py
+# Parser LL(1) dirigido por tabla, con pila explícita. Produce los mismos ASTNode
+# (mismas formas, líneas, offsets y mensajes de error) que el descendente recursivo
+# de parser.py, pero no anida llamadas de Python por cada nivel de la gramática:
+# bloques y expresiones de cualquier profundidad usan espacio de pila constante.
+#
+# Sentencias y declaraciones: la gramática está escrita abajo como datos. De ella
+# se calculan FIRST y FOLLOW y la tabla M[no terminal][token] -> alternativa.
+# Expresiones: precedence climbing con pilas propias de operandos y operadores.
+
+from globalTypes import *
+from parser import Parser
+
+
+# Símbolos de la gramática:
+#   TokenType       terminal: se consume con match()
+#   'nombre'        no terminal
+#   '@accion:arg'   acción semántica sobre la pila de valores (no consume nada)
+#   CUALQUIERA      consume el token actual, sea cual sea
+#
+# Cada alternativa es (símbolos, extra). La tabla la elige con FIRST(símbolos),
+# más FOLLOW(no terminal) si los símbolos pueden ser vacíos, más los tokens de
+# 'extra'. Con extra = OTRO la alternativa es además la de cualquier token que no
+# esté en la tabla (así se comporta el recursivo en sus ramas 'else'); un no
+# terminal con una sola alternativa la usa siempre y deja que match() reporte el
+# error. Si dos alternativas comparten un token gana la primera (p. ej. el 'else'
+# colgante).
+
+CUALQUIERA = 'CUALQUIERA'
+OTRO = 'OTRO'
+
+GRAMATICA = {
+    # 1. program → declaration-list
+    'program': [
+        (('@nodo:program', 'declaration_list', '@cierra'), None),
+    ],
+    'declaration_list': [
+        (('declaration', '@agrega', 'declaration_list'), None),
+        ((), OTRO),
+    ],
+    # 2. declaration: la cabecera y las variables se leen en la acción; si es una
+    # función, la acción devuelve el resto de la producción (fun_resto)
+    'declaration': [
+        (('@declaration',), OTRO),
+    ],
+    'fun_resto': [
+        ((TokenType.LPAREN, 'params', '@agrega', TokenType.RPAREN,
+          'compound_stmt', '@agrega', '@cierra'), None),
+    ],
+    # 3. params → param-list | void
+    'params': [
+        (('@nodo:params', '@hoja:VOID', TokenType.VOID, '@cierra'), None),
+        (('@nodo:params', '@cierra'), None),
+        (('@nodo:params', 'param_list', '@agrega', '@cierra'), OTRO),
+    ],
+    # 4. param-list
+    'param_list': [
+        (('@nodo:param_list', 'param', '@agrega', 'param_list_resto', '@cierra'), None),
+    ],
+    'param_list_resto': [
+        ((TokenType.COMMA, 'param', '@agrega', 'param_list_resto'), None),
+        ((), OTRO),
+    ],
+    # 5. param → type-specifier ID [ ]
+    'param': [
+        (('@nodo:param', '@hoja:type_specifier', CUALQUIERA, 'param_id', 'param_arreglo',
+          '@cierra'), None),
+    ],
+    'param_id': [
+        (('@hoja:ID', TokenType.ID), None),
+        ((), OTRO),
+    ],
+    'param_arreglo': [
+        ((TokenType.LBRACKET, TokenType.RBRACKET), None),
+        ((), OTRO),
+    ],
+    # 6. compound-stmt → { local-declarations statement-list }
+    'compound_stmt': [
+        (('@nodo:compound_stmt', TokenType.LBRACE, 'local_declarations', '@agrega',
+          'statement_list', '@agrega', TokenType.RBRACE, '@cierra'), None),
+    ],
+    # 7. local-declarations
+    'local_declarations': [
+        (('@nodo:local_declarations', 'local_lista', '@cierra'), None),
+    ],
+    'local_lista': [
+        (('declaration', '@agrega', 'local_lista'), {TokenType.INT, TokenType.VOID}),
+        ((), OTRO),
+    ],
+    # 8. statement-list
+    'statement_list': [
+        (('@nodo:statement_list', 'statement_lista', '@cierra'), None),
+    ],
+    'statement_lista': [
+        ((), {TokenType.ENDFILE}),
+        (('statement', '@agrega', 'statement_lista'), OTRO),
+    ],
+    # 9. statement
+    'statement': [
+        (('compound_stmt',), None),
+        (('selection_stmt',), None),
+        (('iteration_stmt',), None),
+        (('return_stmt',), None),
+        (('expression_stmt',), OTRO),
+    ],
+    # 10. expression-stmt
+    'expression_stmt': [
+        (('@nodo:expression_stmt', 'expresion_opcional', TokenType.SEMI, '@cierra'), None),
+    ],
+    'expresion_opcional': [
+        ((), None),
+        (('expression', '@agrega'), OTRO),
+    ],
+    # 11. selection-stmt
+    'selection_stmt': [
+        (('@nodo:selection_stmt', TokenType.IF, TokenType.LPAREN, 'expression', '@agrega',
+          TokenType.RPAREN, 'statement', '@agrega', 'else_parte', '@cierra'), None),
+    ],
+    'else_parte': [
+        ((TokenType.ELSE, 'statement', '@agrega'), None),
+        ((), OTRO),
+    ],
+    # 12. iteration-stmt
+    'iteration_stmt': [
+        (('@nodo:iteration_stmt', TokenType.WHILE, TokenType.LPAREN, 'expression', '@agrega',
+          TokenType.RPAREN, 'statement', '@agrega', '@cierra'), None),
+    ],
+    # 13. return-stmt
+    'return_stmt': [
+        (('@nodo:return_stmt', TokenType.RETURN, 'expresion_opcional', TokenType.SEMI,
+          '@cierra'), None),
+    ],
+    # 14-20. expression: la resuelve _expresion() sin recursión
+    'expression': [
+        (('@expresion',), OTRO),
+    ],
+}
+
+# FIRST de lo que leen las acciones por su cuenta
+PRIMERO_ACCION = {
+    '@declaration': {TokenType.INT, TokenType.VOID},
+    '@expresion':   {TokenType.LPAREN, TokenType.NUM, TokenType.ID},
+}
+
+
+# Cálculo de FIRST y FOLLOW (punto fijo clásico)
+
+def _primero_de(simbolos, primero, anulable):
+    """FIRST de una secuencia de símbolos y si puede ser vacía."""
+    res = set()
+    for s in simbolos:
+        if isinstance(s, TokenType):
+            res.add(s)
+            return res, False
+        if s == CUALQUIERA:
+            return res, False
+        if s.startswith('@'):
+            if s in PRIMERO_ACCION:
+                res |= PRIMERO_ACCION[s]
+                return res, False
+            continue
+        res |= primero[s]
+        if not anulable[s]:
+            return res, False
+    return res, True
+
+def calcular_primero_siguiente(gramatica=GRAMATICA, inicial='program'):
+    primero = {nt: set() for nt in gramatica}
+    anulable = {nt: False for nt in gramatica}
+    cambio = True
+    while cambio:
+        cambio = False
+        for nt, alternativas in gramatica.items():
+            for simbolos, _ in alternativas:
+                p, a = _primero_de(simbolos, primero, anulable)
+                if not p <= primero[nt] or (a and not anulable[nt]):
+                    primero[nt] |= p
+                    anulable[nt] = anulable[nt] or a
+                    cambio = True
+
+    siguiente = {nt: set() for nt in gramatica}
+    siguiente[inicial].add(TokenType.ENDFILE)
+    # La acción @declaration devuelve fun_resto: lo que sigue a declaration le sigue
+    enlaces = [('declaration', 'fun_resto')]
+    cambio = True
+    while cambio:
+        cambio = False
+        for nt, alternativas in gramatica.items():
+            for simbolos, _ in alternativas:
+                for i, s in enumerate(simbolos):
+                    if s not in gramatica:
+                        continue
+                    p, a = _primero_de(simbolos[i+1:], primero, anulable)
+                    nuevo = p | (siguiente[nt] if a else set())
+                    if not nuevo <= siguiente[s]:
+                        siguiente[s] |= nuevo
+                        cambio = True
+        for de, a in enlaces:
+            if not siguiente[de] <= siguiente[a]:
+                siguiente[a] |= siguiente[de]
+                cambio = True
+    return primero, anulable, siguiente
+
+def construir_tabla(acciones, gramatica=GRAMATICA):
+    """
+    Tabla LL(1): tabla[nt][token] -> alternativa y defecto[nt] -> alternativa
+    para los demás tokens (None si no hay: es un error de sintaxis).
+    Las alternativas se guardan ya compiladas y al revés, listas para la pila;
+    cada '@accion' queda como la función _a_accion de la clase 'acciones'.
+    """
+    primero, anulable, siguiente = calcular_primero_siguiente(gramatica)
+    tabla, defecto = {}, {}
+    for nt, alternativas in gramatica.items():
+        fila = tabla[nt] = {}
+        defecto[nt] = None
+        for simbolos, extra in alternativas:
+            p, a = _primero_de(simbolos, primero, anulable)
+            tokens = p | (siguiente[nt] if a else set())
+            if extra is not None and extra != OTRO:
+                tokens |= extra
+            compilada = _compilar(simbolos, acciones)
+            for t in tokens:
+                fila.setdefault(t, compilada)
+            if (extra == OTRO or len(alternativas) == 1) and defecto[nt] is None:
+                defecto[nt] = compilada
+    return tabla, defecto
+
+
+# Símbolos compilados: (clase, dato); una acción es (función, argumento). Las
+# acciones más frecuentes (nodo, hoja, agrega, cierra) tienen clase propia y el
+# motor las ejecuta en línea, sin llamar a una función por cada una.
+_TERMINAL, _NO_TERMINAL, _ACCION, _CUALQUIERA, _NODO, _HOJA, _AGREGA, _CIERRA = range(8)
+_EN_LINEA = {'nodo': _NODO, 'hoja': _HOJA, 'agrega': _AGREGA, 'cierra': _CIERRA}
+
+def _compilar(simbolos, acciones):
+    res = []
+    for s in reversed(simbolos):
+        if isinstance(s, TokenType):
+            res.append((_TERMINAL, s))
+        elif s == CUALQUIERA:
+            res.append((_CUALQUIERA, None))
+        elif s.startswith('@'):
+            nombre, _, arg = s[1:].partition(':')
+            if nombre in _EN_LINEA:
+                res.append((_EN_LINEA[nombre], arg or None))
+            else:
+                res.append((_ACCION, (getattr(acciones, '_a_' + nombre), arg or None)))
+        else:
+            res.append((_NO_TERMINAL, s))
+    return tuple(res)
+
+
+# Operadores binarios: precedencia y tipo de nodo. Los relacionales no se asocian
+# (a lo más uno por expresión simple), los demás asocian a la izquierda.
+PRECEDENCIA = {
+    TokenType.LT: 1, TokenType.LE: 1, TokenType.GT: 1, TokenType.GE: 1,
+    TokenType.EQEQ: 1, TokenType.NE: 1,
+    TokenType.PLUS: 2, TokenType.MINUS: 2,
+    TokenType.TIMES: 3, TokenType.OVER: 3,
+}
+_NODO_OPERADOR = {1: 'relop', 2: 'addop', 3: 'mulop'}
+
+# Estados de _expresion
+_FACTOR, _OPERANDO, _COMPLETA = range(3)
+
+
+class ParserLL1(Parser):
+    """
+    Mismo Parser (tokens, errores, recuperación, nodos) con otro motor: program()
+    corre la tabla LL(1) sobre una pila explícita en lugar de llamar a un método
+    por producción. parsear(nt) permite empezar en cualquier no terminal.
+    """
+
+    def program(self):
+        return self.parsear('program')
+
+    def declaration(self):
+        return self.parsear('declaration')
+
+    def parsear(self, inicial):
+        pila = [(_NO_TERMINAL, inicial)]
+        valores = []
+        tabla, defecto = TABLA, DEFECTO
+        pop, extend = pila.pop, pila.extend
+        while pila:
+            clase, dato = pop()
+            if clase is _TERMINAL:
+                if self.token is dato:
+                    self.advance()
+                else:
+                    self.match(dato)
+            elif clase is _NO_TERMINAL:
+                extend(tabla[dato].get(self.token, defecto[dato]))
+            elif clase is _AGREGA:
+                hijo = valores.pop()
+                valores[-1].add(hijo)
+            elif clase is _CIERRA:
+                self.cierra(valores[-1])
+            elif clase is _NODO:
+                valores.append(self._nuevo(dato, None, self.lex.lineno, self.inicio, self.fin))
+            elif clase is _HOJA:
+                valores[-1].add(self._nuevo(dato, self.lexeme, self.lex.lineno, self.inicio, self.fin))
+            elif clase is _ACCION:
+                accion, arg = dato
+                resto = accion(self, valores, arg)
+                if resto:
+                    extend(resto)
+            else:
+                self.match(self.token)
+        return valores[-1] if valores else None
+
+    # Acciones de la gramática
+
+    def _a_expresion(self, valores, _):
+        valores.append(self._expresion())
+
+    def _a_declaration(self, valores, _):
+        # 2. declaration → var-declaration | fun-declaration
+        inicio = self.inicio
+        tipo, tipo_span = self.lexeme, (self.inicio, self.fin)
+        self.match(self.token)
+        if self.token != TokenType.ID:
+            self.error('P02')
+            self.panic_recovery({TokenType.SEMI})
+            valores.append(self.nodo('error_decl'))
+            return None
+        name, name_span = self.lexeme, (self.inicio, self.fin)
+        self.match(TokenType.ID)
+        # función: el resto va a la pila
+        if self.token == TokenType.LPAREN:
+            fn = self.nodo('fun_decl', None, inicio)
+            fn.add(self.nodo('type_specifier', tipo, *tipo_span))
+            fn.add(self.nodo('ID', name, *name_span))
+            valores.append(fn)
+            return TABLA['fun_resto'][TokenType.LPAREN]
+        # variable(s)
+        decls = []
+        def add_var(nm, nm_span, arr_size=None, arr_span=None):
+            v = self.nodo('var_decl', None, inicio)
+            v.add(self.nodo('type_specifier', tipo, *tipo_span))
+            v.add(self.nodo('ID', nm, *nm_span))
+            if arr_size is not None:
+                v.add(self.nodo('NUM', arr_size, *arr_span))
+            decls.append(v)
+        nm, nm_span = name, name_span
+        while True:
+            if self.token == TokenType.LBRACKET:
+                self.match(TokenType.LBRACKET)
+                sz, sz_span = self.lexeme, (self.inicio, self.fin)
+                self.match(TokenType.NUM)
+                self.match(TokenType.RBRACKET)
+                add_var(nm, nm_span, sz, sz_span)
+            else:
+                add_var(nm, nm_span)
+            if self.token != TokenType.COMMA:
+                break
+            self.match(TokenType.COMMA)
+            if self.token != TokenType.ID:
+                self.error('P03')
+                break
+            nm, nm_span = self.lexeme, (self.inicio, self.fin)
+            self.match(TokenType.ID)
+        self.match(TokenType.SEMI)
+        for v in decls:
+            self.cierra(v)
+        valores.append(decls[0] if len(decls)==1 else decls)
+        return None
+
+    # 14-20. Expresiones por precedence climbing
+    #
+    # Cada expresión anidada (entre paréntesis, índice de arreglo, argumento de
+    # llamada o lado derecho de '=') abre un marco con sus propias pilas; al
+    # completarse, 'cont' dice qué hacer con el resultado en el marco de afuera.
+    # Los nodos se crean en el mismo orden (y por tanto con la misma línea) que
+    # en el recursivo: el operador justo después de consumirlo, 'assign' al
+    # terminar su lado derecho, 'call' antes de consumir '('.
+
+    def _expresion(self):
+        marcos = []
+        operandos, operadores, relop, cont = [], [], False, None
+        estado = _FACTOR
+        nodo = None
+        while True:
+            if estado == _FACTOR:
+                # 18. factor
+                tok = self.token
+                inicio = self.inicio
+                if tok == TokenType.NUM:
+                    v = self.lexeme; self.advance()
+                    nodo = self.cierra(self.nodo('NUM', v, inicio))
+                    estado = _OPERANDO
+                elif tok == TokenType.ID:
+                    name = self.lexeme; self.advance()
+                    if self.token == TokenType.LBRACKET:
+                        # 1) var indexada
+                        self.advance()
+                        marcos.append((operandos, operadores, relop, cont))
+                        operandos, operadores, relop, cont = [], [], False, ('indice', name, inicio)
+                    elif self.token == TokenType.LPAREN:
+                        # 2) llamada
+                        call = self.nodo('call', name, inicio)
+                        self.advance()
+                        args = self.nodo('args')
+                        if self.token != TokenType.RPAREN:
+                            arg_list = self.nodo('arg_list')
+                            marcos.append((operandos, operadores, relop, cont))
+                            operandos, operadores, relop, cont = [], [], False, ('arg', call, args, arg_list)
+                        else:
+                            self.cierra(args)
+                            call.add(args)
+                            self.match(TokenType.RPAREN)
+                            nodo = self.cierra(call)
+                            estado = _OPERANDO
+                    else:
+                        # 3) var simple
+                        nodo = self.cierra(self.nodo('var', name, inicio))
+                        estado = _OPERANDO
+                elif tok == TokenType.LPAREN:
+                    self.advance()
+                    marcos.append((operandos, operadores, relop, cont))
+                    operandos, operadores, relop, cont = [], [], False, ('paren',)
+                else:
+                    self.error('P05')
+                    self.advance()
+                    nodo = self.cierra(self.nodo('error_factor', None, inicio))
+                    estado = _OPERANDO
+
+            elif estado == _OPERANDO:
+                operandos.append(nodo)
+                prec = PRECEDENCIA.get(self.token)
+                if prec is not None and not (prec == 1 and relop):
+                    # 15-17. operador binario: se reduce lo de igual o mayor precedencia
+                    while operadores and operadores[-1][0] >= prec:
+                        _, n = operadores.pop()
+                        n.add(operandos.pop())
+                        operandos.append(self.cierra(n))
+                    izq = operandos.pop()
+                    op = self.lexeme
+                    self.advance()
+                    n = self.nodo(_NODO_OPERADOR[prec], op, izq.inicio)
+                    n.add(izq)
+                    operadores.append((prec, n))
+                    relop = relop or prec == 1
+                    estado = _FACTOR
+                    continue
+                # Fin de la expresión simple
+                while operadores:
+                    _, n = operadores.pop()
+                    n.add(operandos.pop())
+                    operandos.append(self.cierra(n))
+                nodo = operandos.pop()
+                if self.token == TokenType.EQ:
+                    # 14. var = expression
+                    if getattr(nodo, 'kind', None) != 'var':
+                        self.error('P04')
+                    self.match(TokenType.EQ)
+                    marcos.append((operandos, operadores, relop, cont))
+                    operandos, operadores, relop, cont = [], [], False, ('asigna', nodo)
+                    estado = _FACTOR
+                else:
+                    estado = _COMPLETA
+
+            else:
+                # Expresión completa en 'nodo': se entrega a quien la pidió
+                if cont is None:
+                    return nodo
+                tipo = cont[0]
+                hecho = cont
+                operandos, operadores, relop, cont = marcos.pop()
+                if tipo == 'paren':
+                    self.match(TokenType.RPAREN)
+                    estado = _OPERANDO
+                elif tipo == 'indice':
+                    _, name, inicio = hecho
+                    self.match(TokenType.RBRACKET)
+                    var_node = self.nodo('var', name, inicio)
+                    var_node.add(nodo)
+                    nodo = self.cierra(var_node)
+                    estado = _OPERANDO
+                elif tipo == 'arg':
+                    _, call, args, arg_list = hecho
+                    arg_list.add(nodo)
+                    if self.token == TokenType.COMMA:
+                        self.advance()
+                        marcos.append((operandos, operadores, relop, cont))
+                        operandos, operadores, relop, cont = [], [], False, hecho
+                        estado = _FACTOR
+                    else:
+                        args.add(self.cierra(arg_list))
+                        self.cierra(args)
+                        call.add(args)
+                        self.match(TokenType.RPAREN)
+                        nodo = self.cierra(call)
+                        estado = _OPERANDO
+                else:
+                    # 'asigna': el lado derecho terminó; assign completa la expresión de afuera
+                    var_node = hecho[1]
+                    assign = self.nodo('assign', var_node.lexeme, var_node.inicio)
+                    if var_node.children:  # Array assignment: var[index] = value
+                        assign.add(nodo)                  # Add value FIRST
+                        assign.add(var_node.children[0])  # Add index SECOND
+                    else:  # Simple assignment: var = value
+                        assign.add(nodo)
+                    nodo = self.cierra(assign)
+                    estado = _COMPLETA
+
+
+TABLA, DEFECTO = construir_tabla(ParserLL1)
@@ -0,0 +1,246 @@
+# plegado.py
+# Plegado de constantes y simplificación algebraica sobre el AST ya chequeado
+# por la semántica. plegar() no toca el árbol (sirve igual para ASTNode y para
+# NodoColumnar): devuelve un dict nodo original -> expresión equivalente, con
+# nodos ASTNode nuevos donde hizo falta, y cgen e ir.py traducen el reemplazo
+# en lugar del original (ver GeneradorCodigo._expresion).
+#
+# - Un addop, mulop o relop con los dos operandos constantes se pliega a un
+#   NUM con la aritmética de MIPS: enteros de 32 bits que dan la vuelta, y la
+#   división trunca hacia cero (x/0 y -2^31/-1 quedan para la ejecución).
+# - Identidades: x+0, x-0, x*1, x/1 -> x; x*0 -> 0 y x-x -> 0 (si x no tiene
+#   efectos: sin llamadas ni asignaciones); x==x, x<=x, x>=x -> 1 y x!=x, x<x,
+#   x>x -> 0 (también sin efectos).
+# - En una cadena de sumas y restas (a + 1 + b + 2) o de productos
+#   (2 * a * 3) las constantes se juntan al final (a + b + 3, a * 6) y los
+#   demás términos quedan en su orden, así que los efectos no cambian. En
+#   una suma, x - x se quita sólo si ningún término de la cadena tiene
+#   efectos: en a + (a = 1) - a las dos 'a' valen distinto.
+#
+# El recorrido es iterativo, así que no tiene límite de profundidad.
+
+from parser import ASTNode
+
+_MIN, _MAX = -2 ** 31, 2 ** 31 - 1
+
+_OPERACIONES = frozenset(('addop', 'mulop', 'relop'))
+
+# relop con los dos operandos iguales (y sin efectos)
+_REFLEXIVOS = {'==': 1, '<=': 1, '>=': 1, '!=': 0, '<': 0, '>': 0}
+
+
+def _envolver(v):
+    # Entero de 32 bits con signo, como queda en un registro
+    return (v - _MIN) % 2 ** 32 + _MIN
+
+
+def _valor(node):
+    """El valor de un NUM (None si no es uno o no cabe en 32 bits)."""
+    if node.kind != 'NUM':
+        return None
+    v = int(node.lexeme)
+    return v if _MIN <= v <= _MAX else None
+
+
+def operar(op, a, b):
+    """'a op b' como en MIPS, o None si no se puede saber sin ejecutar."""
+    if op == '+':
+        return _envolver(a + b)
+    if op == '-':
+        return _envolver(a - b)
+    if op == '*':
+        return _envolver(a * b)
+    if op == '/':
+        if b == 0 or (a == _MIN and b == -1):
+            return None
+        q = abs(a) // abs(b)
+        return -q if (a < 0) != (b < 0) else q
+    if op == '<':
+        return int(a < b)
+    if op == '<=':
+        return int(a <= b)
+    if op == '>':
+        return int(a > b)
+    if op == '>=':
+        return int(a >= b)
+    if op == '==':
+        return int(a == b)
+    return int(a != b)
+
+
+def _nuevo(kind, lexeme, modelo, hijos=()):
+    n = ASTNode(kind, lexeme, modelo.lineno, modelo.inicio, modelo.fin)
+    n.children = list(hijos)
+    n.type = 'int'
+    return n
+
+
+def _numero(v, modelo):
+    return _nuevo('NUM', str(v), modelo)
+
+
+def _puro(node):
+    """¿'node' se puede quitar o repetir sin que se note (sin call ni assign)?"""
+    pila = [node]
+    while pila:
+        n = pila.pop()
+        if n.kind in ('call', 'assign'):
+            return False
+        pila.extend(n.children)
+    return True
+
+
+def _iguales(x, y):
+    """¿Los subárboles 'x' e 'y' son la misma expresión (kinds, lexemas y forma)?"""
+    pila = [(x, y)]
+    while pila:
+        a, b = pila.pop()
+        if a.kind != b.kind or a.lexeme != b.lexeme or len(a.children) != len(b.children):
+            return False
+        pila.extend(zip(a.children, b.children))
+    return True
+
+
+def _en_cadena(padre, hijo):
+    # ¿'hijo' es parte de la cadena de 'padre' (sumas y restas, o productos)?
+    if hijo.kind != padre.kind:
+        return False
+    return hijo.kind == 'addop' or (hijo.lexeme == '*' and padre.lexeme == '*')
+
+
+def _terminos(raiz, plegados):
+    """(signo, término) de la cadena de 'raiz', de izquierda a derecha."""
+    terminos = []
+    pila = [(raiz, 1)]
+    while pila:
+        n, signo = pila.pop()
+        if n is raiz or _en_cadena(raiz, n):
+            izq, der = n.children
+            pila.append((der, -signo if n.lexeme == '-' else signo))
+            pila.append((izq, signo))
+        else:
+            terminos.append((signo, plegados.get(n, n)))
+    return terminos
+
+
+def _cancelar(terminos):
+    # x - x: un término que aparece sumado y restado se va (todos los de
+    # 'terminos' sin efectos, así que ninguno cambia lo que vale otro)
+    quedan = list(terminos)
+    k = 0
+    while k < len(quedan):
+        signo, t = quedan[k]
+        for j in range(k + 1, len(quedan)):
+            s, u = quedan[j]
+            if s != signo and _iguales(t, u):
+                del quedan[j], quedan[k]
+                break
+        else:
+            k += 1
+    return quedan
+
+
+def _suma(raiz, plegados):
+    # Cadena de sumas y restas: las constantes se juntan en una al final
+    terminos = _terminos(raiz, plegados)
+    constante, constantes, otros = 0, 0, []
+    for signo, t in terminos:
+        v = _valor(t)
+        if v is None:
+            otros.append((signo, t))
+        else:
+            constante = _envolver(constante + signo * v)
+            constantes += 1
+    if (len(otros) > 1 and any(s > 0 for s, _ in otros) and any(s < 0 for s, _ in otros)
+            and all(_puro(t) for _, t in otros)):
+        quedan = _cancelar(otros)
+    else:
+        quedan = otros
+    if not quedan:
+        return _numero(constante, raiz)
+    if len(quedan) == len(otros) and constantes <= 1 and (
+            constante != 0 or constantes == 0 or otros[0][0] < 0):
+        return None     # nada que juntar ni quitar
+    signo, acumulado = quedan[0]
+    if signo < 0:
+        acumulado = _nuevo('addop', '-', raiz, (_numero(constante, raiz), acumulado))
+        constante = 0
+    for signo, t in quedan[1:]:
+        acumulado = _nuevo('addop', '+' if signo > 0 else '-', raiz, (acumulado, t))
+    if constante > 0 or constante == _MIN:
+        acumulado = _nuevo('addop', '+', raiz, (acumulado, _numero(constante, raiz)))
+    elif constante < 0:
+        acumulado = _nuevo('addop', '-', raiz, (acumulado, _numero(-constante, raiz)))
+    return acumulado
+
+
+def _producto(raiz, plegados):
+    # Cadena de productos: las constantes se juntan en una al final
+    factores = [t for _, t in _terminos(raiz, plegados)]
+    constante, constantes, otros = 1, 0, []
+    for t in factores:
+        v = _valor(t)
+        if v is None:
+            otros.append(t)
+        else:
+            constante = _envolver(constante * v)
+            constantes += 1
+    if not otros or (constante == 0 and all(map(_puro, otros))):
+        return _numero(constante, raiz)
+    if constantes == 0 or (constantes == 1 and constante != 1):
+        return None     # nada que juntar ni quitar
+    acumulado = otros[0]
+    for t in otros[1:]:
+        acumulado = _nuevo('mulop', '*', raiz, (acumulado, t))
+    if constante != 1:
+        acumulado = _nuevo('mulop', '*', raiz, (acumulado, _numero(constante, raiz)))
+    return acumulado
+
+
+def _simplificar(node, plegados):
+    """La expresión equivalente a 'node' (addop, mulop o relop), o None si no cambia."""
+    if node.kind == 'addop':
+        return _suma(node, plegados)
+    if node.kind == 'mulop' and node.lexeme == '*':
+        return _producto(node, plegados)
+    izq, der = (plegados.get(h, h) for h in node.children)
+    a, b = _valor(izq), _valor(der)
+    if a is not None and b is not None:
+        v = operar(node.lexeme, a, b)
+        return None if v is None else _numero(v, node)
+    if node.kind == 'mulop':            # división
+        if b == 1:
+            return izq
+    elif _iguales(izq, der) and _puro(izq):
+        return _numero(_REFLEXIVOS[node.lexeme], node)
+    return None
+
+
+def plegar(raiz):
+    """
+    Dict nodo -> expresión simplificada para cada addop, mulop y relop del
+    subárbol de 'raiz' (normalmente una fun_decl) que cambia.
+    """
+    # Las operaciones en preorden; al revés, los operandos se simplifican
+    # antes que la operación. Los nodos de adentro de una cadena no se
+    # simplifican solos: lo hace la punta
+    operaciones = []
+    interiores = set()
+    pila = [raiz]
+    while pila:
+        n = pila.pop()
+        hijos = n.children
+        if hijos:
+            pila.extend(hijos)
+            if n.kind in _OPERACIONES and len(hijos) == 2:
+                operaciones.append(n)
+                for h in hijos:
+                    if _en_cadena(n, h):
+                        interiores.add(h)
+    plegados = {}
+    for n in reversed(operaciones):
+        if n not in interiores:
+            nuevo = _simplificar(n, plegados)
+            if nuevo is not None:
+                plegados[n] = nuevo
+    return plegados
@@ -0,0 +1,98 @@
+# recorrido.py
+# Motor común para las pasadas sobre el AST (semántica, generación de código).
+# Ninguna forma de recorrido usa la recursión de Python, así que la profundidad
+# del árbol no está limitada por sys.getrecursionlimit(), y el comportamiento
+# de cada kind se elige con una tabla kind -> handler en lugar de comparar
+# node.kind contra cadenas.
+#
+# Hay dos formas de escribir una pasada:
+#
+# - Recorrido.recorrer(raiz): preorden + postorden con pila explícita. La
+#   clase define PRE y POST (dict kind -> función(self, nodo)); los kinds sin
+#   entrada no hacen nada. Una pasada nueva es una subclase con sus tablas:
+#
+#       class ContarLlamadas(Recorrido):
+#           def _llamada(self, nodo):
+#               self.n += 1
+#           PRE = {'call': _llamada}
+#
+# - ejecutar(paso): para pasadas que tienen que intercalar trabajo entre los
+#   hijos o pasar valores de un hijo al padre (cgen devuelve el registro de
+#   cada expresión). Un handler que es un generador hace 'r = yield paso' con
+#   el resultado de llamar a otro handler: ejecutar() corre ese paso y le
+#   devuelve su resultado. Un handler común (no generador) devuelve el
+#   resultado directamente. El handler de un nodo se elige con una tabla:
+#   tabla.get(nodo.kind, tabla[None]), con None para los kinds no previstos.
+
+from types import GeneratorType
+
+# Un handler de PRE que devuelve SALTAR hace que no se recorran los hijos del
+# nodo ni se llame a su handler de POST
+SALTAR = object()
+
+
+def ejecutar(paso):
+    """
+    Corre 'paso' (lo que devolvió un handler) con una pila de generadores y
+    devuelve su resultado. Si no es un generador, el resultado es él mismo.
+    """
+    if type(paso) is not GeneratorType:
+        return paso
+    pila = [paso]
+    envio = None
+    while pila:
+        try:
+            paso = pila[-1].send(envio)
+        except StopIteration as fin:
+            pila.pop()
+            envio = fin.value
+            continue
+        if type(paso) is GeneratorType:
+            pila.append(paso)
+            envio = None
+        else:
+            envio = paso
+    return envio
+
+
+class Recorrido:
+    PRE = {}
+    POST = {}
+
+    def recorrer(self, raiz):
+        """Preorden + postorden de 'raiz' con las tablas PRE y POST."""
+        pre, post = self.PRE, self.POST
+        # Nodos por entrar y, debajo de sus hijos, (handler de POST, nodo)
+        pila = [raiz]
+        pop, append, extend = pila.pop, pila.append, pila.extend
+        while pila:
+            nodo = pop()
+            if nodo.__class__ is tuple:
+                h, nodo = nodo
+                h(self, nodo)
+                continue
+            kind = nodo.kind
+            h = pre.get(kind)
+            if h is not None and h(self, nodo) is SALTAR:
+                continue
+            hijos = nodo.children
+            h = post.get(kind)
+            if hijos:
+                if h is not None:
+                    append((h, nodo))
+                extend(reversed(hijos))
+            elif h is not None:
+                # Hoja: el postorden va enseguida
+                h(self, nodo)
+
+
+def preorden(nodo):
+    """Lista con los nodos del subárbol de 'nodo' en preorden, sin recursión."""
+    res = []
+    pila = [nodo]
+    pop, extend, agregar = pila.pop, pila.extend, res.append
+    while pila:
+        n = pop()
+        agregar(n)
+        extend(n.children[::-1])
+    return res
@@ -0,0 +1,190 @@
+# referencias.py
+# Índice de referencias cruzadas que arma la semántica. Cada símbolo declarado
+# recibe un número y cada aparición (la declaración y cada uso) es una fila de
+# arreglos tipados que sólo crecen: símbolo, línea, offset y siguiente aparición
+# del mismo símbolo. Con eso se responde "¿dónde se usa X?", "¿qué se nombra en
+# la línea N?" y "¿qué declara este ámbito?" sin una lista por símbolo.
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class IndiceReferencias:
+    """
+    Los símbolos (SymbolInfoExtended) guardan su número, su ámbito y la primera
+    y última de sus apariciones; las apariciones de un símbolo forman una lista
+    enlazada por 'siguiente', como los hijos en arbol.ArbolColumnar. El ámbito
+    0 es el global; cada ámbito guarda su nivel y el ámbito que lo contiene.
+    """
+    def __init__(self):
+        self.simbolos  = []            # número -> SymbolInfoExtended
+        self.ambitos   = []            # número -> (nivel, ámbito padre)
+        self._de_ambito = []           # número de ámbito -> array de números de símbolo
+        # Una fila por aparición
+        self.simbolo   = array('i')
+        self.linea     = array('i')
+        self.offset    = array('q')    # -1: sin offset (p. ej. input y output)
+        self.siguiente = array('i')
+        # Se arman en la primera consulta que los necesita
+        self._por_linea = None         # apariciones ordenadas por línea
+        self._por_nombre = None        # nombre -> números de símbolo
+        self.nuevo_ambito(0)
+
+    def __len__(self):
+        return len(self.simbolo)
+
+    # Carga (la hace AnalizadorSemantico)
+
+    def nuevo_ambito(self, nivel, padre=-1):
+        self.ambitos.append((nivel, padre))
+        self._de_ambito.append(array('i'))
+        return len(self.ambitos) - 1
+
+    def declarar(self, info, ambito, offset=None):
+        """Da de alta 'info' en 'ambito'; su declaración es la primera aparición."""
+        info.id = len(self.simbolos)
+        info.ambito = ambito
+        info.primer_uso = info.ultimo_uso = -1
+        self.simbolos.append(info)
+        self._de_ambito[ambito].append(info.id)
+        self._por_nombre = None
+        self.usar(info, info.declared_at, offset)
+
+    def usar(self, info, linea, offset=None):
+        i = len(self.simbolo)
+        self.simbolo.append(info.id)
+        self.linea.append(linea)
+        self.offset.append(-1 if offset is None else offset)
+        self.siguiente.append(-1)
+        if info.ultimo_uso < 0:
+            info.primer_uso = i
+        else:
+            self.siguiente[info.ultimo_uso] = i
+        info.ultimo_uso = i
+        self._por_linea = None
+
+    def anexar(self, otro, n_globales, globales, numeros=None, d_linea=0, d_offset=0):
+        """
+        Copia al final las apariciones y los ámbitos de 'otro', el índice de una
+        función armado en otro proceso (ver paralelo.py) o guardado en la caché
+        (ver cache_funciones.py). En 'otro' los números de símbolo menores que
+        'n_globales' son globales: los mismos de este índice o, si se da
+        'numeros', numeros[k] aquí; 'otro.simbolos' sólo tiene los locales.
+        'globales' es (número aquí, primera, última aparición en 'otro') de cada
+        global que usa, para empalmar sus cadenas con las de aquí. Las líneas y
+        los offsets de 'otro' se corren d_linea y d_offset.
+        """
+        base_fila = len(self.simbolo)
+        base_sim = len(self.simbolos) - n_globales
+        base_amb = len(self.ambitos) - 1
+        if numeros is None:
+            self.simbolo.extend([v if v < n_globales else v + base_sim for v in otro.simbolo])
+        else:
+            self.simbolo.extend([numeros[v] if v < n_globales else v + base_sim
+                                 for v in otro.simbolo])
+        self.linea.extend(otro.linea if not d_linea else [v + d_linea for v in otro.linea])
+        self.offset.extend(otro.offset if not d_offset else
+                           [v + d_offset if v >= 0 else -1 for v in otro.offset])
+        self.siguiente.extend([v + base_fila if v >= 0 else -1 for v in otro.siguiente])
+        for nivel, padre in otro.ambitos[1:]:
+            self.ambitos.append((nivel, padre + base_amb if padre > 0 else padre))
+        for ids in otro._de_ambito[1:]:
+            self._de_ambito.append(array('i', [v + base_sim for v in ids]))
+        for info in otro.simbolos:
+            info.id += base_sim
+            info.ambito += base_amb
+            info.primer_uso += base_fila
+            info.ultimo_uso += base_fila
+            self.simbolos.append(info)
+        for numero, primera, ultima in globales:
+            info = self.simbolos[numero]
+            if info.ultimo_uso < 0:
+                info.primer_uso = primera + base_fila
+            else:
+                self.siguiente[info.ultimo_uso] = primera + base_fila
+            info.ultimo_uso = ultima + base_fila
+        self._por_linea = self._por_nombre = None
+
+    # Consultas por símbolo
+
+    def apariciones(self, info):
+        """Números de aparición de 'info', en el orden en que se anotaron."""
+        siguiente = self.siguiente
+        i = info.primer_uso
+        while i >= 0:
+            yield i
+            i = siguiente[i]
+
+    def lineas(self, info):
+        """Líneas donde aparece 'info', sin repetir y en orden creciente."""
+        linea = self.linea
+        previa = -1
+        for i in self.apariciones(info):
+            if linea[i] < previa:
+                # Fuera de orden (p. ej. una función usada en una línea anterior
+                # a su declaración): sólo aquí hace falta ordenar
+                yield from sorted({linea[j] for j in self.apariciones(info)})
+                return
+            previa = linea[i]
+        previa = -1
+        for i in self.apariciones(info):
+            if linea[i] != previa:
+                previa = linea[i]
+                yield previa
+
+    def usos(self, info):
+        """(línea, offset) de cada aparición de 'info' (offset None si no tiene)."""
+        linea, offset = self.linea, self.offset
+        for i in self.apariciones(info):
+            yield linea[i], (None if offset[i] < 0 else offset[i])
+
+    def simbolos_llamados(self, nombre):
+        """Todos los símbolos declarados con ese nombre, en orden de declaración."""
+        if self._por_nombre is None:
+            por_nombre = {}
+            for s in self.simbolos:
+                por_nombre.setdefault(s.name, array('i')).append(s.id)
+            self._por_nombre = por_nombre
+        return [self.simbolos[i] for i in self._por_nombre.get(nombre, ())]
+
+    # Consultas por línea
+
+    def _orden_por_linea(self):
+        if self._por_linea is None or len(self._por_linea) != len(self.simbolo):
+            self._por_linea = array('i', sorted(range(len(self.simbolo)), key=self.linea.__getitem__))
+        return self._por_linea
+
+    def en_lineas(self, desde, hasta=None):
+        """
+        (símbolo, línea, offset) de las apariciones en las líneas [desde, hasta]
+        (sólo 'desde' si hasta es None), por línea y en orden de anotación.
+        """
+        orden = self._orden_por_linea()
+        clave = self.linea.__getitem__
+        a = bisect_left(orden, desde, key=clave)
+        b = bisect_right(orden, desde if hasta is None else hasta, key=clave)
+        simbolos, simbolo, linea, offset = self.simbolos, self.simbolo, self.linea, self.offset
+        for i in orden[a:b]:
+            yield simbolos[simbolo[i]], linea[i], (None if offset[i] < 0 else offset[i])
+
+    # Consultas por ámbito
+
+    def simbolos_de(self, ambito):
+        """Símbolos declarados en 'ambito', en orden de declaración."""
+        simbolos = self.simbolos
+        for i in self._de_ambito[ambito]:
+            yield simbolos[i]
+
+    def ambitos_dentro(self, ambito):
+        """Ámbitos contenidos (a cualquier profundidad) en 'ambito', incluido él."""
+        dentro = {ambito}
+        for i in range(ambito + 1, len(self.ambitos)):
+            # Los ámbitos se numeran al abrirse: el padre siempre es anterior
+            if self.ambitos[i][1] in dentro:
+                dentro.add(i)
+        return sorted(dentro)
+
+    def memoria(self):
+        """Bytes de los arreglos de apariciones."""
+        return sum(a.itemsize * len(a) for a in (self.simbolo, self.linea, self.offset,
+                                                 self.siguiente))
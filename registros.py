@@ -0,0 +1,206 @@
+# registros.py
+# Asignación de registros para cgen. cgen traduce cada función con registros
+# virtuales (uno nuevo por cada valor que calcula, escritos '\1N\1' como las
+# etiquetas '\0k\0' de EmisorPlantilla) y asignar() los reparte entre $t0-$t7
+# y $s0-$s7 con linear scan:
+#
+# - El intervalo de un virtual va de su primera a su última aparición en el
+#   texto de la función, contando apariciones: texto.split('\1') deja los
+#   virtuales en las posiciones impares, en orden. cgen no deja ningún valor
+#   vivo a través de una etiqueta (ver GeneradorCodigo._etiqueta), así que el
+#   orden del texto basta.
+# - Un intervalo que cruza un jal prefiere un $s (lo guarda la función llamada,
+#   una vez en su prólogo); si le toca un $t, se guarda en el marco antes del
+#   jal y se recupera después.
+# - Sin registros libres se derrama el intervalo que termina más tarde (el
+#   nuevo o uno activo): vive en un lugar del marco y cada instrucción que lo usa
+#   lo carga en $t8 o $t9 antes, y lo guarda después si lo escribe.
+#
+# Los lugares del marco (guardados de $s, de $t y derrames) van debajo de los
+# locales, en offsets negativos desde $fp; la función los reserva en su prólogo.
+
+import re
+from bisect import bisect_left, bisect_right
+
+TEMPORALES = tuple(f"$t{k}" for k in range(8))
+GUARDADOS = tuple(f"$s{k}" for k in range(8))
+AUXILIARES = ('$t8', '$t9')   # para los virtuales derramados
+
+_LLAMADA = re.compile(r'\njal [^\n]*')
+
+# Instrucciones cuyo primer operando es el que se escribe
+ESCRIBEN = frozenset(('li', 'la', 'lw', 'move', 'add', 'addu', 'sub', 'subu', 'addi', 'addiu',
+                      'mul', 'mflo', 'mfhi', 'sll', 'sra', 'slt', 'slti', 'sltu', 'xori',
+                      'andi', 'seq', 'sne', 'sgt', 'sge', 'sle'))
+
+
+class Intervalo:
+    __slots__ = ('virtual', 'inicio', 'fin', 'registro', 'lugar')
+
+    def __init__(self, virtual, inicio, fin):
+        self.virtual = virtual
+        self.inicio = inicio
+        self.fin = fin
+        self.registro = None      # físico, o None si se derramó
+        self.lugar = None         # offset desde $fp si se derramó
+
+
+class Asignacion:
+    """
+    Resultado de asignar(): el texto con registros físicos (líneas separadas
+    por '\\n', sin el último), los bytes que usa en el marco debajo de 'base'
+    y los pares ($sN, offset) que la función tiene que guardar en su prólogo y
+    recuperar en su epílogo.
+    """
+    __slots__ = ('texto', 'marco', 'guardados')
+
+
+def _escribe(antes):
+    # ¿El virtual que sigue a 'antes' (el texto desde la aparición anterior)
+    # es el primer operando de una instrucción que lo escribe?
+    op = antes[antes.rfind('\n') + 1:]
+    return op[-1:] == ' ' and op[:-1] in ESCRIBEN
+
+
+def _intervalos(partes):
+    """
+    Intervalos de los virtuales (por número, como texto) y posiciones de los
+    jal en las partes de texto.split('\\1'). La aparición j está en la
+    posición 4j, el final de su línea en 4j+1 y un jal entre las apariciones
+    j-1 y j en 4j-2.
+    """
+    virtuales = partes[1::2]
+    n = len(virtuales)
+    # dict() se queda con el último valor de cada clave
+    ultima = dict(zip(virtuales, range(0, 4 * n, 4)))
+    primera = dict(zip(reversed(virtuales), range(4 * n - 4, -1, -4)))
+    intervalos = {}
+    for v, p in primera.items():
+        j = p >> 2
+        if _escribe(partes[2 * j]):
+            # La instrucción lee sus operandos antes de escribir: el intervalo
+            # empieza al final de la línea y puede tomar el registro de uno que
+            # se lee ahí por última vez
+            while j + 1 < n and '\n' not in partes[2 * j + 2]:
+                j += 1
+            p = 4 * j + 1
+        intervalos[v] = Intervalo(v, p, ultima[v])
+    llamadas = [4 * j - 2 for j in range(n + 1) if '\njal ' in partes[2 * j]]
+    return intervalos, llamadas
+
+
+def _cruza(it, llamadas):
+    # ¿Hay un jal dentro del intervalo?
+    k = bisect_right(llamadas, it.inicio)
+    return k < len(llamadas) and llamadas[k] < it.fin
+
+
+def asignar(lineas, base):
+    """
+    Asigna registros físicos a los virtuales de 'lineas' (el cuerpo de una
+    función). 'base' son los bytes del marco que ya usan los locales.
+    """
+    # Con un '\n' delante, un jal en la primera línea es como los demás
+    partes = ('\n' + '\n'.join(lineas)).split('\1')
+    intervalos, llamadas = _intervalos(partes)
+    libres_t, libres_s = list(TEMPORALES[::-1]), list(GUARDADOS[::-1])
+    activos, fines = [], []     # ordenados por fin
+    derramados = []
+    usados_s = set()
+    for it in sorted(intervalos.values(), key=lambda it: it.inicio):
+        # Liberar los que ya terminaron
+        while fines and fines[0] < it.inicio:
+            del fines[0]
+            viejo = activos.pop(0)
+            (libres_s if viejo.registro in GUARDADOS else libres_t).append(viejo.registro)
+        if llamadas and _cruza(it, llamadas):
+            preferidos, otros = libres_s, libres_t
+        else:
+            preferidos, otros = libres_t, libres_s
+        if preferidos or otros:
+            it.registro = (preferidos or otros).pop()
+        elif activos[-1].fin > it.fin:
+            # Se derrama el activo que termina más tarde y el nuevo usa su registro
+            ultimo = activos.pop()
+            fines.pop()
+            it.registro, ultimo.registro = ultimo.registro, None
+            derramados.append(ultimo)
+        else:
+            derramados.append(it)
+            continue
+        if it.registro in GUARDADOS:
+            usados_s.add(it.registro)
+        k = bisect_left(fines, it.fin)
+        fines.insert(k, it.fin)
+        activos.insert(k, it)
+
+    # Lugares en el marco: guardados de $s, de $t alrededor de los jal y derrames
+    lugar = -base
+    guardados = []
+    for r in sorted(usados_s):
+        lugar -= 4
+        guardados.append((r, lugar))
+    alrededor = {}    # parte con el jal -> $t que hay que guardar
+    lugar_t = {}
+    for it in intervalos.values() if llamadas else ():
+        if it.registro in TEMPORALES and _cruza(it, llamadas):
+            if it.registro not in lugar_t:
+                lugar -= 4
+                lugar_t[it.registro] = lugar
+            k = bisect_right(llamadas, it.inicio)
+            while k < len(llamadas) and llamadas[k] < it.fin:
+                alrededor.setdefault((llamadas[k] + 2) >> 1, set()).add(it.registro)
+                k += 1
+    for it in derramados:
+        lugar -= 4
+        it.lugar = lugar
+
+    # Reescritura: cada virtual por su registro (los derramados quedan marcados
+    # para _derrames) y los $t guardados alrededor de sus jal
+    partes[1::2] = [intervalos[v].registro or f"\1{v}\1" for v in partes[1::2]]
+    for i, regs in alrededor.items():
+        regs = sorted(regs)
+        antes = ''.join(f"\nsw {r}, {lugar_t[r]}($fp)  # Se guarda alrededor del jal"
+                        for r in regs)
+        despues = ''.join(f"\nlw {r}, {lugar_t[r]}($fp)" for r in regs)
+        partes[i] = _LLAMADA.sub(lambda m: antes + m[0] + despues, partes[i])
+    texto = ''.join(partes)[1:]
+    if derramados:
+        texto = _derrames(texto, intervalos)
+    a = Asignacion()
+    a.texto = texto
+    a.marco = -base - lugar
+    a.guardados = guardados
+    return a
+
+
+def _derrames(texto, intervalos):
+    # Las instrucciones con virtuales derramados los cargan en $t8/$t9 antes y
+    # guardan después el que escriben; en un comentario se muestra su lugar
+    nuevas = []
+    agregar = nuevas.append
+    for linea in texto.split('\n'):
+        if '\1' not in linea:
+            agregar(linea)
+            continue
+        partes = linea.split('\1')
+        if linea[0] == '#':
+            partes[1::2] = [f"{intervalos[v].lugar}($fp)" for v in partes[1::2]]
+            agregar(''.join(partes))
+            continue
+        auxiliar = {}
+        escrito = None
+        for j in range(1, len(partes), 2):
+            v = partes[j]
+            if j == 1 and _escribe(partes[0]):
+                escrito = v
+            elif v not in auxiliar:
+                auxiliar[v] = AUXILIARES[len(auxiliar)]
+                agregar(f"lw {auxiliar[v]}, {intervalos[v].lugar}($fp)")
+        if escrito is not None and escrito not in auxiliar:
+            auxiliar[escrito] = AUXILIARES[0]
+        partes[1::2] = [auxiliar[v] for v in partes[1::2]]
+        agregar(''.join(partes))
+        if escrito is not None:
+            agregar(f"sw {auxiliar[escrito]}, {intervalos[escrito].lugar}($fp)")
+    return '\n'.join(nuevas)
@@ -0,0 +1,143 @@
+# seleccion.py
+# Selección de instrucciones: el MIPS de una FuncionIR (ir.py). Cada
+# instrucción del IR da unas pocas de MIPS con los temporales como registros
+# virtuales ('\1N\1', ver registros.py); el prólogo, el marco, la asignación
+# de registros y el epílogo son los de cgen (gen_prologo y gen_epilogo).
+#
+# Los bloques salen en el orden de la FuncionIR, cada uno (salvo la entrada)
+# con una etiqueta nueva de emitter.new_label y su prefijo. Un salto al bloque
+# que sigue no se emite, y un 'branch' salta con beq o bne según cuál de sus
+# destinos es el siguiente. Si la condición es una comparación que sólo lee
+# el branch, no se arma el 1 o 0: se salta con la comparación misma (blt,
+# bge, ...; ver _SALTOS).
+
+import cgen
+from ir import texto
+
+
+def _r(t):
+    return f"\1{t}\1"
+
+
+def _memoria(base, offset):
+    return f"{offset}($fp)" if base is None else f"{offset}({_r(base)})"
+
+
+# Instrucciones de una operación binaria; d, a y b son los registros
+_BINARIAS = {
+    'add': ("add {d}, {a}, {b}",),
+    'sub': ("sub {d}, {a}, {b}",),
+    'mul': ("mul {d}, {a}, {b}",),
+    'div': ("div {a}, {b}", "mflo {d}"),
+    'slt': ("slt {d}, {a}, {b}",),
+    'sgt': ("slt {d}, {b}, {a}",),
+    'sle': ("slt {d}, {b}, {a}", "xori {d}, {d}, 1"),
+    'sge': ("slt {d}, {a}, {b}", "xori {d}, {d}, 1"),
+    'seq': ("seq {d}, {a}, {b}",),
+    'sne': ("sne {d}, {a}, {b}",),
+}
+
+# Saltos de cada comparación: (si se cumple, si no se cumple)
+_SALTOS = {
+    'slt': ('blt', 'bge'),
+    'sgt': ('bgt', 'ble'),
+    'sle': ('ble', 'bgt'),
+    'sge': ('bge', 'blt'),
+    'seq': ('beq', 'bne'),
+    'sne': ('bne', 'beq'),
+}
+
+
+def _comparacion_del_salto(bloque):
+    # La comparación justo antes del branch final de 'bloque' si nadie más
+    # lee su resultado (los temporales no salen del bloque), o None
+    instrucciones = bloque.instrucciones
+    if len(instrucciones) < 2:
+        return None
+    salto, comparacion = instrucciones[-1], instrucciones[-2]
+    if (salto.op != 'branch' or comparacion.op not in _SALTOS
+            or salto.a != comparacion.dst):
+        return None
+    for i in instrucciones[:-1]:
+        if comparacion.dst in i.usos():
+            return None
+    return comparacion
+
+
+def seleccionar(funcion, gen, emitter):
+    """Emite el MIPS de 'funcion' con 'emitter'; 'gen' es el GeneradorCodigo."""
+    nombre = funcion.nombre
+    gen.current_function_name = nombre
+    inicio = gen.gen_prologo(nombre, emitter)
+    emit = emitter.emit
+    comentar = emitter.nivel == cgen.DEBUG
+    bloques = funcion.bloques
+    etiquetas = {b: emitter.new_label(b.prefijo) for b in bloques[1:]}
+    epilogo = f"{nombre}_epilogue"
+    for k, bloque in enumerate(bloques):
+        siguiente = bloques[k + 1] if k + 1 < len(bloques) else None
+        if k:
+            emit(f"{etiquetas[bloque]}:")
+        comparacion = _comparacion_del_salto(bloque)
+        for i in bloque.instrucciones:
+            if comentar:
+                emitter.emit_comment(texto(i))
+            op = i.op
+            if i is comparacion:
+                continue        # la traduce el branch
+            if op in _BINARIAS:
+                d, a, b = _r(i.dst), _r(i.a), _r(i.b)
+                for patron in _BINARIAS[op]:
+                    emit(patron.format(d=d, a=a, b=b))
+            elif op == 'li':
+                emit(f"li {_r(i.dst)}, {i.a}")
+            elif op == 'mov':
+                emit(f"move {_r(i.dst)}, {_r(i.a)}")
+            elif op == 'sll':
+                emit(f"sll {_r(i.dst)}, {_r(i.a)}, {i.b}")
+            elif op == 'load':
+                emit(f"lw {_r(i.dst)}, {_memoria(i.a, i.b)}")
+            elif op == 'store':
+                emit(f"sw {_r(i.a)}, {_memoria(i.b, i.c)}")
+            elif op == 'addr':
+                emit(f"addi {_r(i.dst)}, $fp, {i.a}")
+            elif op == 'arg':
+                emit("addi $sp, $sp, -4")
+                emit(f"sw {_r(i.a)}, 0($sp)")
+            elif op == 'call':
+                emit(f"jal {i.a}")
+                if i.b:
+                    emit(f"addi $sp, $sp, {4 * i.b}")
+                emit(f"move {_r(i.dst)}, $v0")
+            elif op == 'input':
+                emit("li $v0, 5")
+                emit("syscall")
+                emit(f"move {_r(i.dst)}, $v0")
+            elif op == 'output':
+                emit(f"move $a0, {_r(i.a)}")
+                emit("li $v0, 1")
+                emit("syscall")
+                emit("la $a0, newline")
+                emit("li $v0, 4")
+                emit("syscall")
+            elif op == 'jump':
+                if i.a is not siguiente:
+                    emit(f"j {etiquetas[i.a]}")
+            elif op == 'branch':
+                if comparacion is None:
+                    si, no, a, b = 'bne', 'beq', _r(i.a), '$zero'
+                else:
+                    (si, no), a, b = (_SALTOS[comparacion.op], _r(comparacion.a),
+                                      _r(comparacion.b))
+                if i.c is siguiente:
+                    emit(f"{si} {a}, {b}, {etiquetas[i.b]}")
+                else:
+                    emit(f"{no} {a}, {b}, {etiquetas[i.c]}")
+                    if i.b is not siguiente:
+                        emit(f"j {etiquetas[i.b]}")
+            elif op == 'ret':
+                if i.a is not None:
+                    emit(f"move $v0, {_r(i.a)}")
+                if siguiente is not None:
+                    emit(f"j {epilogo}")
+    gen.gen_epilogo(nombre, funcion.marco, inicio, emitter)
@@ -1,407 +1,624 @@
 from globalTypes import *
 import parser
+from arbol import Ligadura
+from diagnosticos import AnalisisDetenido
+from referencias import IndiceReferencias
+from recorrido import Recorrido, SALTAR
 
 
-# Estado global del semántico
+# Marco de una función (el mismo que arma cgen): los parámetros empiezan en
+# 8($fp), encima de $fp y $ra guardados, y los locales bajan desde $fp en el
+# orden en que se declaran, una palabra por elemento
+PRIMER_PARAMETRO = 8
+PALABRA = 4
 
-tipoError_ocurrido = False     # ¿Ya detectamos algún error?
-depth = []                     # Pila de ámbitos: cada elemento es un dict name→SymbolInfoExtended
-current_func_ret = []          # Stack de tipos de retorno de la función activa
 
-
-# Reportar errores semánticos con contexto y caret
-
-def semanticError(node, message):
-    """
-    Cuando detectamos un error:
-      1) Marcamos el flag
-      2) Sacamos línea y texto original
-      3) Imprimimos mensaje y '^' debajo del lexema
-    """
-    global tipoError_ocurrido
-    tipoError_ocurrido = True
-
-    ln = getattr(node, 'lineno', None)
-    if ln is None:
-        print(f"Error semántico: {message}")
-        return
-
-    text = parser.lineas[ln-1] if 0 <= ln-1 < len(parser.lineas) else ''
-    print(f"Línea {ln}: {message}")
-    if text:
-        print(text)
-        lex = getattr(node, 'lexeme', None)
-        if lex is not None:
-            idx = text.find(str(lex))
-            if idx >= 0:
-                print(' ' * idx + '^')
-
-
-# Estructura de cada símbolo, extendida para registrar usos
+# Estructura de cada símbolo. Sus usos no se guardan aquí sino en el índice de
+# referencias del analizador (ver referencias.py): el símbolo sólo lleva su número
+# en el índice, su ámbito y dónde empieza y termina su cadena de apariciones.
 
 class SymbolInfoExtended:
+    __slots__ = ('name', 'kind', 'type', 'array_size', 'params', 'declared_at',
+                 'id', 'ambito', 'primer_uso', 'ultimo_uso', 'ligadura')
+
     def __init__(self, name, kind, typ, array_size=None, params=None, declared_at=0):
         self.name        = name          # identificador
         self.kind        = kind          # 'var', 'array' o 'func'
         self.type        = typ           # 'int' o 'void'
         self.array_size  = array_size    # tamaño si es array
-        self.params      = params or []  # para funciones: lista de (tipo, is_array)
+        self.params      = params or ()  # para funciones: lista de (tipo, is_array)
         self.declared_at = declared_at   # línea de declaración
-        self.lines       = [declared_at] # lista de todas las líneas donde aparece
-
-
-# Manejo de la pila de ámbitos
-
-def push_scope():
-    """Abre un nuevo ámbito: apilamos un diccionario vacío."""
-    depth.append({})
-
-def pop_scope():
-    """Cierra el ámbito actual: desapilamos."""
-    if depth:
-        depth.pop()
-
-def insert_symbol(name, info):
-    """
-    Inserta 'info' en el ámbito actual.
-    Si ya existe en este mismo nivel, lanza error.
-    """
-    scope = depth[-1]
-    if name in scope:
-        semanticError(info, f"Símbolo '{name}' ya declarado en este ámbito")
-    else:
-        scope[name] = info
-
-def lookup_symbol(name):
-    """
-    Busca en la pila de ámbitos (de adentro hacia fuera).
-    Devuelve SymbolInfoExtended o None.
-    """
-    for scope in reversed(depth):
-        if name in scope:
-            return scope[name]
-    return None
-
-def record_use(name, lineno):
-    """
-    Registra un uso de 'name' en la línea 'lineno',
-    añadíendola a info.lines (si info existe).
-    """
-    info = lookup_symbol(name)
-    if info:
-        info.lines.append(lineno)
+        self.id          = -1            # número en el IndiceReferencias (-1: sin indexar)
+        self.ambito      = -1            # número de ámbito en el índice
+        self.primer_uso  = -1            # primera y última aparición en el índice
+        self.ultimo_uso  = -1
+        self.ligadura    = None          # arbol.Ligadura que se anota en sus usos
 
 
-# Inicialización del ámbito global con built-ins
+# Tabla de símbolos con ámbitos anidados
 
-def init_symtab():
+class TablaSimbolos:
     """
-    1) Limpiamos depth
-    2) push_scope() para nivel 0
-    3) Insertamos input() y output(int) predefinidas
+    'ambitos' es la pila de ámbitos abiertos (dict nombre -> SymbolInfoExtended;
+    el 0 es el global). Cada dict sirve también de registro para deshacer: al
+    cerrar el ámbito se sacan sus nombres de 'pilas', que lleva por nombre los
+    símbolos locales visibles, el más interno al final. Así buscar, insertar,
+    abrir y cerrar cuestan lo mismo a cualquier profundidad (cerrar, uno por
+    símbolo declarado en el ámbito).
     """
-    global depth
-    depth = []
-    push_scope()
-    insert_symbol('input',  SymbolInfoExtended('input','func','int', None, [], 0))
-    insert_symbol('output', SymbolInfoExtended('output','func','void',None, [('int',False)], 0))
-
-
-# Impresión de la pila de ámbitos completa (debug)
-
-def print_symtab():
-    print("Tablas de símbolos por ámbito:")
-    for lvl, scope in enumerate(depth):
-        print(f" Ámbito nivel {lvl}:")
-        for info in scope.values():
-            if info.kind == 'var':
-                print(f"  var   int    {info.name}  (línea {info.declared_at})")
-            elif info.kind == 'array':
-                print(f"  array int[{info.array_size}]  {info.name}  (línea {info.declared_at})")
+    def __init__(self, globales=None):
+        self.reiniciar(globales)
+
+    def reiniciar(self, globales=None):
+        # Sólo el ámbito global; 'globales' se usa tal cual, sin copiarlo
+        self.ambitos = [{} if globales is None else globales]
+        self.pilas = {}
+
+    def __len__(self):
+        return len(self.ambitos)
+
+    def abrir(self):
+        ambito = {}
+        self.ambitos.append(ambito)
+        return ambito
+
+    def cerrar(self):
+        # El ámbito global no se cierra
+        if len(self.ambitos) < 2:
+            return None
+        ambito = self.ambitos.pop()
+        pilas = self.pilas
+        for nombre in ambito:
+            pila = pilas[nombre]
+            pila.pop()
+            if not pila:
+                del pilas[nombre]
+        return ambito
+
+    def insertar(self, nombre, info):
+        """Agrega al ámbito actual; False si el nombre ya estaba en ese ámbito."""
+        ambito = self.ambitos[-1]
+        if nombre in ambito:
+            return False
+        ambito[nombre] = info
+        if len(self.ambitos) > 1:
+            pila = self.pilas.get(nombre)
+            if pila is None:
+                self.pilas[nombre] = [info]
             else:
-                sig = ", ".join(f"{t}{'[]' if arr else ''}" for t,arr in info.params)
-                print(f"  func  {info.type} {info.name}({sig})  (línea {info.declared_at})")
-
-def print_scope(scope_name, this_scope, param_lines):
-    print(f"Scope: {scope_name}\n")
-    print(f"{'Variable Name':15s} {'Type':6s} {'Kind':10s} Lines")
-    print(f"{'-'*15} {'-'*6} {'-'*10} {'-'*10}")
-    for info in this_scope.values():
-        # supón que info.lines es la lista de todas las líneas donde aparece
-        lines = " ".join(str(l) for l in sorted(set(info.lines)))
-        kind  = 'function' if info.kind=='func' else (
-                'parameter' if info.declared_at in param_lines else
-                'variable')
-        print(f"{info.name:15s} {info.type:6s} {kind:10s} {lines}")
-    print()
-
-
-# Impresión final consolidada al estilo de tu profesor
-
-def printSymTabConsolidated():
-    """
-    Imprime una tabla con columnas:
-      Variable Name | Scope | Line Numbers
-    mostrando declaración + todos los usos.
-    """
-    print("\nSymbol table:")
-    print(f"{'Variable Name':15s} {'Scope':6s} Line Numbers")
-    print(f"{'-'*15} {'-'*6} {'-'*12}")
-    for lvl, scope in enumerate(depth):
-        for name, info in scope.items():
-            unique_lines = sorted(set(info.lines))
-            lines_str = " ".join(str(l) for l in unique_lines)
-            print(f"{name:15s} {lvl:6d} {lines_str}")
-
-
-# Recorrido genérico del AST: preorder + postorder
-
-def traverse(node, pre, post):
-    if node is None:
-        return
-    pre(node)
-    for c in getattr(node, 'children', []):
-        traverse(c, pre, post)
-    post(node)
-
-
-# 1) Construcción de la tabla global
-
-def tabla_global(tree):
-    """
-    Recorre tree.children (solo var_decl y fun_decl top-level)
-    e inserta cada símbolo en el ámbito global (nivel 0).
-    """
-    init_symtab()
-    for decl in tree.children:
-        if decl.kind == 'var_decl':
-            # variable global
-            typ = decl.children[0].lexeme
-            nm  = decl.children[1].lexeme
-            if len(decl.children) == 3:
-                sz = int(decl.children[2].lexeme)
-                insert_symbol(nm, SymbolInfoExtended(nm,'array',typ,sz,[],decl.lineno))
+                pila.append(info)
+        return True
+
+    def buscar(self, nombre):
+        pila = self.pilas.get(nombre)
+        if pila is not None:
+            return pila[-1]
+        return self.ambitos[0].get(nombre)
+
+
+# Estado del semántico: tabla de símbolos, tipos de retorno y bandera de error.
+# Cada AnalizadorSemantico tiene el suyo; usa el mapa de la fuente de su Parser
+# para mostrar el contexto de los errores. El chequeo de cada función es un
+# Recorrido (ver recorrido.py) con las tablas PRE y POST del final de la clase.
+
+class AnalizadorSemantico(Recorrido):
+    # False: no se arma el índice de referencias (las tablas no se pueden imprimir)
+    indexa_referencias = True
+
+    def __init__(self, prs=None, salida=None):
+        self.parser = prs if prs is not None else parser.Parser(salida=salida)
+        self.salida = salida               # None -> sys.stdout
+        self.tipoError_ocurrido = False    # ¿Ya detectamos algún error?
+        self.tabla = TablaSimbolos()       # Ámbitos abiertos (ver TablaSimbolos)
+        self._bloques = None               # lista -> (nivel, ámbito) de cada bloque, para imprimirlos
+        self.current_func_ret = []         # Stack de tipos de retorno de la función activa
+        self.indice = None                 # IndiceReferencias de la última tabla global
+        self._ambitos_indice = [0]         # números en el índice de los ámbitos abiertos
+        self._diagnosticos = None          # None -> el colector del parser
+        self.cache = None                  # cache_funciones.CacheFunciones, o None
+        self._marco = 0                    # offset desde $fp del último local declarado
+
+    @property
+    def depth(self):
+        # Pila de ámbitos: cada elemento es un dict name→SymbolInfoExtended
+        return self.tabla.ambitos
+
+    @property
+    def diagnosticos(self):
+        # Por omisión los errores de las dos fases van al mismo colector, en orden
+        return self.parser.diagnosticos if self._diagnosticos is None else self._diagnosticos
+
+    @diagnosticos.setter
+    def diagnosticos(self, colector):
+        self._diagnosticos = colector
+
+    def volcar_diagnosticos(self):
+        self.diagnosticos.volcar(self.parser.mapa, self.salida)
+
+    # Reportar errores semánticos
+
+    def semanticError(self, node, codigo, *args):
+        """
+        Cuando detectamos un error:
+          1) Marcamos el flag
+          2) Anotamos en el colector el código, los offsets y la línea del nodo;
+             el texto con el caret se arma al volcar (ver diagnosticos.py)
+        """
+        self.tipoError_ocurrido = True
+
+        ln = getattr(node, 'lineno', None)
+        # Nodo armado fuera del parser: sin offset, sólo sabemos la línea
+        inicio = fin = None
+        if ln is not None:
+            inicio, fin = getattr(node, 'inicio', None), getattr(node, 'fin', None)
+        self.diagnosticos.agregar(codigo, inicio, fin, ln, *args)
+
+    # Manejo de la pila de ámbitos
+
+    def push_scope(self):
+        """Abre un nuevo ámbito."""
+        ambito = self.tabla.abrir()
+        if self._bloques is not None:
+            self._bloques.append((len(self.tabla) - 1, ambito))
+        if self.indice is not None:
+            self._ambitos_indice.append(
+                self.indice.nuevo_ambito(len(self.tabla) - 1, self._ambitos_indice[-1]))
+
+    def pop_scope(self):
+        """Cierra el ámbito actual y deshace sus declaraciones."""
+        if self.tabla.cerrar() is not None and self.indice is not None:
+            self._ambitos_indice.pop()
+
+    def insert_symbol(self, name, info, inicio=None):
+        """
+        Inserta 'info' en el ámbito actual y lo da de alta en el índice, con
+        'inicio' como offset de su declaración.
+        Si ya existe en este mismo nivel, lanza error.
+        """
+        if not self.tabla.insertar(name, info):
+            self.semanticError(info, 'S01', name)
+        elif self.indice is not None:
+            self.indice.declarar(info, self._ambitos_indice[-1], inicio)
+
+    def _ligar(self, info, clase, slot=None, param=None):
+        """Le da a 'info' su ligadura (ver arbol.Ligadura) y lo devuelve."""
+        info.ligadura = Ligadura(clase, slot, info.kind == 'array', param, info.name)
+        return info
+
+    def lookup_symbol(self, name):
+        """
+        Símbolo visible más interno con ese nombre, sin recorrer los ámbitos.
+        Devuelve SymbolInfoExtended o None.
+        """
+        return self.tabla.buscar(name)
+
+    def record_use(self, info, node):
+        """
+        Registra en el índice de referencias un uso del símbolo 'info' (que el
+        llamador ya buscó) en la línea y el offset de 'node'.
+        """
+        if self.indice is not None and info.id >= 0:
+            self.indice.usar(info, node.lineno, getattr(node, 'inicio', None))
+
+    # Inicialización del ámbito global con built-ins
+
+    def init_symtab(self):
+        """
+        1) Tabla nueva, sólo con el nivel 0, e índice de referencias nuevo
+        2) Insertamos input() y output(int) predefinidas
+        """
+        self.tabla.reiniciar()
+        self.indice = IndiceReferencias() if self.indexa_referencias else None
+        self._ambitos_indice = [0]
+        self.insert_symbol('input',  self._ligar(
+            SymbolInfoExtended('input','func','int', None, [], 0), 'global'))
+        self.insert_symbol('output', self._ligar(
+            SymbolInfoExtended('output','func','void',None, [('int',False)], 0), 'global'))
+
+    # Impresión de la pila de ámbitos completa (debug)
+
+    def print_symtab(self, bloques=(), abiertos=None):
+        """
+        Imprime los ámbitos abiertos (o los de 'abiertos', del global al más
+        interno) y después los de 'bloques' (pares (nivel, ámbito) de bloques
+        ya cerrados) que declararon algo.
+        """
+        out = self.salida
+        print("Tablas de símbolos por ámbito:", file=out)
+        ambitos = list(enumerate(self.depth if abiertos is None else abiertos))
+        ambitos += [(lvl, scope) for lvl, scope in bloques if scope]
+        for lvl, scope in ambitos:
+            print(f" Ámbito nivel {lvl}:", file=out)
+            for info in scope.values():
+                if info.kind == 'var':
+                    print(f"  var   int    {info.name}  (línea {info.declared_at})", file=out)
+                elif info.kind == 'array':
+                    print(f"  array int[{info.array_size}]  {info.name}  (línea {info.declared_at})", file=out)
+                else:
+                    sig = ", ".join(f"{t}{'[]' if arr else ''}" for t,arr in info.params)
+                    print(f"  func  {info.type} {info.name}({sig})  (línea {info.declared_at})", file=out)
+
+    def print_scope(self, scope_name, infos, param_lines):
+        out = self.salida
+        print(f"Scope: {scope_name}\n", file=out)
+        print(f"{'Variable Name':15s} {'Type':6s} {'Kind':10s} Lines", file=out)
+        print(f"{'-'*15} {'-'*6} {'-'*10} {'-'*10}", file=out)
+        for info in infos:
+            # Declaración y usos, sin repetir y en orden, tal como salen del índice
+            lines = " ".join(map(str, self.indice.lineas(info)))
+            kind  = 'function' if info.kind=='func' else (
+                    'parameter' if info.declared_at in param_lines else
+                    'variable')
+            print(f"{info.name:15s} {info.type:6s} {kind:10s} {lines}", file=out)
+        print(file=out)
+
+    # Impresión final consolidada al estilo de tu profesor
+
+    def printSymTabConsolidated(self):
+        """
+        Imprime una tabla con columnas:
+          Variable Name | Scope | Line Numbers
+        mostrando declaración + todos los usos. Es una consulta sobre el
+        índice: los símbolos de cada ámbito abierto y, de cada uno, sus líneas.
+        """
+        out = self.salida
+        indice = self.indice
+        print("\nSymbol table:", file=out)
+        print(f"{'Variable Name':15s} {'Scope':6s} Line Numbers", file=out)
+        print(f"{'-'*15} {'-'*6} {'-'*12}", file=out)
+        print("".join(f"{info.name:15s} {lvl:6d} {' '.join(map(str, indice.lineas(info)))}\n"
+                      for lvl, ambito in enumerate(self._ambitos_indice)
+                      for info in indice.simbolos_de(ambito)), end="", file=out)
+
+    # 1) Construcción de la tabla global
+
+    def tabla_global(self, tree):
+        """
+        Recorre tree.children (solo var_decl y fun_decl top-level)
+        e inserta cada símbolo en el ámbito global (nivel 0).
+        """
+        self.init_symtab()
+        for decl in tree.children:
+            if decl.kind == 'var_decl':
+                # variable global
+                typ = decl.children[0].lexeme
+                nm  = decl.children[1].lexeme
+                if len(decl.children) == 3:
+                    sz = int(decl.children[2].lexeme)
+                    info = SymbolInfoExtended(nm,'array',typ,sz,[],decl.lineno)
+                else:
+                    info = SymbolInfoExtended(nm,'var',typ,None,[],decl.lineno)
+                self.insert_symbol(nm, self._ligar(info, 'global'), decl.children[1].inicio)
+
+            elif decl.kind == 'fun_decl':
+                # función global
+                ret      = decl.children[0].lexeme
+                name     = decl.children[1].lexeme
+                params_n = decl.children[2]
+                params_lst = []
+                if params_n.children and params_n.children[0].kind != 'VOID':
+                    for p in params_n.children[0].children:
+                        ptyp   = p.children[0].lexeme
+                        is_arr = (len(p.children) == 3)
+                        params_lst.append((ptyp, is_arr))
+                info = SymbolInfoExtended(name,'func',ret,None,params_lst,decl.lineno)
+                self.insert_symbol(name, self._ligar(info, 'global'), decl.children[1].inicio)
+
+    # 2) Inserción de vars locales + chequeo de tipos
+
+    def type_check_recursive(self, node):
+        """
+        Recorre 'node' sin recursión (ver recorrido.py):
+        - Cada compound_stmt abre su propio ámbito, salvo el cuerpo de la
+          función, que comparte el de los parámetros.
+        - Si es var_decl dentro de función (depth>1), la insertamos local.
+        - Postorden: chequeamos cada nodo con checkNode() y cerramos su bloque.
+        """
+        self.recorrer(node)
+
+    def _abre_bloque(self, node):
+        self.push_scope()
+
+    def _cierra_bloque(self, node):
+        self.pop_scope()
+
+    def _funcion(self, node):
+        # El cuerpo no abre ámbito: se recorren sus hijos con el de los parámetros
+        for c in node.children:
+            if c.kind == 'compound_stmt':
+                for h in c.children:
+                    self.recorrer(h)
+                self.checkNode(c)
             else:
-                insert_symbol(nm, SymbolInfoExtended(nm,'var',typ,None,[],decl.lineno))
-
-        elif decl.kind == 'fun_decl':
-            # función global
-            ret      = decl.children[0].lexeme
-            name     = decl.children[1].lexeme
-            params_n = decl.children[2]
-            params_lst = []
-            if params_n.children and params_n.children[0].kind != 'VOID':
-                for p in params_n.children[0].children:
-                    ptyp   = p.children[0].lexeme
-                    is_arr = (len(p.children) == 3)
-                    params_lst.append((ptyp, is_arr))
-            insert_symbol(name,
-                          SymbolInfoExtended(name,'func',ret,None,params_lst,decl.lineno))
-
-
-# 2) Inserción de vars locales + chequeo de tipos
-
-def type_check_recursive(node):
-    """
-    - Si es var_decl dentro de función (depth>1), la insertamos local.
-    - Recorremos recursivamente hijos.
-    - Postorden: chequeamos el nodo actual con checkNode().
-    """
-    if node.kind == 'var_decl' and len(depth) > 1:
-        typ = node.children[0].lexeme
-        nm  = node.children[1].lexeme
-        if len(node.children) == 3:
-            sz = int(node.children[2].lexeme)
-            insert_symbol(nm, SymbolInfoExtended(nm,'array',typ,sz,[],node.lineno))
-        else:
-            insert_symbol(nm, SymbolInfoExtended(nm,'var',typ,None,[],node.lineno))
-
-    for c in node.children:
-        type_check_recursive(c)
-
-    checkNode(node)
-
-
-# Función principal del análisis semántico
-
-def semantica(tree, imprime=True):
-    """
-    1) Monta tabla global e imprime.
-    2) Para cada función:
-       a) push_scope()
-       b) mete parámetros
-       c) recorre cuerpo con type_check_recursive()
-       d) si imprime, print_symtab()
-       e) pop_scope()
-    3) Al final, printSymTabConsolidated().
-    """
-    global tipoError_ocurrido
-    tipoError_ocurrido = False
-    current_func_ret.clear()
-
-    # --- Paso 1: globals ---
-    tabla_global(tree)
-    if imprime:
-        print_symtab()
-
-    # --- Paso 2: por cada función top-level ---
-    for decl in tree.children:
-        if decl.kind == 'fun_decl':
-            # 2.a) retorno y nuevo scope
-            ret = decl.children[0].lexeme
-            current_func_ret.append(ret)
-            push_scope()
-
-            # 2.b) parámetros
-            params_n = decl.children[2]
-            if params_n.children and params_n.children[0].kind != 'VOID':
-                for p in params_n.children[0].children:
-                    ptyp   = p.children[0].lexeme
-                    pname  = p.children[1].lexeme
-                    is_arr = (len(p.children) == 3)
-                    insert_symbol(pname,
-                                  SymbolInfoExtended(pname,
-                                                     'array' if is_arr else 'var',
-                                                     ptyp, None, [], p.lineno))
-
-            # 2.c) cuerpo
-            type_check_recursive(decl)
-
-            # 2.d) debug: imprimir tabla tras entrar
-            # … justo en vez de print_symtab() …
+                self.recorrer(c)
+        self.checkNode(node)
+        return SALTAR
+
+    def _declara_local(self, node):
+        if len(self.tabla) > 1:
+            typ = node.children[0].lexeme
+            nm  = node.children[1].lexeme
+            if len(node.children) == 3:
+                sz = int(node.children[2].lexeme)
+                info = SymbolInfoExtended(nm,'array',typ,sz,[],node.lineno)
+            else:
+                sz = 1
+                info = SymbolInfoExtended(nm,'var',typ,None,[],node.lineno)
+            # cgen reserva el espacio aunque el nombre esté repetido: el marco
+            # avanza igual para que los offsets coincidan
+            self._marco -= PALABRA * sz
+            self.insert_symbol(nm, self._ligar(info, 'local', self._marco),
+                               node.children[1].inicio)
+
+    # Función principal del análisis semántico
+
+    def semantica(self, tree, imprime=True, trabajadores=1):
+        """
+        1) Monta tabla global e imprime.
+        2) Para cada función:
+           a) push_scope()
+           b) mete parámetros
+           c) recorre cuerpo con type_check_recursive()
+           d) si imprime, print_symtab()
+           e) pop_scope()
+        3) Al final, printSymTabConsolidated().
+        Con trabajadores > 1 (None: uno por CPU) el paso 2 se reparte entre
+        procesos (ver paralelo.chequear_paralelo); la salida es la misma. En
+        serie, si self.cache no es None, cada función pasa por la caché (ver
+        cache_funciones.py).
+        """
+        out = self.salida
+        self.tipoError_ocurrido = False
+        self.current_func_ret.clear()
+        if self.diagnosticos.detenido:
+            # El parser ya cortó el análisis (diagnosticos.parar_en)
+            return
+
+        try:
+            # --- Paso 1: globals ---
+            self.tabla_global(tree)
             if imprime:
-                
-                # 1) Imprimir tabla de símbolos global (todos los ámbitos)
-                
-                print("=== Tabla de símbolos completa ===")
-                print_symtab()
-                print()  # línea en blanco para separación
-
-                
-                # 2) Imprimir sólo el scope de la función actual
-                
-                # Nombre de la función actual
-                func_name = decl.children[1].lexeme
-
-                # Recogemos las líneas donde se declararon sus parámetros
-                # (decl.children[2] es el nodo 'params', cuyo primer hijo es 'param_list')
-                param_nodes = decl.children[2].children[0].children  # sólo si no es VOID
-                param_lines = [p.lineno for p in param_nodes]
-
-                print(f"=== Scope de la función '{func_name}' ===")
-                print_scope(func_name, depth[-1], param_lines)
-
-
-
-            # 2.e) cerrar scope
-            pop_scope()
-            current_func_ret.pop()
-
-    # si no hubo errores, confirmamos éxito
-    if not tipoError_ocurrido:
-        print("\nType Checking Finished")
-
-    # --- Paso 3: tabla consolidada ---
-    if imprime:
-        printSymTabConsolidated()
-
-
-
-# Reglas de inferencia de tipos (postorden)
-
-def nullProc(node):
-    pass
-
-def checkNode(node):
-    """
-    Según node.kind aplica:
-      - assign, addop, mulop, relop, var, NUM, call, return_stmt, selection/iteration
-      - Reporta errores y asigna node.type para parents.
-    """
-    k = node.kind
-
-    # assign: izq y der must be int
-    if k == 'assign':
-        info = lookup_symbol(node.lexeme)
+                self.volcar_diagnosticos()
+                self.print_symtab()
+
+            # --- Paso 2: por cada función top-level ---
+            funciones = [decl for decl in tree.children if decl.kind == 'fun_decl']
+            if trabajadores == 1 and self.cache is not None:
+                # Las funciones que no cambiaron salen de la caché
+                for decl in funciones:
+                    self.cache.chequear(self, decl, imprime)
+            elif trabajadores == 1:
+                for decl in funciones:
+                    self.chequear_funcion(decl, imprime)
+            else:
+                from paralelo import chequear_paralelo
+                chequear_paralelo(self, funciones, imprime, trabajadores)
+        except AnalisisDetenido:
+            # Se llegó a parar_en: sin tablas ni resto de las funciones
+            return
+        finally:
+            # Lo anotado sale aunque el análisis se corte
+            self.volcar_diagnosticos()
+
+        # si no hubo errores, confirmamos éxito
+        if not self.tipoError_ocurrido:
+            print("\nType Checking Finished", file=out)
+
+        # --- Paso 3: tabla consolidada ---
+        if imprime:
+            self.printSymTabConsolidated()
+
+    def chequear_funcion(self, decl, imprime=False):
+        """
+        Paso 2 de semantica() para una sola función, con la tabla global ya
+        armada en self.depth[0]: abre su ámbito, mete los parámetros, recorre
+        el cuerpo (cada bloque anidado con su ámbito) y cierra el ámbito.
+        """
+        # 2.a) retorno y nuevo scope
+        ret = decl.children[0].lexeme
+        self.current_func_ret.append(ret)
+        self.push_scope()
+
+        # 2.b) parámetros, en 8($fp), 12($fp), ...; los locales bajan desde $fp
+        self._marco = 0
+        params_n = decl.children[2]
+        if params_n.children and params_n.children[0].kind != 'VOID':
+            for k, p in enumerate(params_n.children[0].children):
+                ptyp   = p.children[0].lexeme
+                pname  = p.children[1].lexeme
+                is_arr = (len(p.children) == 3)
+                info = SymbolInfoExtended(pname, 'array' if is_arr else 'var',
+                                          ptyp, None, [], p.lineno)
+                self.insert_symbol(pname,
+                                   self._ligar(info, 'param', PRIMER_PARAMETRO + PALABRA * k, k),
+                                   p.children[1].inicio)
+
+        # 2.c) cuerpo; si hay que imprimir se guardan los ámbitos de sus bloques
+        self._bloques = [] if imprime else None
+        self.type_check_recursive(decl)
+        bloques, self._bloques = self._bloques, None
+
+        # 2.d) debug: imprimir tabla tras entrar
+        if imprime:
+            self.imprimir_funcion(decl, bloques)
+
+        # 2.e) cerrar scope
+        self.pop_scope()
+        self.current_func_ret.pop()
+
+    def imprimir_funcion(self, decl, bloques, abiertos=None):
+        """
+        Lo que chequear_funcion(decl, True) imprime al terminar el cuerpo: los
+        errores y las tablas. 'abiertos' son los ámbitos global y de la función
+        (por omisión, los abiertos) y 'bloques' los de sus bloques, en orden.
+        """
+        out = self.salida
+        if abiertos is None:
+            abiertos = self.depth
+
+        # Los errores de la función salen antes que sus tablas
+        self.volcar_diagnosticos()
+
+        # 1) Imprimir tabla de símbolos global (todos los ámbitos)
+
+        print("=== Tabla de símbolos completa ===", file=out)
+        self.print_symtab(bloques, abiertos)
+        print(file=out)  # línea en blanco para separación
+
+
+        # 2) Imprimir sólo el scope de la función actual
+
+        # Nombre de la función actual
+        func_name = decl.children[1].lexeme
+
+        # Recogemos las líneas donde se declararon sus parámetros
+        # (decl.children[2] es el nodo 'params', cuyo primer hijo es 'param_list')
+        param_nodes = decl.children[2].children[0].children  # sólo si no es VOID
+        param_lines = [p.lineno for p in param_nodes]
+
+        print(f"=== Scope de la función '{func_name}' ===", file=out)
+        infos = list(abiertos[-1].values())
+        for _, scope in bloques:
+            infos.extend(scope.values())
+        self.print_scope(func_name, infos, param_lines)
+
+    # Reglas de inferencia de tipos (postorden)
+
+    def nullProc(self, node):
+        pass
+
+    def checkNode(self, node):
+        """
+        Aplica a 'node' la regla de su kind según la tabla CHEQUEOS (assign,
+        addop, mulop, relop, var, NUM, call, return_stmt, selection/iteration).
+        Reporta errores y asigna node.type para parents.
+        """
+        h = self.CHEQUEOS.get(node.kind)
+        if h is not None:
+            h(self, node)
+
+    # assign: izq y der must be int. Como var y call, anota en node.ligadura
+    # la declaración que resolvió (None si no hay), que es lo que usa cgen
+    def _chequea_assign(self, node):
+        info = self.lookup_symbol(node.lexeme)
         if info is None:
-            semanticError(node, f"Variable '{node.lexeme}' no declarada")
+            self.semanticError(node, 'S02', node.lexeme)
+            node.ligadura = None
             ltype = 'int'
         else:
-            record_use(node.lexeme, node.lineno)
+            self.record_use(info, node)
+            node.ligadura = info.ligadura
             ltype = info.type
         rtype = getattr(node.children[0], 'type', None)
         if ltype != 'int' or rtype != 'int':
-            semanticError(node, "Asignación de tipo no entero")
+            self.semanticError(node, 'S03')
         node.type = 'int'
 
     # addop/mulop: ambos operandos int → int
-    elif k in ('addop','mulop'):
+    def _chequea_aritmetica(self, node):
         l, r = node.children
         if getattr(l,'type',None)!='int' or getattr(r,'type',None)!='int':
-            semanticError(node, "Operación aritmética aplicada a operandos no enteros")
+            self.semanticError(node, 'S04')
         node.type = 'int'
 
     # relop: ambos operandos int → int
-    elif k == 'relop':
+    def _chequea_relop(self, node):
         l, r = node.children
         if getattr(l,'type',None)!='int' or getattr(r,'type',None)!='int':
-            semanticError(node, "Operación relacional aplicada a operandos no enteros")
+            self.semanticError(node, 'S05')
         node.type = 'int'
 
     # var: debe existir
-    elif k == 'var':
-        info = lookup_symbol(node.lexeme)
+    def _chequea_var(self, node):
+        info = self.lookup_symbol(node.lexeme)
         if info is None:
-            semanticError(node, f"Variable '{node.lexeme}' no declarada")
+            self.semanticError(node, 'S02', node.lexeme)
+            node.ligadura = None
             node.type = 'int'
         else:
-            record_use(node.lexeme, node.lineno)
+            self.record_use(info, node)
+            node.ligadura = info.ligadura
             node.type = info.type
 
     # NUM → int
-    elif k == 'NUM':
+    def _chequea_num(self, node):
         node.type = 'int'
 
     # call: existencia, aridad y tipos
-    elif k == 'call':
+    def _chequea_call(self, node):
         fname = node.lexeme
-        info  = lookup_symbol(fname)
+        info  = self.lookup_symbol(fname)
         if info is None or info.kind != 'func':
-            semanticError(node, f"Llamada a función no declarada: {fname}")
+            self.semanticError(node, 'S06', fname)
+            node.ligadura = None
             node.type = 'int'
+            return
+        self.record_use(info, node)
+        node.ligadura = info.ligadura
+        # extraemos args reales
+        args = []
+        if node.children:
+            args_node = node.children[0]
+            if args_node.children:
+                arg_list_node = args_node.children[0]
+                args = arg_list_node.children
+        # comparamos con params
+        if len(args) != len(info.params):
+            self.semanticError(node, 'S07', fname)
         else:
-            record_use(fname, node.lineno)
-            # extraemos args reales
-            args = []
-            if node.children:
-                args_node = node.children[0]
-                if args_node.children:
-                    arg_list_node = args_node.children[0]
-                    args = arg_list_node.children
-            # comparamos con params
-            if len(args) != len(info.params):
-                semanticError(node, f"Número de argumentos incorrecto en llamada a {fname}")
-            else:
-                for arg,(pt,_) in zip(args, info.params):
-                    if getattr(arg,'type',None) != pt:
-                        semanticError(arg, f"Tipo de argumento inválido en llamada a {fname}")
-            node.type = info.type
+            for arg,(pt,_) in zip(args, info.params):
+                if getattr(arg,'type',None) != pt:
+                    self.semanticError(arg, 'S08', fname)
+        node.type = info.type
 
     # return_stmt: chequeo según current_func_ret
-    elif k == 'return_stmt':
-        expected = current_func_ret[-1] if current_func_ret else None
+    def _chequea_return(self, node):
+        expected = self.current_func_ret[-1] if self.current_func_ret else None
         if node.children:
             et = getattr(node.children[0],'type',None)
             if expected != 'int':
-                semanticError(node, "Return con valor en función void")
+                self.semanticError(node, 'S09')
             elif et != 'int':
-                semanticError(node, "Return de tipo no entero en función int")
+                self.semanticError(node, 'S10')
         else:
             if expected == 'int':
-                semanticError(node, "Return sin valor en función int")
+                self.semanticError(node, 'S11')
 
     # if / while: condición debe ser int
-    elif k in ('selection_stmt','iteration_stmt'):
+    def _chequea_condicion(self, node):
         cond = node.children[0]
         if getattr(cond,'type',None) != 'int':
-            semanticError(cond, "Condición de control no entera")
+            self.semanticError(cond, 'S12')
+
+    # Tablas kind -> handler. Una subclase que cambie una regla arma las suyas,
+    # p. ej. CHEQUEOS = dict(AnalizadorSemantico.CHEQUEOS, var=otra_regla)
+    # (y POST a partir de esa CHEQUEOS).
+    CHEQUEOS = {
+        'assign':         _chequea_assign,
+        'addop':          _chequea_aritmetica,
+        'mulop':          _chequea_aritmetica,
+        'relop':          _chequea_relop,
+        'var':            _chequea_var,
+        'NUM':            _chequea_num,
+        'call':           _chequea_call,
+        'return_stmt':    _chequea_return,
+        'selection_stmt': _chequea_condicion,
+        'iteration_stmt': _chequea_condicion,
+    }
+    PRE  = {'compound_stmt': _abre_bloque, 'var_decl': _declara_local, 'fun_decl': _funcion}
+    POST = dict(CHEQUEOS, compound_stmt=_cierra_bloque)
+
+
+# Interfaz de módulo: semantica() trabaja sobre el analizador de la sesión por defecto.
+
+def _por_defecto():
+    from sesion import sesion_por_defecto
+    return sesion_por_defecto.semantica
+
+def semantica(tree, imprime=True, trabajadores=1):
+    _por_defecto().semantica(tree, imprime, trabajadores)
+
+def __getattr__(name):
+    if name in ('tipoError_ocurrido', 'depth', 'current_func_ret'):
+        return getattr(_por_defecto(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,107 @@
+# sesion.py
+# Una CompilerSession reúne el estado de las cuatro fases (lexer, parser, semántica
+# y generación de código). Las funciones de siempre (parser(), semantica(), codeGen())
+# trabajan sobre sesion_por_defecto; compile() es reentrante y se puede llamar
+# desde varios hilos a la vez.
+
+import io
+
+from lexer import Lexer, tokenize
+from parser import Parser
+from parser_ll1 import ParserLL1
+from semantica import AnalizadorSemantico
+from cgen import GeneradorCodigo
+from mirilla import Mirilla
+from paralelo import parsear_paralelo
+
+
+# Motores de análisis sintáctico: el LL(1) con pila explícita es el de siempre;
+# el descendente recursivo queda como referencia (mismos árboles y mensajes)
+MOTORES_PARSER = {'ll1': ParserLL1, 'recursivo': Parser}
+
+
+class CompilerSession:
+    def __init__(self, salida=None, motor_parser='ll1', columnar=False):
+        self.salida = salida  # stream para tablas y errores; None -> sys.stdout
+        self.motor_parser = motor_parser
+        # columnar=True: el AST se guarda en arreglos (arbol.ArbolColumnar)
+        self.columnar = columnar
+        self.parser = MOTORES_PARSER[motor_parser](Lexer(salida), salida, columnar)
+        self.semantica = AnalizadorSemantico(self.parser, salida)
+        self.cgen = GeneradorCodigo()
+
+    @property
+    def lexer(self):
+        # globales_mmap cambia el lexer del parser por un LexerBytes
+        return self.parser.lex
+
+    def globales(self, prog, pos, lng):
+        self.parser.globales(prog, pos, lng)
+
+    def globales_mmap(self, ruta):
+        self.parser.globales_mmap(ruta)
+
+    def globales_tokens(self, source):
+        # Tokeniza 'source' (sin '$') de una vez; el parser lo recorre por índice
+        self.parser.globales_tokens(tokenize(source))
+
+    def parse_paralelo(self, source, imprime=True, trabajadores=None):
+        """
+        Analiza 'source' con las declaraciones top-level repartidas entre procesos
+        (ver paralelo.py); mismo árbol y mismos mensajes que globales_tokens + parse.
+        """
+        return parsear_paralelo(self.parser, source, trabajadores, imprime)
+
+    def _fases(self, salida):
+        # Fases nuevas para compile() con las opciones de esta sesión: los
+        # diagnósticos y la configuración de cgen. La Mirilla se copia (cuenta
+        # sus aciertos y no se comparte entre hilos); la caché sí se comparte
+        fases = CompilerSession(self.salida if salida is None else salida, self.motor_parser,
+                                self.columnar)
+        origen, destino = self.parser.diagnosticos, fases.parser.diagnosticos
+        destino.limite, destino.parar_en, destino.formato = (origen.limite, origen.parar_en,
+                                                              origen.formato)
+        fases.semantica.cache = self.semantica.cache
+        gen, copia = self.cgen, fases.cgen
+        copia.cache = gen.cache
+        copia.nivel = gen.nivel
+        copia.ir, copia.volcado_ir = gen.ir, gen.volcado_ir
+        copia.plegar, copia.informe_plegado = gen.plegar, gen.informe_plegado
+        copia.mirilla = None if gen.mirilla is None else Mirilla(gen.mirilla.reglas)
+        return fases
+
+    def compile(self, source, imprime=False, salida=None):
+        """
+        Compila el texto 'source' y devuelve el ensamblador MIPS como str
+        (None si el análisis se cortó por diagnosticos.parar_en). Cada llamada
+        usa fases nuevas con las opciones de esta sesión, así que la misma
+        sesión puede compilar varios programas a la vez desde un pool de
+        hilos. Los mensajes (errores, tablas si imprime=True) van a 'salida'
+        o, si es None, a self.salida.
+        """
+        fases = self._fases(salida)
+        fases.globales_tokens(source)
+        ast = fases.parser.parse(imprime)
+        fases.semantica.semantica(ast, imprime)
+        return fases._generar(ast)
+
+    def compile_archivo(self, ruta, imprime=False, salida=None):
+        """Como compile(), pero lee 'ruta' directamente de un mmap (archivos muy grandes)."""
+        fases = self._fases(salida)
+        fases.globales_mmap(ruta)
+        try:
+            ast = fases.parser.parse(imprime)
+            fases.semantica.semantica(ast, imprime)
+        finally:
+            fases.lexer.cerrar()
+        return fases._generar(ast)
+
+    def _generar(self, ast):
+        if self.parser.diagnosticos.detenido:
+            # Sin árbol completo no hay código (como en main.py)
+            return None
+        asm = io.StringIO()
+        self.cgen.generar(ast, asm)
+        return asm.getvalue()
+
+sesion_por_defecto = CompilerSession()
@@ -0,0 +1,105 @@
+# sourcemap.py
+# Mapa de la fuente: guarda el offset donde empieza cada línea en un arreglo y
+# traduce un offset a (línea, columna, texto de la línea) con búsqueda binaria.
+# Los tokens y los ASTNode llevan offsets de inicio y fin; las líneas sólo se
+# calculan cuando hay que mostrar un diagnóstico.
+
+import re
+from array import array
+from bisect import bisect_right
+
+_salto = re.compile('\n')
+_salto_bytes = re.compile(b'\n')
+
+# Las líneas más largas que esto se muestran recortadas alrededor de la columna
+ANCHO_CONTEXTO = 160
+
+
+class SourceMap:
+    """
+    Se construye sobre el texto del programa (str, bytes o mmap) sin copiarlo.
+    La tabla de inicios de línea se arma una sola vez, en la primera consulta,
+    así que compilar sin errores no paga nada por ella.
+    """
+    def __init__(self, texto):
+        self.texto = texto
+        self._inicios = None
+
+    @property
+    def inicios(self):
+        if self._inicios is None:
+            salto = _salto if isinstance(self.texto, str) else _salto_bytes
+            ini = array('q', [0])
+            ini.extend(m.end() for m in salto.finditer(self.texto))
+            self._inicios = ini
+        return self._inicios
+
+    def linea(self, offset):
+        """Número de línea (1 = primera) del carácter en 'offset'."""
+        return bisect_right(self.inicios, offset)
+
+    def columna(self, offset):
+        """Columna (0 = primera) del carácter en 'offset'."""
+        return offset - self.inicios[self.linea(offset) - 1]
+
+    def _limites(self, ln):
+        # [ini, fin) de la línea 'ln' sin el salto ni un '\r' final
+        inicios = self.inicios
+        ini = inicios[ln - 1]
+        fin = inicios[ln] - 1 if ln < len(inicios) else len(self.texto)
+        if fin > ini and self.texto[fin-1:fin] in ('\r', b'\r'):
+            fin -= 1
+        return ini, fin
+
+    def _trozo(self, a, b):
+        texto = self.texto[a:b]
+        return texto if isinstance(texto, str) else bytes(texto).decode('ascii', 'replace')
+
+    def texto_linea(self, ln):
+        """Texto de la línea 'ln', sin el salto; '' si la línea no existe."""
+        if not 1 <= ln <= len(self.inicios):
+            return ''
+        return self._trozo(*self._limites(ln))
+
+    def posicion(self, offset):
+        """(línea, columna, texto de la línea) para 'offset'."""
+        ln = self.linea(offset)
+        return ln, offset - self.inicios[ln - 1], self.texto_linea(ln)
+
+    def _linea_de(self, offset):
+        # (línea, [ini, fin) de esa línea) para 'offset'
+        ln = self.linea(offset)
+        return (ln, *self._limites(ln))
+
+    def contexto(self, offset, ancho=ANCHO_CONTEXTO):
+        """
+        Como posicion(), pero el texto se recorta a una ventana de 'ancho'
+        caracteres alrededor de 'offset' ('...' marca lo que se omitió).
+        Devuelve (línea, columna, texto, columna del caret dentro del texto).
+        El costo no depende del largo de la línea.
+        """
+        ln, ini, fin = self._linea_de(offset)
+        col = offset - ini
+        if fin - ini <= ancho:
+            return ln, col, self._trozo(ini, fin), col
+        a = max(ini, min(offset - ancho // 2, fin - ancho))
+        b = min(fin, a + ancho)
+        izq = '...' if a > ini else ''
+        der = '...' if b < fin else ''
+        return ln, col, izq + self._trozo(a, b) + der, offset - a + len(izq)
+
+    def diagnostico(self, msg, inicio=None, ln=None):
+        """
+        Texto de un error: 'Línea N: msg', la línea (recortada) y un caret bajo
+        'inicio'. Sin offset se muestra la línea 'ln' completa y sin caret.
+        """
+        if inicio is None:
+            texto, caret = self.texto_linea(ln), None
+        else:
+            ln, _, texto, caret = self.contexto(inicio)
+        s = f"Línea {ln}: {msg}\n"
+        if texto:
+            s += texto + "\n"
+            if caret is not None:
+                s += ' ' * caret + "^\n"
+        return s
@@ -0,0 +1,86 @@
+# volcado.py
+# Volcado del AST sin recursión. imprimir_ast() escribe el árbol indentado línea por
+# línea en cualquier stream (mismo texto que ASTNode.__repr__); json_ast() genera un
+# objeto JSON por nodo de forma perezosa. Ambos recorren el árbol con una pila de
+# iteradores, así que la memoria sólo crece con la profundidad y no con el tamaño.
+
+import sys
+from json.encoder import encode_basestring as _cadena
+
+
+def _recorrer(raiz, max_profundidad=None):
+    # Preorden de (nodo, nivel, índice del padre, índice propio). Con max_profundidad
+    # no se bajan los hijos de los nodos de ese nivel; se avisa con omitido=True.
+    pila = [iter((raiz,))]
+    padres = [-1]
+    n = 0
+    while pila:
+        nodo = next(pila[-1], None)
+        if nodo is None:
+            pila.pop()
+            padres.pop()
+            continue
+        nivel = len(pila) - 1
+        hijos = nodo.children
+        omitido = max_profundidad is not None and nivel >= max_profundidad and bool(hijos)
+        yield nodo, nivel, padres[-1], n, omitido
+        if hijos and not omitido:
+            pila.append(iter(hijos))
+            padres.append(n)
+        n += 1
+
+
+def imprimir_ast(raiz, salida=None, lvl=0, max_profundidad=None, max_nodos=None):
+    """
+    Escribe el árbol en 'salida' (None -> sys.stdout) con dos espacios por nivel
+    a partir de 'lvl'. Los subárboles más hondos que max_profundidad se marcan con
+    '...'; después de max_nodos nodos se corta el volcado con un aviso.
+    """
+    if salida is None:
+        salida = sys.stdout
+    write = salida.write
+    for nodo, nivel, _, n, omitido in _recorrer(raiz, max_profundidad):
+        if max_nodos is not None and n >= max_nodos:
+            write(f"... (volcado cortado en {max_nodos} nodos)\n")
+            return
+        pad = '  ' * (lvl + nivel)
+        lexeme = nodo.lexeme
+        if lexeme is None:
+            write(f"{pad}{nodo.kind}\n")
+        else:
+            write(f"{pad}{nodo.kind}: {lexeme}\n")
+        if omitido:
+            write(f"{pad}  ...\n")
+
+
+def json_ast(raiz, max_profundidad=None, max_nodos=None):
+    """
+    Generador con una línea JSON por nodo, en preorden:
+    {"id", "padre", "nivel", "kind", "lexeme", "linea", "inicio", "fin"[, "tipo"]}.
+    'padre' es el id del padre (-1 en la raíz). Los nodos cuyos hijos no se
+    vuelcan por max_profundidad llevan "omitido": true.
+    """
+    for nodo, nivel, padre, n, omitido in _recorrer(raiz, max_profundidad):
+        if max_nodos is not None and n >= max_nodos:
+            return
+        # Armado a mano: json.dumps de un dict por nodo cuesta ~4 veces más
+        lexeme, inicio, fin = nodo.lexeme, nodo.inicio, nodo.fin
+        s = (f'{{"id": {n}, "padre": {padre}, "nivel": {nivel}, "kind": {_cadena(nodo.kind)}, '
+             f'"lexeme": {"null" if lexeme is None else _cadena(lexeme)}, "linea": {nodo.lineno}, '
+             f'"inicio": {"null" if inicio is None else inicio}, "fin": {"null" if fin is None else fin}')
+        tipo = getattr(nodo, 'type', None)
+        if tipo is not None:
+            s += f', "tipo": {_cadena(tipo)}'
+        if omitido:
+            s += ', "omitido": true'
+        yield s + '}'
+
+
+def volcar_json(raiz, salida=None, max_profundidad=None, max_nodos=None):
+    """Escribe json_ast() en 'salida' (None -> sys.stdout), un nodo por línea."""
+    if salida is None:
+        salida = sys.stdout
+    write = salida.write
+    for linea in json_ast(raiz, max_profundidad, max_nodos):
+        write(linea)
+        write("\n")